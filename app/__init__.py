@@ -2,22 +2,32 @@
 
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
-from .extensions import db, migrate
+from .extensions import db, migrate, cache, password_hasher, metrics, query_monitor, table_versions, compression, rate_limiter, replicas, job_queue
 from app.modules.auth.models import UserModel
 
 # 导入集中注册蓝图的函数
 from .modules import register_blueprints
+from .commands import register_commands
+from .modules.example.search import include_object
+from .modules.storage.derivatives import derivative_pipeline
 
 # 导入我们创建的所有工具函数
 from .utils.exception_handler import init_error_handlers
 from .utils.log_handler import register_logging
+from .utils.engine_profile import build_engine_options, init_engine_profile
 import os
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # 部署在反向代理之后时，从 X-Forwarded-* 中还原客户端地址（限流按 IP 计数依赖这一点）
+    proxies = app.config.get('PROXY_FIX_X_FOR', 0)
+    if proxies:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
     # 1. 首先初始化日志系统
     register_logging(app)
     
@@ -25,8 +35,26 @@ def create_app(config_class=Config):
     init_error_handlers(app)
 
     # 3. 初始化扩展
+    # 按数据库类型设置连接池参数，并为 SQLite 连接启用 WAL 等 PRAGMA
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
     db.init_app(app)
-    migrate.init_app(app, db)
+    init_engine_profile(app, db)
+    # 表级变更计数器（table_version 表需要在 migrate 之前注册到 db.metadata）
+    table_versions.init_app(app, db)
+    # 读写分离：副本延迟检测依赖 table_version 表
+    replicas.init_app(app, db)
+    # include_object: 生成迁移时忽略全文检索虚拟表
+    migrate.init_app(app, db, include_object=include_object)
+    cache.init_app(app)
+    compression.init_app(app)
+    password_hasher.init_app(app)
+    derivative_pipeline.init_app(app)
+    metrics.init_app(app)
+    # 限流拒绝次数计入 /metrics，需在 metrics 之后初始化
+    rate_limiter.init_app(app)
+    # 任务队列：job 表注册到 db.metadata，执行次数与耗时计入 /metrics
+    job_queue.init_app(app, db)
+    query_monitor.init_app(app)
 
     # --- 新增：确保上传文件夹存在 ---
     # 从配置中读取 UPLOAD_FOLDER 的路径
@@ -40,6 +68,8 @@ def create_app(config_class=Config):
 
     # 使用集中注册蓝图的函数
     register_blueprints(app)
+    # 注册顶层命令行工具（flask import 等）
+    register_commands(app)
 
 
     CORS(app,supports_credentials=True)
@@ -0,0 +1,128 @@
+# app/commands.py
+"""
+不属于某个模块的顶层命令行工具，使用方式: flask <命令>
+模块内的命令挂在各自蓝图的 cli 分组下（例如 flask example ...、flask storage ...）
+"""
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy.engine import make_url
+
+from app.utils.bulk_import import IMPORT_FORMATS, IMPORT_KINDS, BulkImporter, ImportCheckpoint
+from app.utils.jobs import Worker
+from app.utils.replicas import copy_sqlite_database
+
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(IMPORT_KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(IMPORT_FORMATS), default=None,
+              help='输入格式，默认根据扩展名判断（.csv 为 CSV，其余为 NDJSON）')
+@click.option('--chunk-size', type=int, default=1000, show_default=True, help='每次提交的行数')
+@click.option('--workers', type=int, default=None, help='并行哈希密码的进程数，默认使用全部 CPU 核心')
+@click.option('--resume/--restart', default=True, show_default=True,
+              help='从上次中断时最后一次提交处继续，或忽略检查点从头导入')
+@with_appcontext
+def import_command(kind, path, fmt, chunk_size, workers, resume):
+    """
+    批量导入用户、分类或项目（NDJSON / CSV）
+
+    \b
+    users:      username, password, is_admin
+    categories: name
+    items:      name, description, category（分类名，不存在时自动创建）或 category_id,
+                username 或 user_id, timestamp（可选）
+    """
+    checkpoint = ImportCheckpoint(path, kind)
+    if not resume:
+        checkpoint.clear()
+
+    def report(stats):
+        rate = stats['processed'] / stats['seconds'] if stats['seconds'] else 0
+        click.echo(
+            f"已处理 {stats['resumed_from'] + stats['processed']} 行：新增 {stats['inserted']}，"
+            f"跳过 {stats['skipped']}，失败 {stats['failed']}（{rate:.0f} 行/秒）",
+            err=True
+        )
+
+    importer = BulkImporter(kind, chunk_size=max(chunk_size, 1), workers=workers, progress=report)
+    if checkpoint.load():
+        click.echo(f'从检查点继续：跳过已提交的 {checkpoint.load()} 行', err=True)
+    stats = importer.run(path, fmt, checkpoint)
+
+    for line_no, reason in importer.errors:
+        click.echo(f'  第 {line_no} 行: {reason}', err=True)
+    rate = stats['processed'] / stats['seconds'] if stats['seconds'] else 0
+    click.echo(
+        f"导入完成：处理 {stats['processed']} 行，新增 {stats['inserted']}，跳过 {stats['skipped']}，"
+        f"失败 {stats['failed']}，耗时 {stats['seconds']:.2f} 秒（{rate:.0f} 行/秒）"
+    )
+
+
+@click.group('replica')
+def replica_command():
+    """
+    只读副本工具
+    """
+
+
+@replica_command.command('sync')
+@click.argument('names', nargs=-1)
+@click.option('--interval', type=float, default=None,
+              help='每隔多少秒同步一次并持续运行（模拟复制延迟），不指定时只同步一次')
+@with_appcontext
+def replica_sync_command(names, interval):
+    """
+    把主库复制到 SQLite 副本文件（本地测试读写分离用），默认同步 DATABASE_REPLICAS 中的全部副本
+    """
+    names = names or current_app.config.get('DATABASE_REPLICAS') or []
+    if not names:
+        raise click.ClickException('没有配置只读副本（DATABASE_REPLICA_URLS 或 SQLALCHEMY_BINDS + DATABASE_REPLICAS）')
+    source = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    binds = current_app.config.get('SQLALCHEMY_BINDS') or {}
+    targets = []
+    for name in names:
+        if name not in binds:
+            raise click.ClickException(f'未知的副本: {name}')
+        url = make_url(binds[name])
+        if source.get_backend_name() != 'sqlite' or url.get_backend_name() != 'sqlite':
+            raise click.ClickException('flask replica sync 只支持 SQLite 文件；其他数据库请使用数据库自带的复制')
+        targets.append((name, url.database))
+
+    while True:
+        for name, path in targets:
+            start = time.perf_counter()
+            copy_sqlite_database(source.database, path)
+            click.echo(f'已同步 {name} -> {path}（{(time.perf_counter() - start) * 1000:.0f} ms）')
+        if interval is None:
+            break
+        time.sleep(interval)
+
+
+@click.command('worker')
+@click.option('--processes', type=int, default=2, show_default=True, help='同时执行任务的子进程数')
+@click.option('--queue', 'queues', multiple=True, help='只处理指定的队列，可重复；默认处理所有队列')
+@click.option('--poll-interval', type=float, default=1.0, show_default=True, help='没有任务时的轮询间隔（秒）')
+@click.option('--once', is_flag=True, help='执行完当前所有到期的任务后退出')
+@with_appcontext
+def worker_command(processes, queues, poll_interval, once):
+    """
+    执行后台任务队列（job 表）中的任务，Ctrl+C / SIGTERM 时执行完当前任务后退出
+    """
+    worker = Worker(current_app._get_current_object(), processes=processes, queues=queues,
+                    poll_interval=poll_interval)
+    click.echo(f"任务 worker {worker.worker_id} 已启动：{worker.processes} 个进程，"
+               f"队列 {', '.join(queues) if queues else '全部'}", err=True)
+    counts = worker.run(once=once)
+    click.echo(f"任务 worker 已退出：完成 {counts['done']}，重试 {counts['retry']}，失败 {counts['failed']}", err=True)
+
+
+def register_commands(app):
+    """
+    集中注册顶层命令，与 register_blueprints 对应
+    """
+    app.cli.add_command(import_command)
+    app.cli.add_command(replica_command)
+    app.cli.add_command(worker_command)
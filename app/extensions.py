@@ -1,7 +1,35 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
+from app.utils.cache import ResponseCache
+from app.utils.compression import Compression
+from app.utils.hashing import PasswordHasher
+from app.utils.jobs import JobQueue
+from app.utils.metrics import Metrics
+from app.utils.query_monitor import QueryMonitor
+from app.utils.rate_limit import RateLimiter
+from app.utils.replicas import ReplicaRouter, RoutingSession
+from app.utils.table_versions import TableVersions
 
 # 这里只进行实例化，不传入 app 对象
 # app 对象将在工厂函数中与这些实例绑定
-db = SQLAlchemy()
-migrate = Migrate()
\ No newline at end of file
+# RoutingSession：@read_only 请求中的 SELECT 发往只读副本（见 app/utils/replicas.py）
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+migrate = Migrate()
+# 公开 GET 接口的响应缓存
+cache = ResponseCache()
+# 密码哈希工作池
+password_hasher = PasswordHasher()
+# 请求与 SQL 指标（GET /metrics）
+metrics = Metrics()
+# 慢查询日志与 N+1 检测
+query_monitor = QueryMonitor()
+# 表级变更计数器与条件请求（ETag / Last-Modified）
+table_versions = TableVersions()
+# 响应 gzip 压缩
+compression = Compression()
+# 跨 worker 的限流与并发控制
+rate_limiter = RateLimiter()
+# 读写分离（只读副本）
+replicas = ReplicaRouter()
+# 本地持久化任务队列（flask worker 执行）
+job_queue = JobQueue()
@@ -11,6 +11,7 @@ def register_blueprints(app):
     # --- 新增 ---
     from .example import example
     # --- 结束 ---
+    from .storage import storage
     
     # 假设未来有 message 模块
     # from .message import message
@@ -20,5 +21,7 @@ def register_blueprints(app):
     # --- 新增 ---
     app.register_blueprint(example, url_prefix='/api/example')
     # --- 结束 ---
+    # 存储模块目前只提供命令行工具（flask storage gc），没有 HTTP 路由
+    app.register_blueprint(storage, url_prefix='/api/storage')
     
     # app.register_blueprint(message, url_prefix='/api/message')
@@ -8,5 +8,5 @@ class UserModel(db.Model):
     password = db.Column(db.String(128))
     is_admin = db.Column(db.Boolean, default=False, nullable=False)
     
-    #新增用户头像字段
+    #新增用户头像字段（保存内容寻址存储的 content_id，旧数据中为完整 URL）
     avatar = db.Column(db.String(128), nullable=True)
\ No newline at end of file
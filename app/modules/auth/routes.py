@@ -1,18 +1,24 @@
 # app/auth.py
-from flask import Blueprint, request, jsonify, session,current_app,send_from_directory,g
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, request, jsonify, session,current_app,g
 from .models import UserModel
-from app.extensions import db
+from app.extensions import db, password_hasher
 from app.utils.exception_handler import APIException # <-- 导入自定义异常
 from app.utils.response_handler import SuccessResponse # <-- 导入成功响应函数
 from sqlalchemy import or_ # <--- 新增这一行
 import os # 需要 os 模块来拼接路径
-from app.utils.decorators import login_required
+from app.utils.decorators import login_required, rate_limit, read_only
+from app.utils.identity import load_identity, invalidate_identity
+from app.modules.storage.service import store_upload, add_ref, replace_ref, public_url, blob_path, send_upload
+from app.utils.pagination import keyset_paginate, decode_cursor
+from app.modules.storage.derivatives import derivative_pipeline
 
 # auth = Blueprint('auth', __name__)
 from . import auth
 
 @auth.route('/register', methods=['POST'])
+@rate_limit('5/minute', per='ip')
+# 注册与登录都要计算密码哈希，共用并发名额，最多占用两个 worker
+@rate_limit(group='password_hash', concurrency=2)
 def register():
     data = request.get_json()
     username = data.get('username')
@@ -28,7 +34,8 @@ def register():
     
     new_user = UserModel(
         username=username,
-        password=generate_password_hash(password)
+        # 在有界的哈希进程池中计算，池满时快速返回 503
+        password=password_hasher.hash(password)
     )
     db.session.add(new_user)
     db.session.commit()
@@ -37,6 +44,8 @@ def register():
     return SuccessResponse(message="注册成功")
 
 @auth.route('/login', methods=['POST'])
+@rate_limit('10/minute', per='ip')
+@rate_limit(group='password_hash', concurrency=2)
 def login():
     data = request.get_json()
     username = data.get('username')
@@ -47,10 +56,17 @@ def login():
 
     user = UserModel.query.filter_by(username=username).first()
 
-    if not user or not check_password_hash(user.password, password):
+    if not user or not password_hasher.verify(user.password, password):
         raise APIException("用户名或密码错误", status_code=401,error_code=2002)
+
+    # 哈希参数已更新时，趁用户提供明文密码的机会透明地重新哈希
+    if password_hasher.needs_rehash(user.password):
+        user.password = password_hasher.hash(password)
+        db.session.commit()
         
     session['user_id'] = user.id
+    # 登录后重新建立身份缓存
+    invalidate_identity(user.id)
     user_data = {"id": user.id, "username": user.username}
     # 使用新的辅助函数返回成功响应
     return SuccessResponse(data=user_data, message="登录成功")
@@ -62,11 +78,12 @@ def logout():
     return SuccessResponse(message="已成功登出")
 
 @auth.route('/status', methods=['GET'])
+@read_only
 def status():
     user_id = session.get('user_id')
     if user_id:
-        # TODO: 根据 user_id 查询用户 (1 行代码)
-        user = UserModel.query.get(user_id)
+        # 根据 user_id 获取用户身份（优先使用身份缓存）
+        user = load_identity(user_id)
         if user:
             # return jsonify({
             #     "logged_in": True,
@@ -74,7 +91,13 @@ def status():
             # })
             return SuccessResponse(data={
                 "logged_in": True,
-                "user": {"id": user.id, "username": user.username,"avatar":user.avatar}
+                "user": {
+                    "id": user.id,
+                    "username": user.username,
+                    # 页面上显示的头像使用小尺寸缩略图，原图地址单独返回
+                    "avatar": derivative_pipeline.url(user.avatar, 'small', '/api/auth/uploads'),
+                    "avatar_original": public_url(user.avatar, '/api/auth/uploads')
+                }
             },message="已登录")
         raise APIException("用户已删除", status_code=404,error_code=3001)
     # return jsonify({"logged_in": False})
@@ -83,16 +106,26 @@ def status():
     },message="未登录")
 
 @auth.route('/users', methods=['GET'])
+@read_only
 def list_users():
+    """
+    用户列表，支持页码分页与游标分页（mode=cursor 或 cursor=<游标>，按 id 升序）
+    """
     # 1.从路由获取分页参数
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
     except TypeError:
         raise APIException('分页参数格式不正确', status_code=400, error_code=1002)
+    cursor = request.args.get('cursor', '', type=str)
+    cursor_mode = bool(cursor) or request.args.get('mode', '', type=str) == 'cursor'
     
     # 2.从路由获取查询参数
     search_keyword = request.args.get('search', '', type=str)
+    if cursor:
+        # 游标中携带了首次查询时的搜索条件
+        _, _, filters = decode_cursor(cursor)
+        search_keyword = filters.get('search', '')
     
     # 3.从进行数据库查询
     base_query = UserModel.query
@@ -102,6 +135,25 @@ def list_users():
             UserModel.username.like(f'%{search_keyword}%')
         )
     )
+
+    if cursor_mode:
+        # 游标分页：按主键升序做范围扫描，不执行 OFFSET
+        user_rows, pagination_data = keyset_paginate(
+            base_query,
+            columns=[UserModel.id],
+            key_func=lambda user: (user.id,),
+            per_page=max(per_page, 1),
+            cursor=cursor,
+            filters={'search': search_keyword},
+            descending=False,
+            with_count=request.args.get('with_count', 0, type=int) == 1
+        )
+        users = [{"id": user.id, "username": user.username} for user in user_rows]
+        return SuccessResponse(
+            data={'list': users, 'pagination': pagination_data},
+            message="用户列表获取成功"
+        )
+
     # 使用 base_query 进行分页查询
     pagination = base_query.paginate(
         page=page, 
@@ -136,6 +188,8 @@ def list_users():
     return SuccessResponse(data=response_data,message="用户列表获取成功")
 
 @auth.route('/upload-simple', methods=['POST'])
+@rate_limit('20/minute', per='ip')
+@rate_limit(group='upload', concurrency=2)
 def upload_simple():
     """
     一个最简化的文件上传演示接口。
@@ -150,31 +204,31 @@ def upload_simple():
     #    例如: "my_photo.jpg"
     original_filename = file_obj.filename
 
-    # 3. 准备保存路径
-    #    从配置中获取目标文件夹
-    upload_dir = current_app.config['UPLOAD_FOLDER']
-    #    使用 os.path.join 将文件夹路径和文件名拼接起来
-    save_path = os.path.join(upload_dir, original_filename)
+    # 3. 流式保存到内容寻址存储，得到 content_id（相同内容只保存一份）
+    content_id = store_upload(file_obj, original_filename)
 
-    # 4. 执行保存动作
-    file_obj.save(save_path)
+    # 4. 演示接口上传的文件没有业务数据引用，计一次引用，避免被 flask storage gc 回收
+    add_ref(content_id)
+    db.session.commit()
     
     # 5. 返回成功响应
     return SuccessResponse(
         message="文件上传成功",
         data={
-            'saved_filename': original_filename,
-            'saved_path_on_server': save_path
+            'saved_filename': content_id,
+            'saved_path_on_server': blob_path(content_id),
+            'url': public_url(content_id, '/api/auth/uploads')
         }
     )
 
 @auth.route('/upload-avatar', methods=['POST'])
 @login_required
+@rate_limit('20/minute', per='user')
+@rate_limit(group='upload', concurrency=2)
 def upload_avatar():
     """
     这是一个用于上传用户头像的接口示例。
     """
-    print(f"当前登录用户ID: {g.user.id}")
     # 从 request.files 中获取文件对象
     file_obj = request.files['file']
 
@@ -187,25 +241,28 @@ def upload_avatar():
     if ext.lower() not in ['.jpg', '.jpeg', '.png', '.gif']:
         raise APIException("不支持的文件格式，仅支持 jpg, jpeg, png, gif 格式", status_code=400, error_code=1003)
     
-    # 准备保存路径
-    upload_dir = current_app.config['UPLOAD_FOLDER']
-    # 定义新的文件名，格式为 user_<用户ID>_avatar.<扩展名>
-    new_filename = f"user_{g.user.id}_avatar{ext}"
-
-    # 使用 os.path.join 将文件夹路径和文件名拼接起来
-    save_path = os.path.join(upload_dir, new_filename)
+    # 流式保存到内容寻址存储，得到 content_id
+    content_id = store_upload(file_obj, original_filename)
 
-    # 执行保存动作
-    file_obj.save(save_path)
-    g.user.avatar = f'http://127.0.0.1:5000/api/auth/uploads/{new_filename}'
+    # g.user 只是缓存的身份信息，修改数据需要加载用户模型
+    user = db.session.get(UserModel, g.user.id)
+    # 头像字段只保存 content_id，并把引用从旧头像转移到新头像
+    replace_ref(user.avatar, content_id)
+    user.avatar = content_id
+    # 生成头像缩略图的任务与头像修改在同一个事务中提交，由 flask worker 执行，接口立即返回
+    derivative_pipeline.enqueue(content_id)
+    # 提交后由 UserModel 的修改事件使身份缓存失效（app/utils/identity.py）
     db.session.commit()
 
     # 返回成功响应
     return SuccessResponse(
         message="文件上传成功",
         data={
-            'saved_filename': new_filename,
-            'saved_path_on_server': save_path
+            'saved_filename': content_id,
+            'saved_path_on_server': blob_path(content_id),
+            'avatar': derivative_pipeline.url(content_id, 'small', '/api/auth/uploads'),
+            'avatar_original': public_url(content_id, '/api/auth/uploads'),
+            'avatar_variants': derivative_pipeline.urls(content_id, '/api/auth/uploads')
         }
     )
 
@@ -213,5 +270,6 @@ def upload_avatar():
 # 添加一个用于提供上传文件的路由
 @auth.route('/uploads/<path:filename>')
 def serve_uploaded_file(filename):
-    # 使用 send_from_directory 函数安全地从指定目录提供文件
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
\ No newline at end of file
+    # 与 /api/example/uploads 共用同一套实现（ETag、304、Range、X-Sendfile）
+    # ?variant=thumb|small|medium 返回对应尺寸的缩略图
+    return send_upload(filename, request.args.get('variant'))
@@ -9,3 +9,6 @@ example = Blueprint('example', __name__)
 #    这行代码必须放在蓝图创建之后，以防止循环导入
 #    当 app 注册这个蓝图时，routes.py 中定义的路由就会被加载
 from . import routes
+
+# 3. 导入命令行工具，注册到 flask example 分组下
+from . import commands
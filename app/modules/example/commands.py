@@ -0,0 +1,92 @@
+# app/modules/example/commands.py
+"""
+example 模块的命令行工具
+挂载在蓝图的 cli 分组下，使用方式: flask example <命令>
+"""
+import sys
+
+import click
+from flask import current_app
+
+from app.extensions import cache
+from . import example
+from .search import rebuild_search_index
+from .models import reconcile_item_counts
+from .export import EXPORT_FORMATS, generate_export, parse_updated_since
+from .query_plans import audit_query_plans
+
+
+@example.cli.command('rebuild-search-index')
+def rebuild_search_index_command():
+    """
+    创建并回填项目全文检索索引（FTS5）
+    """
+    indexed = rebuild_search_index()
+    cache.invalidate('items')
+    click.echo(f'全文索引重建完成，共索引 {indexed} 个项目')
+
+
+@example.cli.command('reconcile-item-counts')
+def reconcile_item_counts_command():
+    """
+    根据 example_item 的实际数据修复分类的 item_count
+    """
+    repaired = reconcile_item_counts()
+    cache.invalidate('categories')
+    click.echo(f'分类计数校正完成，修复了 {repaired} 个分类')
+
+
+@example.cli.command('export-items')
+@click.option('--format', 'fmt', type=click.Choice(EXPORT_FORMATS), default='ndjson', help='导出格式')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), default=None, help='输出文件，默认输出到标准输出')
+@click.option('--search', default='', help='按名称或描述搜索')
+@click.option('--category-id', type=int, default=None, help='按分类过滤')
+@click.option('--user-id', type=int, default=None, help='按用户过滤')
+@click.option('--updated-since', default=None, help='只导出此时间（ISO 8601）之后创建或修改的项目')
+@click.option('--batch-size', type=int, default=None, help='每次从数据库读取的行数')
+def export_items_command(fmt, output, search, category_id, user_id, updated_since, batch_size):
+    """
+    流式导出示例项目（NDJSON / CSV），用于定时全量或增量导出
+    """
+    try:
+        since = parse_updated_since(updated_since)
+    except ValueError:
+        raise click.BadParameter('必须是 ISO 8601 格式的时间', param_hint='--updated-since')
+
+    filters = {'search': search, 'category_id': category_id, 'user_id': user_id}
+    chunks = generate_export(fmt, filters, since, batch_size or current_app.config['EXPORT_BATCH_SIZE'])
+    stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+    if output:
+        click.echo(f'导出完成: {output}', err=True)
+
+
+@example.cli.command('audit-query-plans')
+@click.option('--verbose', '-v', is_flag=True, help='同时输出合格语句的执行计划')
+def audit_query_plans_command(verbose):
+    """
+    检查列表接口各种过滤组合的执行计划，出现全表扫描或临时 B 树排序时以非零状态退出
+    """
+    try:
+        cases = audit_query_plans()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+
+    failed = [case for case in cases if case.problems]
+    for case in cases:
+        click.echo(f"{'FAIL' if case.problems else 'OK  '} {case.label}")
+        if case.problems or verbose:
+            for detail in case.plan:
+                click.echo(f'       {detail}')
+        for problem in case.problems:
+            click.echo(f'    -> {problem}')
+
+    if failed:
+        click.echo(f'\n{len(failed)}/{len(cases)} 条语句的执行计划不合格（缺少索引时请先执行 flask db upgrade）', err=True)
+        sys.exit(1)
+    click.echo(f'\n全部 {len(cases)} 条语句的执行计划合格')
@@ -0,0 +1,122 @@
+# app/modules/example/export.py
+"""
+示例项目的流式导出（NDJSON / CSV）
+
+通过分页接口导出全表时，每一页都要重新执行 OFFSET 和 COUNT，并加载完整的 ORM 对象。
+这里的做法：
+- 按主键 id 升序做键集分块（WHERE id > 上一块最后的 id LIMIT batch_size），
+  每块都是一次索引范围扫描，越往后不会越慢
+- 只查询导出需要的列（通过外连接带出作者名和分类名），返回普通元组，
+  不创建 ORM 对象，也不会在 session 的 identity map 中累积
+- 每块数据直接序列化为 NDJSON / CSV 文本并 yield，内存占用与表大小无关
+
+HTTP 接口（GET /api/example/item/export）与命令行（flask example export-items）共用这里的实现。
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import func
+
+from app.extensions import db
+from app.modules.storage.service import public_url
+from .models import ExampleItem
+from .queries import apply_item_filters, select_item_rows
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+
+# 导出的字段，顺序即 CSV 的列顺序
+EXPORT_FIELDS = (
+    'id', 'name', 'description', 'timestamp', 'updated_at', 'file_url',
+    'user_id', 'category_id', 'author_username', 'category_name',
+)
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def parse_updated_since(value):
+    """
+    解析 updated_since 水位线（ISO 8601，例如 2024-01-01 或 2024-01-01T08:00:00）
+    为空时返回 None；格式不正确时抛出 ValueError
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value)
+
+
+def _build_statement(filters, updated_since):
+    statement = apply_item_filters(
+        select_item_rows(),
+        search_keyword=filters.get('search'),
+        category_id=filters.get('category_id'),
+        user_id=filters.get('user_id'),
+    )
+    if updated_since is not None:
+        # 添加 updated_at 之前的旧数据没有修改时间，按创建时间计算
+        statement = statement.where(
+            func.coalesce(ExampleItem.updated_at, ExampleItem.timestamp) >= updated_since)
+    return statement.order_by(ExampleItem.id)
+
+
+def iter_item_rows(filters=None, updated_since=None, batch_size=1000):
+    """
+    按 id 升序分块读取项目，逐块产出字典列表
+    :param filters: 与列表接口相同的过滤条件 {'search', 'category_id', 'user_id'}
+    :param updated_since: 只导出在此时间之后创建或修改的项目
+    """
+    statement = _build_statement(filters or {}, updated_since)
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            statement.where(ExampleItem.id > last_id).limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield [_row_to_dict(row) for row in rows]
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1].id
+
+
+def _row_to_dict(row):
+    return {
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        'file_url': public_url(row.file_url),
+        'user_id': row.user_id,
+        'category_id': row.category_id,
+        'author_username': row.author_username or '未知用户',
+        'category_name': row.category_name or '未分类',
+    }
+
+
+def generate_export(fmt, filters=None, updated_since=None, batch_size=1000):
+    """
+    导出内容的生成器，每块数据产出一段文本
+    :param fmt: ndjson 或 csv
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'不支持的导出格式: {fmt}')
+
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, lineterminator='\n')
+        writer.writeheader()
+        yield buffer.getvalue()
+        for batch in iter_item_rows(filters, updated_since, batch_size):
+            # 复用同一个缓冲区，每块写完后清空
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(batch)
+            yield buffer.getvalue()
+        return
+
+    for batch in iter_item_rows(filters, updated_since, batch_size):
+        yield ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in batch)
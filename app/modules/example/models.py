@@ -1,8 +1,11 @@
 # app/modules/example/models.py
 from app.extensions import db
 from datetime import datetime
+from sqlalchemy import event, inspect, update, select, func, bindparam
 # 导入 UserModel，用于建立外键关联
 from app.modules.auth.models import UserModel 
+from app.modules.storage.service import public_url
+from app.modules.storage.derivatives import derivative_pipeline
 
 """
 示例模块的数据库模型定义
@@ -29,6 +32,10 @@ class ExampleCategory(db.Model):
     # lazy='dynamic' 表示关联的对象（items）将作为查询对象返回，而不是直接加载，这在大数据量时更高效
     items = db.relationship('ExampleItem', backref='category', lazy='dynamic')
 
+    # 反范式化的项目数量，避免列表接口对每个分类执行一次 COUNT 查询
+    # 由下方的 ORM 事件在同一事务中维护；出现偏差时可执行 flask example reconcile-item-counts 修复
+    item_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     def __repr__(self):
         return f'<ExampleCategory {self.name}>'
 
@@ -42,8 +49,10 @@ class ExampleItem(db.Model):
     name = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=True)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.now)
+    # 最后修改时间，每次写入时自动更新，用于增量导出（updated_since）
+    updated_at = db.Column(db.DateTime, index=True, default=datetime.now, onupdate=datetime.now)
     
-    # 用于演示文件上传，存储文件的访问 URL
+    # 用于演示文件上传，存储文件的 content_id（旧数据中为完整访问 URL）
     file_url = db.Column(db.String(255), nullable=True)
     
     # --- 外键定义 ---
@@ -62,6 +71,15 @@ class ExampleItem(db.Model):
     # 这样我们就可以通过 user.example_items 访问该用户所有的 ExampleItem
     author = db.relationship('UserModel', backref=db.backref('example_items', lazy='dynamic'))
 
+    # 复合索引：列表接口按分类/用户过滤并按时间倒序排列，一次索引范围扫描即可按顺序取出一页
+    # （SQLite 的二级索引末尾隐含 rowid，也覆盖游标分页的 (timestamp, id) 排序）；
+    # category.items、user.example_items 按外键查找时同样使用这两个索引的前缀
+    # 可用 flask example audit-query-plans 检查各种过滤组合的执行计划
+    __table_args__ = (
+        db.Index('ix_example_item_category_id_timestamp', 'category_id', 'timestamp'),
+        db.Index('ix_example_item_user_id_timestamp', 'user_id', 'timestamp'),
+    )
+
     def to_dict(self):
         """
         辅助方法：将模型对象转换为字典，方便 API 返回
@@ -71,7 +89,11 @@ class ExampleItem(db.Model):
             'name': self.name,
             'description': self.description,
             'timestamp': self.timestamp.isoformat(), # 转换为 ISO 格式字符串
-            'file_url': self.file_url,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'file_url': public_url(self.file_url),
+            # 图片附件的缩略图地址，列表中显示缩略图即可，不必下载原图
+            'thumbnail_url': derivative_pipeline.urls(self.file_url).get('small'),
+            'file_variants': derivative_pipeline.urls(self.file_url),
             'user_id': self.user_id,
             'category_id': self.category_id,
             # 演示如何从关系中获取数据
@@ -81,3 +103,71 @@ class ExampleItem(db.Model):
 
     def __repr__(self):
         return f'<ExampleItem {self.name}>'
+
+
+# === 分类项目计数维护 ===
+
+def adjust_item_counts(connection, deltas):
+    """
+    按 {category_id: 增量} 批量调整分类的 item_count
+    使用 item_count = item_count + n 的原子更新，在调用方的事务中执行
+    """
+    merged = {}
+    for category_id, delta in deltas.items():
+        if category_id is None:
+            continue
+        merged[int(category_id)] = merged.get(int(category_id), 0) + delta
+
+    params = [{'b_id': category_id, 'b_delta': delta} for category_id, delta in merged.items() if delta]
+    if not params:
+        return
+    # 涉及多个分类时以 executemany 的方式执行同一条语句
+    table = ExampleCategory.__table__
+    connection.execute(
+        update(table)
+        .where(table.c.id == bindparam('b_id'))
+        .values(item_count=table.c.item_count + bindparam('b_delta')),
+        params
+    )
+
+
+@event.listens_for(ExampleItem, 'after_insert')
+def _item_inserted(mapper, connection, target):
+    adjust_item_counts(connection, {target.category_id: 1})
+
+
+@event.listens_for(ExampleItem, 'after_delete')
+def _item_deleted(mapper, connection, target):
+    adjust_item_counts(connection, {target.category_id: -1})
+
+
+@event.listens_for(ExampleItem, 'after_update')
+def _item_updated(mapper, connection, target):
+    # 只有分类发生变化时，才需要把计数从旧分类挪到新分类
+    history = inspect(target).attrs.category_id.history
+    if history.deleted and history.added:
+        old_id, new_id = history.deleted[0], history.added[0]
+        if old_id is not None and new_id is not None and int(old_id) != int(new_id):
+            adjust_item_counts(connection, {old_id: -1, new_id: 1})
+
+
+def reconcile_item_counts():
+    """
+    用一次分组聚合重新计算所有分类的 item_count，修复计数偏差
+    :return: 被修复的分类数量
+    """
+    category = ExampleCategory.__table__
+    item = ExampleItem.__table__
+    actual = (
+        select(func.count(item.c.id))
+        .where(item.c.category_id == category.c.id)
+        .scalar_subquery()
+    )
+    # 只更新计数不一致的分类，返回受影响的行数
+    result = db.session.execute(
+        update(category)
+        .where(category.c.item_count != actual)
+        .values(item_count=actual)
+    )
+    db.session.commit()
+    return result.rowcount
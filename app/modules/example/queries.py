@@ -0,0 +1,110 @@
+# app/modules/example/queries.py
+"""
+示例项目的查询构建工具，供列表接口、导出等多处复用
+"""
+from sqlalchemy import or_, select, func, null, literal
+
+from app.modules.auth.models import UserModel
+from app.modules.storage.service import public_url
+from app.modules.storage.derivatives import derivative_pipeline
+from .models import ExampleCategory, ExampleItem
+from .search import search_index_available, search_subquery
+
+
+def apply_item_filters(query, search_keyword=None, category_id=None, user_id=None, order_by_rank=False):
+    """
+    为项目查询应用搜索和过滤条件（列表、游标分页、导出共用）
+    query 可以是 Model.query，也可以是 select(...) 语句
+    :param order_by_rank: 有搜索关键词时，是否先按全文检索相关度排序
+    """
+    if search_keyword:
+        matches = search_subquery(search_keyword) if search_index_available() else None
+        if matches is not None:
+            # 优先使用 FTS5 全文索引，避免对 description 做全表 LIKE 扫描
+            query = query.join(matches, matches.c.item_id == ExampleItem.id)
+            if order_by_rank:
+                query = query.order_by(matches.c.rank)
+        else:
+            # 回退: 搜索名称或描述（未建立全文索引，或关键词少于三个字符）
+            query = query.filter(
+                or_(
+                    ExampleItem.name.like(f'%{search_keyword}%'),
+                    ExampleItem.description.like(f'%{search_keyword}%')
+                )
+            )
+
+    if category_id:
+        # 演示: 按分类ID过滤
+        query = query.filter(ExampleItem.category_id == category_id)
+
+    if user_id:
+        # 演示: 按用户ID过滤
+        query = query.filter(ExampleItem.user_id == user_id)
+    return query
+
+
+def select_item_ids(search_keyword=None, category_id=None, user_id=None):
+    """
+    只带过滤条件、不带外连接的项目 id 查询，用于统计列表总数：
+    SQLite 可以直接用 (category_id, timestamp) 等索引计数，不必读取表中的描述等大字段
+    """
+    return apply_item_filters(select(ExampleItem.id), search_keyword, category_id, user_id)
+
+
+def select_item_rows(description_length=None):
+    """
+    列表类接口使用的投影查询：只选取响应需要的列，结果是普通的行元组，
+    不创建 ORM 对象（不加载用户的密码哈希，也不进入 session 的 identity map）
+    :param description_length: None 返回完整描述；0 不查询描述；
+                               正数时在数据库中截断为前 n 个字符，长文本不会被读出
+    """
+    if description_length is None:
+        description = ExampleItem.description
+        truncated = literal(False)
+    elif description_length <= 0:
+        description = null()
+        truncated = ExampleItem.description.isnot(None)
+    else:
+        description = func.substr(ExampleItem.description, 1, description_length)
+        truncated = func.coalesce(func.length(ExampleItem.description) > description_length, False)
+
+    return (
+        select(
+            ExampleItem.id,
+            ExampleItem.name,
+            description.label('description'),
+            truncated.label('description_truncated'),
+            ExampleItem.timestamp,
+            ExampleItem.updated_at,
+            ExampleItem.file_url,
+            ExampleItem.user_id,
+            ExampleItem.category_id,
+            UserModel.username.label('author_username'),
+            ExampleCategory.name.label('category_name'),
+        )
+        .select_from(ExampleItem)
+        .outerjoin(UserModel, UserModel.id == ExampleItem.user_id)
+        .outerjoin(ExampleCategory, ExampleCategory.id == ExampleItem.category_id)
+    )
+
+
+def item_row_to_dict(row):
+    """
+    把 select_item_rows() 的结果行转换为与 ExampleItem.to_dict() 相同结构的字典
+    """
+    variants = derivative_pipeline.urls(row.file_url)
+    return {
+        'id': row.id,
+        'name': row.name,
+        'description': row.description,
+        'description_truncated': bool(row.description_truncated),
+        'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        'file_url': public_url(row.file_url),
+        'thumbnail_url': variants.get('small'),
+        'file_variants': variants,
+        'user_id': row.user_id,
+        'category_id': row.category_id,
+        'author_username': row.author_username or '未知用户',
+        'category_name': row.category_name or '未分类',
+    }
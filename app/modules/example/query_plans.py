@@ -0,0 +1,152 @@
+# app/modules/example/query_plans.py
+"""
+项目查询的执行计划审计（仅 SQLite）
+
+按列表接口实际使用的查询构建方式（select_item_rows + apply_item_filters + 分页工具），
+为每一种过滤组合（search / category_id / user_id）生成页码分页、COUNT、游标分页各页的语句，
+其中 search 分别取走全文索引的关键词和少于三个字符、回退到 LIKE 的关键词，
+再加上 category.items、user.example_items、按主键读取等外键查找，逐条执行 EXPLAIN QUERY PLAN。
+
+出现以下情况视为不合格：
+- 对普通表的全表扫描（SCAN <表> 且没有使用索引）；LIKE 回退且没有其他过滤条件时，
+  扫描 example_item 无法避免，不计为问题
+- 有过滤条件时仍然扫描整个 example_item 索引（过滤条件没有用上索引）
+- 使用临时 B 树排序（USE TEMP B-TREE），按全文检索相关度排序的搜索结果除外
+"""
+import itertools
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.utils.pagination import count_statement, keyset_page_query
+from .models import ExampleItem
+from .queries import apply_item_filters, select_item_ids, select_item_rows
+
+# 审计时使用的示例参数，执行计划与具体取值无关
+SAMPLE_SEARCH = 'test'
+SAMPLE_SHORT_SEARCH = '测试'    # 少于三个字符，走 LIKE 回退
+SAMPLE_ID = 1
+SAMPLE_PER_PAGE = 20
+
+
+class PlanCase:
+    """
+    一条待审计的语句
+    :param filtered: 是否带有 example_item 上的等值过滤条件（此时不允许扫描整个索引）
+    :param allow_sort: 是否允许临时 B 树排序
+    :param allow_scan: 是否允许不使用索引扫描 example_item（没有其他过滤条件的 LIKE 搜索）
+    """
+    def __init__(self, label, statement, filtered=False, allow_sort=False, allow_scan=False):
+        self.label = label
+        self.statement = statement
+        self.filtered = filtered
+        self.allow_sort = allow_sort
+        self.allow_scan = allow_scan
+        self.plan = []
+        self.problems = []
+
+
+def _filter_combinations():
+    for search, category_id, user_id in itertools.product((None, SAMPLE_SEARCH, SAMPLE_SHORT_SEARCH),
+                                                          (None, SAMPLE_ID), (None, SAMPLE_ID)):
+        filters = {'search': search, 'category_id': category_id, 'user_id': user_id}
+        label = ', '.join(f'{k}={v}' for k, v in filters.items() if v) or '无过滤'
+        yield label, filters
+
+
+def build_cases():
+    """
+    生成列表接口各种过滤组合、各分页方式以及外键查找的待审计语句
+    """
+    cases = []
+    cursor_columns = [ExampleItem.timestamp, ExampleItem.id]
+    cursor_values = [datetime(2024, 1, 1), SAMPLE_ID]
+    for label, filters in _filter_combinations():
+        filtered = bool(filters['category_id'] or filters['user_id'])
+        # 只有走全文索引的搜索才按相关度排序；LIKE 回退不排序，但没有其他过滤条件时只能扫描整张表
+        ranked = filters['search'] == SAMPLE_SEARCH
+        scanned = filters['search'] == SAMPLE_SHORT_SEARCH and not filtered
+
+        def base(order_by_rank):
+            return apply_item_filters(
+                select_item_rows(),
+                search_keyword=filters['search'],
+                category_id=filters['category_id'],
+                user_id=filters['user_id'],
+                order_by_rank=order_by_rank,
+            )
+
+        # 页码分页（与 list_items 相同：有搜索时先按相关度排序）
+        page = base(order_by_rank=True).order_by(ExampleItem.timestamp.desc())
+        cases.append(PlanCase(f'[页码分页] {label}', page.limit(SAMPLE_PER_PAGE).offset(SAMPLE_PER_PAGE),
+                              filtered, allow_sort=ranked, allow_scan=scanned))
+        count = select_item_ids(filters['search'], filters['category_id'], filters['user_id'])
+        cases.append(PlanCase(f'[总数] {label}', count_statement(count), filtered, allow_scan=scanned))
+
+        # 游标分页：第一页、下一页、上一页
+        for direction, values in (('first', None), ('next', cursor_values), ('prev', cursor_values)):
+            statement = keyset_page_query(base(order_by_rank=False), cursor_columns, values,
+                                          'next' if direction == 'first' else direction)
+            cases.append(PlanCase(f'[游标分页 {direction}] {label}', statement.limit(SAMPLE_PER_PAGE + 1),
+                                  filtered, allow_sort=ranked, allow_scan=scanned))
+
+    # 外键与主键查找：category.items、user.example_items、permission_required 中的 query.get
+    cases.append(PlanCase('[关联] category.items',
+                          select(ExampleItem).where(ExampleItem.category_id == SAMPLE_ID), filtered=True))
+    cases.append(PlanCase('[关联] user.example_items',
+                          select(ExampleItem).where(ExampleItem.user_id == SAMPLE_ID), filtered=True))
+    cases.append(PlanCase('[主键] ExampleItem.query.get',
+                          select(ExampleItem).where(ExampleItem.id == SAMPLE_ID), filtered=True))
+    return cases
+
+
+def explain(connection, statement):
+    """
+    对语句执行 EXPLAIN QUERY PLAN，返回每一步的描述
+    """
+    dialect = connection.dialect
+    compiled = statement.compile(dialect=dialect)
+    params = compiled.construct_params()
+    values = []
+    for name in compiled.positiontup:
+        value = params[name]
+        processor = compiled.binds[name].type.bind_processor(dialect)
+        values.append(processor(value) if processor else value)
+    rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}', tuple(values)).all()
+    # 每行为 (id, parent, notused, detail)
+    return [row[-1] for row in rows]
+
+
+def check_plan(case, tables):
+    """
+    按模块说明中的规则检查执行计划，返回发现的问题列表
+    """
+    problems = []
+    for detail in case.plan:
+        words = detail.split()
+        if words[0] == 'SCAN' and len(words) > 1 and words[1] in tables:
+            if 'USING' not in words:
+                if not (case.allow_scan and words[1] == ExampleItem.__tablename__):
+                    problems.append(f'全表扫描: {detail}')
+            elif case.filtered and words[1] == ExampleItem.__tablename__:
+                problems.append(f'过滤条件没有用上索引: {detail}')
+        if 'TEMP B-TREE' in detail and not case.allow_sort:
+            problems.append(f'临时 B 树排序: {detail}')
+    return problems
+
+
+def audit_query_plans():
+    """
+    审计所有语句的执行计划
+    :return: PlanCase 列表，每项带有 plan 与 problems
+    """
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        raise RuntimeError('执行计划审计目前只支持 SQLite')
+    tables = set(db.metadata.tables)
+    cases = build_cases()
+    for case in cases:
+        case.plan = explain(connection, case.statement)
+        case.problems = check_plan(case, tables)
+    return cases
@@ -1,20 +1,27 @@
 # app/modules/example/routes.py
 import os
-from flask import request, g, current_app, send_from_directory
+from flask import request, g, current_app, stream_with_context
 from sqlalchemy.orm import joinedload # 用于优化关联查询
-from sqlalchemy import or_ # 用于实现 OR 条件查询
+from sqlalchemy import select, insert, update, delete # 批量接口使用的语句构造
+from collections import Counter
 
 # 导入蓝图对象
 from . import example
 # 导入数据库模型
-from .models import ExampleCategory, ExampleItem
+from .models import ExampleCategory, ExampleItem, adjust_item_counts
+from .queries import apply_item_filters, select_item_ids, select_item_rows, item_row_to_dict
+from .export import EXPORT_FORMATS, EXPORT_MIMETYPES, generate_export, parse_updated_since
 from app.modules.auth.models import UserModel
 # 导入数据库会话和扩展
-from app.extensions import db
+from app.extensions import db, cache, table_versions
 # 导入自定义装饰器、异常和响应处理器
-from app.utils.decorators import login_required, permission_required
+from app.utils.decorators import login_required, permission_required, rate_limit, read_only
 from app.utils.exception_handler import APIException
 from app.utils.response_handler import SuccessResponse
+from app.utils.pagination import keyset_paginate, offset_paginate, decode_cursor
+from app.utils.query_monitor import allow_repeated_queries
+from app.modules.storage.service import store_upload, release_ref, release_refs, replace_ref, public_url, send_upload
+from app.modules.storage.derivatives import derivative_pipeline
 
 # === 分类接口 (Category Routes) ===
 
@@ -37,6 +44,7 @@ def create_category():
     new_category = ExampleCategory(name=name)
     db.session.add(new_category)
     db.session.commit()
+    cache.invalidate('categories')
     
     return SuccessResponse(
         message="分类创建成功", 
@@ -44,6 +52,10 @@ def create_category():
     )
 
 @example.route('/category/list', methods=['GET'])
+# 查询发往只读副本（已配置时），ETag 与缓存也基于副本上的数据
+@read_only
+@table_versions.conditional(['example_category'])
+@cache.cached(tags=['categories'])
 def list_categories():
     """
     [R] Read: 获取所有示例分类的列表
@@ -51,8 +63,9 @@ def list_categories():
     categories = ExampleCategory.query.all()
     
     # 将分类列表转换为字典列表
+    # items 直接读取维护好的 item_count 字段，不再为每个分类单独执行 COUNT 查询
     category_list = [
-        {'id': category.id, 'name': category.name,"items":category.items.count()} 
+        {'id': category.id, 'name': category.name,"items":category.item_count} 
         for category in categories
     ]
     
@@ -89,12 +102,17 @@ def create_item():
     
     db.session.add(new_item)
     db.session.commit()
+    # 新项目会出现在列表中，并改变分类计数
+    cache.invalidate('items', 'categories')
     
     # 使用 to_dict() 辅助方法返回新创建的项目数据
     return SuccessResponse(data=new_item.to_dict(), message="项目创建成功")
 
 
 @example.route('/item/<int:item_id>', methods=['GET'])
+@read_only
+@table_versions.conditional(['example_item', 'example_category'])
+@cache.cached(tags=lambda item_id: [f'item:{item_id}'])
 def get_item(item_id):
     """
     [R] Read: 获取单个示例项目的详细信息
@@ -138,6 +156,7 @@ def update_item():
         item.category_id = data['category_id']
         
     db.session.commit()
+    cache.invalidate(f'item:{item.id}', 'items', 'categories')
     
     return SuccessResponse(data=item.to_dict(), message="项目更新成功")
 
@@ -152,17 +171,34 @@ def delete_item():
     # 经过 @permission_required 装饰器后, item 对象已经存在于 g.resource 中
     item = g.resource
         
+    item_id = item.id
+    # 释放附件的引用，文件由 flask storage gc 统一回收
+    release_ref(item.file_url)
     db.session.delete(item)
     db.session.commit()
+    cache.invalidate(f'item:{item_id}', 'items', 'categories')
     
     return SuccessResponse(message="项目删除成功")
 
 
 @example.route('/item/list', methods=['GET'])
+@read_only
+@table_versions.conditional(['example_item', 'example_category'])
+@cache.cached(tags=['items'])
 def list_items():
     """
     [R] Read: 获取示例项目列表（带分页、搜索、过滤）
     演示：分页、搜索、多条件过滤、关联查询优化
+
+    支持两种分页模式：
+    - 默认：page/per_page 页码分页（OFFSET + COUNT）
+    - 游标：传入 mode=cursor 或 cursor=<上一页返回的 next_cursor/prev_cursor>
+      按 (timestamp, id) 做索引范围扫描，深分页不变慢；
+      游标中已携带过滤条件，翻页时无需重复传入；with_count=1 时才统计总数
+
+    列表只查询响应需要的列（投影查询），不加载完整的 ORM 对象；
+    description_length=<n> 在数据库中把描述截断为前 n 个字符，0 表示不返回描述，
+    未传时使用 ITEM_LIST_DESCRIPTION_LENGTH（默认返回完整描述）
     """
     # 1. 获取分页参数
     try:
@@ -170,60 +206,63 @@ def list_items():
         per_page = request.args.get('per_page', 10, type=int)
     except TypeError:
         raise APIException('分页参数格式不正确', status_code=400)
-    
+    cursor = request.args.get('cursor', '', type=str)
+    cursor_mode = bool(cursor) or request.args.get('mode', '', type=str) == 'cursor'
+    description_length = request.args.get(
+        'description_length', current_app.config.get('ITEM_LIST_DESCRIPTION_LENGTH'), type=int)
+
     # 2. 获取过滤和搜索参数
-    search_keyword = request.args.get('search', '', type=str)
-    category_id = request.args.get('category_id', None, type=int)
-    user_id = request.args.get('user_id', None, type=int)
+    filters = {
+        'search': request.args.get('search', '', type=str),
+        'category_id': request.args.get('category_id', None, type=int),
+        'user_id': request.args.get('user_id', None, type=int),
+    }
+    if cursor:
+        # 游标翻页时，以游标中记录的过滤条件为准，保证前后页结果一致
+        _, _, filters = decode_cursor(cursor)
 
     # 3. 构建基础查询
-    #    使用 joinedload 优化，一次性加载 author 和 category
-    base_query = ExampleItem.query.options(
-        joinedload(ExampleItem.author),
-        joinedload(ExampleItem.category)
-    )
+    #    只选取需要的列，作者名和分类名通过外连接一并取出，避免 N+1 查询
+    base_query = select_item_rows(description_length)
     # 4. 应用过滤条件
-    if search_keyword:
-        # 演示: 搜索名称或描述
-        base_query = base_query.filter(
-            or_(
-                ExampleItem.name.like(f'%{search_keyword}%'),
-                ExampleItem.description.like(f'%{search_keyword}%')
-            )
+    #    页码分页时搜索结果按相关度排序；游标分页必须保持 (timestamp, id) 顺序
+    filter_args = {
+        'search_keyword': filters.get('search'),
+        'category_id': filters.get('category_id'),
+        'user_id': filters.get('user_id'),
+    }
+    base_query = apply_item_filters(base_query, order_by_rank=not cursor_mode, **filter_args)
+    # 统计总数时只需要过滤条件，不需要取列用的外连接
+    count_query = select_item_ids(**filter_args)
+
+    if cursor_mode:
+        # 5'. 游标分页：按 (timestamp, id) 倒序，一次索引范围扫描取出一页
+        items, pagination_data = keyset_paginate(
+            base_query,
+            columns=[ExampleItem.timestamp, ExampleItem.id],
+            key_func=lambda row: (row.timestamp, row.id),
+            per_page=max(per_page, 1),
+            cursor=cursor,
+            filters=filters,
+            with_count=request.args.get('with_count', 0, type=int) == 1,
+            count_query=count_query
         )
-        
-    if category_id:
-        # 演示: 按分类ID过滤
-        base_query = base_query.filter(ExampleItem.category_id == category_id)
-        
-    if user_id:
-        # 演示: 按用户ID过滤
-        base_query = base_query.filter(ExampleItem.user_id == user_id)
+        response_data = {
+            'list': [item_row_to_dict(row) for row in items],
+            'pagination': pagination_data
+        }
+        return SuccessResponse(data=response_data, message="项目列表获取成功")
 
-    # 5. 应用排序（例如按时间戳降序）
+    # 5. 应用排序（例如按时间戳降序；有搜索时作为相关度相同情况下的次级排序）
     base_query = base_query.order_by(ExampleItem.timestamp.desc())
 
-    # 6. 执行分页查询
-    pagination = base_query.paginate(
-        page=page, 
-        per_page=per_page, 
-        error_out=False
-    )
+    # 6. 执行分页查询（返回分页元数据，字段与 paginate() 一致）
+    rows, pagination_data = offset_paginate(base_query, page, per_page, count_query)
     
-    # 7. 格式化查询结果
-    items_list = [item.to_dict() for item in pagination.items]
+    # 7. 直接由行元组构建字典，不经过 ORM 对象和 to_dict()
+    items_list = [item_row_to_dict(row) for row in rows]
     
-    # 8. 组装分页元数据
-    pagination_data = {
-        'total_pages': pagination.pages,   # 总页数
-        'current_page': pagination.page,  # 当前页码
-        'per_page': pagination.per_page,   # 每页数量
-        'total_count': pagination.total,   # 总条目数
-        'has_next': pagination.has_next,   # 是否有下一页
-        'has_prev': pagination.has_prev,   # 是否有上一页
-    }
-    
-    # 9. 组合返回数据
+    # 8. 组合返回数据
     response_data = {
         'list': items_list,
         'pagination': pagination_data
@@ -231,10 +270,275 @@ def list_items():
     
     return SuccessResponse(data=response_data, message="项目列表获取成功")
 
+@example.route('/item/export', methods=['GET'])
+@allow_repeated_queries # 按块读取，同一条查询会执行多次
+def export_items():
+    """
+    [R] Read: 流式导出示例项目（NDJSON 或 CSV）
+    演示：生成器响应、键集分块读取，内存占用与数据量无关
+
+    查询参数：
+    - format: ndjson（默认）或 csv
+    - search / category_id / user_id: 与列表接口相同的过滤条件
+    - updated_since: 只导出此时间（ISO 8601）之后创建或修改的项目，用于增量导出
+    """
+    fmt = request.args.get('format', 'ndjson', type=str)
+    if fmt not in EXPORT_FORMATS:
+        raise APIException(f'format 只支持: {", ".join(EXPORT_FORMATS)}', status_code=400)
+    try:
+        updated_since = parse_updated_since(request.args.get('updated_since', '', type=str))
+    except ValueError:
+        raise APIException('updated_since 必须是 ISO 8601 格式的时间', status_code=400)
+
+    filters = {
+        'search': request.args.get('search', '', type=str),
+        'category_id': request.args.get('category_id', None, type=int),
+        'user_id': request.args.get('user_id', None, type=int),
+    }
+    # 响应体在视图返回之后才开始生成，需要 stream_with_context 保留请求上下文（数据库会话、配置）
+    body = generate_export(fmt, filters, updated_since, current_app.config['EXPORT_BATCH_SIZE'])
+    response = current_app.response_class(
+        stream_with_context(body), mimetype=EXPORT_MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=example_items.{fmt}'
+    return response
+
+# === 批量接口 (Bulk Routes) ===
+#
+# 供数据导入类客户端一次提交多条数据：
+# - 分类校验、所有权校验各只执行一次 IN 查询
+# - 所有写入在同一个事务中以 executemany 方式批量执行，只提交一次
+# - 返回每一行的处理结果；body 中 atomic=true（默认）时任一行失败则整批不写入，
+#   atomic=false 时跳过失败的行，其余行照常写入
+
+def _parse_bulk_request():
+    """
+    解析批量请求体，返回 (rows, atomic)
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise APIException("请求体必须是 JSON 对象", status_code=400, error_code=1001)
+    rows = data.get('items')
+    if not isinstance(rows, list) or not rows:
+        raise APIException("items 必须是非空数组", status_code=400, error_code=1001)
+    max_items = current_app.config['BULK_MAX_ITEMS']
+    if len(rows) > max_items:
+        raise APIException(f"单次最多处理 {max_items} 条数据", status_code=400, error_code=1001)
+    return rows, bool(data.get('atomic', True))
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _existing_category_ids(category_ids):
+    """
+    一次 IN 查询校验所有分类是否存在
+    """
+    category_ids = {c for c in category_ids if c is not None}
+    if not category_ids:
+        return set()
+    return set(db.session.scalars(
+        select(ExampleCategory.id).where(ExampleCategory.id.in_(category_ids))
+    ).all())
+
+
+def _owned_items(rows, results):
+    """
+    一次 IN 查询取出所有目标项目，逐行校验 id 是否有效、是否存在、是否属于当前用户
+    :return: {行号: 项目的 (id, user_id, category_id, file_url)}，失败的行写入 results
+    """
+    ids = {}
+    for index, row in enumerate(rows):
+        item_id = _to_int(row.get('id')) if isinstance(row, dict) else None
+        if item_id is None:
+            results[index] = {'index': index, 'status': 'error', 'message': '缺少有效的项目ID'}
+        elif item_id in ids.values():
+            results[index] = {'index': index, 'status': 'error', 'message': '同一批次中项目ID重复'}
+        else:
+            ids[index] = item_id
+
+    found = {}
+    if ids:
+        found = {
+            row.id: row for row in db.session.execute(
+                select(ExampleItem.id, ExampleItem.user_id, ExampleItem.category_id, ExampleItem.file_url)
+                .where(ExampleItem.id.in_(set(ids.values())))
+            )
+        }
+
+    owned = {}
+    for index, item_id in ids.items():
+        item = found.get(item_id)
+        if item is None:
+            results[index] = {'index': index, 'status': 'error', 'message': '项目不存在'}
+        elif item.user_id != g.user.id:
+            results[index] = {'index': index, 'status': 'error', 'message': '权限不足，无法操作他人资源'}
+        else:
+            owned[index] = item
+    return owned
+
+
+def _bulk_response(results, atomic, message):
+    """
+    汇总每一行的结果；原子模式下有失败行时返回 400 且不写入任何数据
+    """
+    failed = sum(1 for r in results if r['status'] == 'error')
+    data = {
+        'results': results,
+        'succeeded': sum(1 for r in results if r['status'] == 'success'),
+        'failed': failed,
+    }
+    if atomic and failed:
+        raise APIException("部分数据校验失败，本批次未写入任何数据", status_code=400, error_code=1001, data=data)
+    return SuccessResponse(data=data, message=message)
+
+
+@example.route('/item/bulk/create', methods=['POST'])
+@login_required
+def bulk_create_items():
+    """
+    [C] 批量创建项目
+    body: { "items": [{ "name": "...", "description": "...", "category_id": 1 }, ...], "atomic": true }
+    """
+    rows, atomic = _parse_bulk_request()
+    results = [None] * len(rows)
+
+    # 1. 逐行做基本校验，并一次性校验所有分类
+    valid_categories = _existing_category_ids(
+        _to_int(row.get('category_id')) for row in rows if isinstance(row, dict))
+    to_insert = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict) or not row.get('name') or row.get('category_id') is None:
+            results[index] = {'index': index, 'status': 'error', 'message': '项目名称和分类ID均不能为空'}
+        elif _to_int(row['category_id']) not in valid_categories:
+            results[index] = {'index': index, 'status': 'error', 'message': '指定的分类不存在'}
+        else:
+            to_insert.append((index, {
+                'name': row['name'],
+                'description': row.get('description'),
+                'category_id': _to_int(row['category_id']),
+                'user_id': g.user.id,
+            }))
+
+    # 2. 校验全部通过（或非原子模式）时，用多行 INSERT ... VALUES (...), (...) RETURNING id 批量写入
+    if to_insert and not (atomic and len(to_insert) != len(rows)):
+        # 自增主键按 VALUES 的顺序递增分配，排序后即与提交顺序一一对应
+        # （不使用 sort_by_parameter_order，它在 SQLite 上会退化为逐行 INSERT）
+        # render_nulls：description 为 None 的行也渲染为 NULL，否则 ORM 会按参数键集合
+        # 把这些行拆成单独的 INSERT，批次退化为逐行插入
+        new_ids = sorted(db.session.scalars(
+            insert(ExampleItem).returning(ExampleItem.id),
+            [params for _, params in to_insert],
+            execution_options={'render_nulls': True},
+        ).all())
+        adjust_item_counts(db.session.connection(),
+                           Counter(params['category_id'] for _, params in to_insert))
+        db.session.commit()
+        cache.invalidate('items', 'categories')
+        for (index, _), item_id in zip(to_insert, new_ids):
+            results[index] = {'index': index, 'status': 'success', 'id': item_id}
+    else:
+        for index, _ in to_insert:
+            results[index] = {'index': index, 'status': 'skipped'}
+
+    return _bulk_response(results, atomic, "批量创建完成")
+
+
+@example.route('/item/bulk/update', methods=['POST'])
+@login_required
+def bulk_update_items():
+    """
+    [U] 批量更新项目（只更新传入的字段）
+    body: { "items": [{ "id": 1, "name"?: "...", "description"?: "...", "category_id"?: 2 }, ...], "atomic": true }
+    """
+    rows, atomic = _parse_bulk_request()
+    results = [None] * len(rows)
+
+    # 1. 一次查询完成所有行的存在性与所有权校验，一次查询校验所有新分类
+    owned = _owned_items(rows, results)
+    valid_categories = _existing_category_ids(
+        _to_int(rows[i].get('category_id')) for i in owned if 'category_id' in rows[i])
+
+    to_update = []
+    for index, item in owned.items():
+        row = rows[index]
+        params = {'id': item.id}
+        for field in ('name', 'description'):
+            if field in row:
+                params[field] = row[field]
+        if 'name' in params and not params['name']:
+            results[index] = {'index': index, 'status': 'error', 'message': '项目名称不能为空'}
+            continue
+        if 'category_id' in row:
+            category_id = _to_int(row['category_id'])
+            if category_id not in valid_categories:
+                results[index] = {'index': index, 'status': 'error', 'message': '指定的新分类不存在'}
+                continue
+            params['category_id'] = category_id
+        to_update.append((index, item, params))
+
+    # 2. 按主键批量 UPDATE（executemany），同一事务中调整分类计数
+    if to_update and not (atomic and len(to_update) != len(rows)):
+        db.session.execute(update(ExampleItem), [params for _, _, params in to_update])
+        deltas = Counter()
+        for _, item, params in to_update:
+            if params.get('category_id', item.category_id) != item.category_id:
+                deltas[item.category_id] -= 1
+                deltas[params['category_id']] += 1
+        adjust_item_counts(db.session.connection(), deltas)
+        db.session.commit()
+        cache.invalidate('items', 'categories', *[f'item:{item.id}' for _, item, _ in to_update])
+        for index, item, _ in to_update:
+            results[index] = {'index': index, 'status': 'success', 'id': item.id}
+    else:
+        for index, item, _ in to_update:
+            results[index] = {'index': index, 'status': 'skipped', 'id': item.id}
+
+    return _bulk_response(results, atomic, "批量更新完成")
+
+
+@example.route('/item/bulk/delete', methods=['POST'])
+@login_required
+def bulk_delete_items():
+    """
+    [D] 批量删除项目
+    body: { "items": [{ "id": 1 }, { "id": 2 }, ...], "atomic": true }
+    """
+    rows, atomic = _parse_bulk_request()
+    results = [None] * len(rows)
+    owned = _owned_items(rows, results)
+
+    if owned and not (atomic and len(owned) != len(rows)):
+        items = list(owned.values())
+        # 一条 DELETE ... WHERE id IN (...) 删除全部项目，同一事务中释放附件引用、调整分类计数
+        db.session.execute(
+            delete(ExampleItem).where(ExampleItem.id.in_([item.id for item in items])),
+            execution_options={'synchronize_session': False}
+        )
+        release_refs(Counter(item.file_url for item in items))
+        adjust_item_counts(db.session.connection(), Counter({
+            category_id: -count for category_id, count in Counter(item.category_id for item in items).items()
+        }))
+        db.session.commit()
+        cache.invalidate('items', 'categories', *[f'item:{item.id}' for item in items])
+        for index, item in owned.items():
+            results[index] = {'index': index, 'status': 'success', 'id': item.id}
+    else:
+        for index, item in owned.items():
+            results[index] = {'index': index, 'status': 'skipped', 'id': item.id}
+
+    return _bulk_response(results, atomic, "批量删除完成")
+
 # === 文件上传接口 (File Upload Routes) ===
 
 @example.route('/item/upload-file', methods=['POST'])
 @login_required
+# 上传接口共用 'upload' 分组的并发名额，大文件上传不会占满所有 worker
+@rate_limit('20/minute', per='user')
+@rate_limit(group='upload', concurrency=2)
 def upload_item_file():
     """
     演示：文件上传
@@ -266,32 +570,36 @@ def upload_item_file():
     if ext.lower() not in allowed_extensions:
         raise APIException(f"不支持的文件格式，仅支持: {', '.join(allowed_extensions)}", status_code=400)
     
-    # 2. 准备保存路径和新文件名
-    upload_dir = current_app.config['UPLOAD_FOLDER']
-    # 创建一个唯一的文件名，例如: example_item_1_user_2_file.pdf
-    new_filename = f"example_item_{item.id}_user_{g.user.id}_file{ext}"
-    save_path = os.path.join(upload_dir, new_filename)
-
-    # 3. 保存文件
-    file_obj.save(save_path)
-    
-    # 4. 生成文件的访问 URL (假设部署在 127.0.0.1:5000)
-    #    注意: '/api/example' 是蓝图前缀, '/uploads/...' 是此路由
-    file_url = f'http://127.0.0.1:5000/api/example/uploads/{new_filename}'
+    # 2. 流式保存到内容寻址存储，得到 content_id（例如: 3f5a...e1.pdf）
+    #    相同内容的文件只保存一份，写入过程是原子的
+    content_id = store_upload(file_obj, original_filename)
 
-    # 5. 更新数据库中的 file_url 字段
-    item.file_url = file_url
+    # 3. file_url 字段只保存 content_id，并把引用从旧附件转移到新附件
+    replace_ref(item.file_url, content_id)
+    item.file_url = content_id
+    # 4. 图片的缩略图任务与附件修改在同一个事务中提交，由 flask worker 生成，接口立即返回
+    derivative_pipeline.enqueue(content_id)
     db.session.commit()
+    cache.invalidate(f'item:{item.id}', 'items')
+
+    # 5. 生成文件的访问 URL
+    #    注意: '/api/example' 是蓝图前缀, '/uploads/...' 是此路由
+    file_url = public_url(content_id)
     
     return SuccessResponse(
         message="文件上传成功",
-        data={'file_url': file_url, 'item_id': item.id}
+        data={
+            'file_url': file_url,
+            'file_variants': derivative_pipeline.urls(content_id),
+            'item_id': item.id
+        }
     )
 
 @example.route('/uploads/<path:filename>')
 def serve_example_file(filename):
     """
     提供对上传文件的公开访问
+    与 /api/auth/uploads 共用同一套实现（ETag、304、Range、X-Sendfile）
+    ?variant=thumb|small|medium 返回对应尺寸的缩略图
     """
-    # 从配置的 UPLOAD_FOLDER 目录中安全地提供文件
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
+    return send_upload(filename, request.args.get('variant'))
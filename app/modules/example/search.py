@@ -0,0 +1,171 @@
+# app/modules/example/search.py
+"""
+示例项目的全文检索（SQLite FTS5）
+
+LIKE '%关键词%' 无法使用索引，每次搜索都要扫描整张表（包括 Text 类型的 description）。
+这里为 example_item 建立一张 FTS5 外部内容表 example_item_fts：
+- 只保存倒排索引，正文仍在 example_item 中，不重复占用空间
+- 通过 SQLite 触发器与 example_item 的插入、更新、删除保持同步，
+  因此 ORM 写入、批量写入、直接执行 SQL 都不会漏掉
+- 使用 trigram 分词器（SQLite 3.34+）：按连续三个字符建立索引，关键词可以匹配任意位置的子串，
+  与 LIKE '%关键词%' 的语义一致，中文等不以空格分词的文本也能搜到词中间的部分
+  （unicode61 会把一整段连续的汉字当作一个词，只能按前缀匹配）
+- 查询使用 MATCH + bm25() 做相关度排序，多个关键词之间为 AND 关系
+
+少于三个字符的关键词无法用 trigram 索引匹配，这时与非 SQLite 数据库、尚未建立索引
+（或索引仍是旧的 unicode61 分词）一样，自动回退到原来的 LIKE 查询。
+已有的数据库可以执行 flask db upgrade 或 `flask example rebuild-search-index` 重建并回填索引。
+"""
+import re
+
+from flask import current_app
+from sqlalchemy import event, text, literal_column, select, func, table, column
+
+from app.extensions import db
+from .models import ExampleItem
+
+FTS_TABLE = 'example_item_fts'
+FTS_TOKENIZER = 'trigram'
+# trigram 分词器要求的 SQLite 版本，以及能够使用索引的最短关键词（字符数）
+TRIGRAM_MIN_SQLITE = (3, 34, 0)
+MIN_TERM_LENGTH = 3
+
+# 建表与触发器语句，全部使用 IF NOT EXISTS，可以重复执行
+FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='example_item', content_rowid='id',
+        tokenize='{FTS_TOKENIZER}'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON example_item BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON example_item BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, description ON example_item BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+# 轻量的表描述，只用于拼接查询，不注册到 db.metadata（避免 create_all 把它当普通表创建）
+fts_table = table(FTS_TABLE, column('rowid'))
+
+# 记录每个数据库引擎是否已建立全文索引，避免每次搜索都查询 sqlite_master
+_fts_ready = {}
+
+
+def install_search_index(connection):
+    """
+    在给定连接上创建 FTS5 表和同步触发器（仅 SQLite 3.34 及以上）
+    """
+    if connection.dialect.name != 'sqlite' or connection.dialect.server_version_info < TRIGRAM_MIN_SQLITE:
+        return False
+    for ddl in FTS_DDL:
+        connection.exec_driver_sql(ddl)
+    return True
+
+
+def drop_search_index(connection):
+    """
+    删除 FTS5 表和同步触发器（仅 SQLite），用于更换分词器后重建
+    """
+    if connection.dialect.name != 'sqlite':
+        return
+    for suffix in ('ai', 'ad', 'au'):
+        connection.exec_driver_sql(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+    connection.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+@event.listens_for(ExampleItem.__table__, 'after_create')
+def _create_search_index(target, connection, **kw):
+    # db.create_all() 创建 example_item 时，顺带创建全文索引
+    install_search_index(connection)
+
+
+def rebuild_search_index():
+    """
+    重新创建全文索引（旧的分词方式一并替换）并根据 example_item 的现有数据回填
+    :return: 已索引的项目数量
+    """
+    with db.engine.begin() as connection:
+        drop_search_index(connection)
+        if not install_search_index(connection):
+            return 0
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        indexed = connection.exec_driver_sql('SELECT COUNT(*) FROM example_item').scalar()
+    _fts_ready.pop(db.engine.url, None)
+    return indexed
+
+
+def search_index_available():
+    """
+    判断当前数据库是否可以使用全文检索
+    """
+    if not current_app.config.get('SEARCH_USE_FTS', True):
+        return False
+    engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return False
+    if engine.url not in _fts_ready:
+        with engine.connect() as connection:
+            row = connection.exec_driver_sql(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (FTS_TABLE,)
+            ).first()
+        # 旧版本建立的 unicode61 索引搜不到词中间的子串，重建之前按 LIKE 查询
+        _fts_ready[engine.url] = row is not None and FTS_TOKENIZER in row[0]
+    return _fts_ready[engine.url]
+
+
+def build_match_expression(keyword):
+    """
+    把用户输入转换为安全的 FTS5 查询语句
+    每个词用双引号包裹（避免被当作 FTS 语法），trigram 索引按子串匹配，多个词之间为 AND 关系
+    有任何一个词少于 MIN_TERM_LENGTH 个字符时返回空字符串，由调用方回退到 LIKE 查询
+    """
+    terms = [t for t in re.split(r'\s+', keyword.strip()) if t]
+    if any(len(t) < MIN_TERM_LENGTH for t in terms):
+        return ''
+    return ' '.join('"{}"'.format(t.replace('"', '""')) for t in terms)
+
+
+def search_subquery(keyword):
+    """
+    返回匹配关键词的子查询，包含 item_id 与 rank（bm25 分值，越小越相关）
+    关键词无法使用全文索引（为空或有过短的词）时返回 None
+    """
+    match = build_match_expression(keyword)
+    if not match:
+        return None
+    fts = literal_column(FTS_TABLE)
+    return (
+        select(
+            fts_table.c.rowid.label('item_id'),
+            func.bm25(fts).label('rank')
+        )
+        .select_from(fts_table)
+        .where(text(f'{FTS_TABLE} MATCH :match').bindparams(match=match))
+        .subquery('item_search')
+    )
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """
+    供 Flask-Migrate 使用：自动生成迁移时忽略 FTS5 虚拟表及其影子表
+    """
+    if type_ == 'table' and name.startswith(FTS_TABLE):
+        return False
+    return True
@@ -0,0 +1,9 @@
+# app/modules/storage/__init__.py
+from flask import Blueprint
+
+# 1. 创建存储模块的蓝图对象
+#    存储模块负责上传文件的内容寻址存储、去重与回收，供其他模块调用
+storage = Blueprint('storage', __name__)
+
+# 2. 导入命令行工具，注册到 flask storage 分组下
+from . import commands
@@ -0,0 +1,24 @@
+# app/modules/storage/commands.py
+"""
+存储模块的命令行工具，使用方式: flask storage <命令>
+"""
+import click
+from flask import current_app
+
+from . import storage
+from .service import collect_garbage
+
+
+@storage.cli.command('gc')
+@click.option('--grace', type=int, default=None, help='保留期（秒），默认使用 STORAGE_GC_GRACE_SECONDS')
+def gc_command(grace):
+    """
+    删除不再被引用的上传文件
+    """
+    if grace is None:
+        grace = current_app.config['STORAGE_GC_GRACE_SECONDS']
+    removed = collect_garbage(grace)
+    click.echo(
+        f"回收完成：删除 {removed['blobs']} 个文件（{removed['bytes']} 字节），"
+        f"清理 {removed['tmp']} 个临时文件"
+    )
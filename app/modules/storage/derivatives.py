@@ -0,0 +1,163 @@
+# app/modules/storage/derivatives.py
+"""
+图片衍生图（缩略图）处理流水线
+
+头像和项目图片上传的往往是几 MB 的手机原图，而页面上只需要显示 40px 的小图。
+上传时在同一个事务中发布一个 storage.render_derivatives 任务（app/utils/jobs.py），
+由 flask worker 生成 IMAGE_DERIVATIVES 中配置的几种尺寸，统一重新编码为
+IMAGE_DERIVATIVE_FORMAT（默认 webp），保存在：
+    UPLOAD_FOLDER/derived/<尺寸名>/<前两位>/<三四位>/<哈希>.<格式>
+
+- 上传接口提交后立即返回，缩放在请求之外进行；worker 重启或崩溃时任务不会丢失
+- 访问 /uploads/<content_id>?variant=small 时，如果衍生图还没生成（或被删除），会当场补生成
+- 未安装 Pillow 或不是图片时，variant 请求直接返回原图
+"""
+import os
+
+from flask import current_app
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow 是可选依赖
+    Image = None
+    ImageOps = None
+
+from app.extensions import job_queue
+from .service import blob_path, is_content_id, public_url
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+RENDER_TASK = 'storage.render_derivatives'
+
+
+def is_image(content_id):
+    return is_content_id(content_id) and content_id.endswith(IMAGE_EXTENSIONS)
+
+
+def render_derivatives(source_path, targets, fmt, quality):
+    """
+    读取原图，按 targets 中的 (最大边长, 目标路径) 依次生成衍生图
+    只使用普通参数，不依赖 Flask 应用上下文
+    """
+    with Image.open(source_path) as image:
+        # 按 EXIF 方向摆正手机照片；动图只取第一帧
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        for max_size, target in targets:
+            if os.path.exists(target):
+                continue
+            variant = image.copy()
+            variant.thumbnail((max_size, max_size))
+            if fmt.lower() in ('jpeg', 'jpg') and variant.mode != 'RGB':
+                variant = variant.convert('RGB')
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # 先写临时文件再原子替换，避免读到写了一半的图片
+            tmp_path = f'{target}.{os.getpid()}.tmp'
+            variant.save(tmp_path, format=fmt, quality=quality)
+            os.replace(tmp_path, target)
+    return len(targets)
+
+
+class DerivativePipeline:
+    """
+    衍生图流水线，使用方式与其他扩展一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.variants = {}
+        self.fmt = 'webp'
+        self.quality = 80
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.variants = app.config.get('IMAGE_DERIVATIVES', {})
+        self.fmt = app.config.get('IMAGE_DERIVATIVE_FORMAT', 'webp')
+        self.quality = app.config.get('IMAGE_DERIVATIVE_QUALITY', 80)
+        app.extensions['derivative_pipeline'] = self
+
+    @property
+    def available(self):
+        return Image is not None and bool(self.variants)
+
+    def derivative_path(self, content_id, variant):
+        digest = content_id.split('.', 1)[0]
+        return os.path.join(
+            current_app.config['UPLOAD_FOLDER'], 'derived', variant,
+            digest[:2], digest[2:4], f'{digest}.{self.fmt}'
+        )
+
+    def _targets(self, content_id, variants):
+        return [(self.variants[v], self.derivative_path(content_id, v)) for v in variants]
+
+    def enqueue(self, content_id):
+        """
+        上传接口在 commit 之前调用：发布生成所有尺寸的任务，与文件引用一起提交
+        """
+        if not self.available or not is_image(content_id):
+            return
+        job_queue.enqueue(RENDER_TASK, content_id=content_id)
+
+    def render_all(self, content_id):
+        """
+        生成所有尚不存在的尺寸；原图已被回收时跳过
+        """
+        source = blob_path(content_id)
+        if not self.available or not is_image(content_id) or not os.path.exists(source):
+            return 0
+        targets = [(size, path) for size, path in self._targets(content_id, self.variants)
+                   if not os.path.exists(path)]
+        if targets:
+            render_derivatives(source, targets, self.fmt, self.quality)
+        return len(targets)
+
+    def ensure(self, content_id, variant):
+        """
+        返回指定尺寸衍生图的路径，不存在时在当前请求中补生成
+        无法生成（非图片、未安装 Pillow、未知尺寸、原图缺失）时返回 None
+        """
+        if not self.available or variant not in self.variants or not is_image(content_id):
+            return None
+        path = self.derivative_path(content_id, variant)
+        if os.path.exists(path):
+            return path
+        source = blob_path(content_id)
+        if not os.path.exists(source):
+            return None
+        try:
+            render_derivatives(source, self._targets(content_id, [variant]), self.fmt, self.quality)
+        except (OSError, ValueError) as e:
+            current_app.logger.warning(f'衍生图生成失败: {content_id} - {e}')
+            return None
+        return path
+
+    def remove(self, content_id):
+        """
+        删除某个文件的全部衍生图（原图被回收时调用）
+        """
+        for variant in self.variants:
+            path = self.derivative_path(content_id, variant)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def urls(self, content_id, prefix='/api/example/uploads'):
+        """
+        返回 {尺寸名: URL}；非图片返回空字典
+        """
+        if not is_image(content_id):
+            return {}
+        base = public_url(content_id, prefix)
+        return {variant: f'{base}?variant={variant}' for variant in self.variants}
+
+    def url(self, content_id, variant, prefix='/api/example/uploads'):
+        """
+        返回指定尺寸的 URL；非图片或旧数据返回原始地址
+        """
+        return self.urls(content_id, prefix).get(variant) or public_url(content_id, prefix)
+
+
+derivative_pipeline = DerivativePipeline()
+
+
+@job_queue.task(RENDER_TASK, max_attempts=3)
+def render_derivatives_job(content_id):
+    derivative_pipeline.render_all(content_id)
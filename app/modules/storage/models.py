@@ -0,0 +1,23 @@
+# app/modules/storage/models.py
+from app.extensions import db
+from datetime import datetime
+
+
+class StoredBlob(db.Model):
+    """
+    内容寻址存储的文件记录
+    content_id 由文件内容的 SHA-256 加扩展名组成，相同内容只保存一份；
+    ref_count 记录有多少条业务数据（项目附件、用户头像等）引用了它，
+    降为 0 且超过保留期后由 flask storage gc 回收
+    """
+    __tablename__ = 'stored_blob'
+
+    content_id = db.Column(db.String(80), primary_key=True)
+    size = db.Column(db.Integer, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    # 引用计数最后一次变化的时间，回收时据此判断是否已过保留期
+    updated_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f'<StoredBlob {self.content_id} refs={self.ref_count}>'
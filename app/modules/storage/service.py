@@ -0,0 +1,327 @@
+# app/modules/storage/service.py
+"""
+内容寻址的上传文件存储
+
+原来的上传接口直接把文件写进 UPLOAD_FOLDER 根目录，存在几个问题：
+同名文件互相覆盖、单个目录下文件无限增长、相同内容被重复保存多份。
+
+这里的做法：
+1. 边读取上传流边计算 SHA-256，先写入 UPLOAD_FOLDER/tmp 下的临时文件
+2. content_id = 哈希值 + 扩展名，例如 3f5a...e1.jpg
+3. 按哈希前缀分两级目录存放：blobs/3f/5a/3f5a...e1.jpg，避免单目录过大
+4. 通过 os.replace 原子地把临时文件移动到最终位置；内容已存在时直接丢弃临时文件（去重）
+5. stored_blob 表记录每个 content_id 的引用计数，业务数据（file_url、avatar）中只保存 content_id
+"""
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app, request
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+from sqlalchemy import case, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from app.extensions import db
+from .models import StoredBlob
+
+CHUNK_SIZE = 64 * 1024
+CONTENT_ID_RE = re.compile(r'^[0-9a-f]{64}(\.[a-z0-9]{1,10})?$')
+EXTENSION_RE = re.compile(r'^\.[a-z0-9]{1,10}$')
+
+
+def is_content_id(value):
+    """
+    判断一个字符串是否是内容寻址存储的 content_id（旧数据中保存的是完整 URL 或普通文件名）
+    """
+    return bool(value) and CONTENT_ID_RE.match(value) is not None
+
+
+def normalize_extension(filename):
+    """
+    从客户端文件名中取出可以放进 content_id 的扩展名（小写，.[a-z0-9]{1,10}）
+    不符合规则的扩展名（如 .tar-gz、过长的扩展名）直接丢弃，保证生成的 id 都能通过 is_content_id
+    """
+    _, ext = os.path.splitext(filename or '')
+    ext = ext.lower()
+    return ext if EXTENSION_RE.match(ext) else ''
+
+
+def blob_root():
+    return os.path.join(current_app.config['UPLOAD_FOLDER'], 'blobs')
+
+
+def blob_path(content_id):
+    """
+    content_id 对应的磁盘路径：blobs/<前两位>/<三四位>/<content_id>
+    """
+    return os.path.join(blob_root(), content_id[:2], content_id[2:4], content_id)
+
+
+def public_url(value, prefix='/api/example/uploads'):
+    """
+    把数据库中保存的 content_id 转换为可访问的 URL；旧数据中的完整 URL 原样返回
+    """
+    if not is_content_id(value):
+        return value
+    return f"{current_app.config['PUBLIC_BASE_URL']}{prefix}/{value}"
+
+
+def store_upload(file_obj, filename):
+    """
+    流式保存上传的文件，返回 content_id
+    :param file_obj: werkzeug 的 FileStorage 或任意带 read() 的文件对象
+    :param filename: 原始文件名，用于确定扩展名
+    """
+    ext = normalize_extension(filename)
+    stream = getattr(file_obj, 'stream', file_obj)
+
+    tmp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    # 1. 边写临时文件边计算哈希，不把整个文件读入内存
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, 'wb') as tmp_file:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                tmp_file.write(chunk)
+                size += len(chunk)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+
+        content_id = sha256.hexdigest() + ext
+        final_path = blob_path(content_id)
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+        # 2. 内容已存在则去重；更新修改时间，防止正在被回收
+        if os.path.exists(final_path):
+            os.utime(final_path)
+            os.remove(tmp_path)
+        else:
+            # 3. 原子替换，其他进程不会读到写了一半的文件
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    _ensure_blob_row(content_id, size)
+    return content_id
+
+
+def _ensure_blob_row(content_id, size):
+    # 多个 worker 可能同时上传相同内容，用保存点吸收主键冲突
+    if db.session.get(StoredBlob, content_id) is not None:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(StoredBlob(content_id=content_id, size=size, ref_count=0))
+    except IntegrityError:
+        pass
+
+
+def add_ref(content_id):
+    """
+    引用计数 +1，在调用方的事务中执行，随业务数据一起提交
+    """
+    if not is_content_id(content_id):
+        return
+    table = StoredBlob.__table__
+    result = db.session.execute(
+        update(table)
+        .where(table.c.content_id == content_id)
+        .values(ref_count=table.c.ref_count + 1, updated_at=datetime.now())
+    )
+    if result.rowcount == 0:
+        # 记录刚好被回收删除时，重新登记
+        path = blob_path(content_id)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        db.session.add(StoredBlob(content_id=content_id, size=size, ref_count=1))
+
+
+def release_ref(content_id):
+    """
+    引用计数 -1；旧数据（完整 URL）不做处理
+    """
+    if not is_content_id(content_id):
+        return
+    table = StoredBlob.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.content_id == content_id)
+        .values(ref_count=table.c.ref_count - 1, updated_at=datetime.now())
+    )
+
+
+def release_refs(counts):
+    """
+    批量释放引用：counts 为 {content_id: 释放次数}（例如 Counter），一条 UPDATE 完成
+    旧数据（完整 URL）和空值会被忽略
+    """
+    counts = {content_id: n for content_id, n in counts.items() if n and is_content_id(content_id)}
+    if not counts:
+        return
+    table = StoredBlob.__table__
+    db.session.execute(
+        update(table)
+        .where(table.c.content_id.in_(list(counts)))
+        .values(ref_count=table.c.ref_count - case(counts, value=table.c.content_id),
+                updated_at=datetime.now())
+    )
+
+
+def replace_ref(old_value, new_content_id):
+    """
+    业务数据的文件从 old_value 换成 new_content_id 时调用
+    """
+    add_ref(new_content_id)
+    release_ref(old_value)
+
+
+def collect_garbage(grace_seconds):
+    """
+    回收不再被引用的文件
+    - 引用计数 <= 0 且超过保留期的记录及其文件
+    - 磁盘上没有记录、且超过保留期的孤儿文件（例如上传后事务未提交）
+    - 超过保留期的临时文件
+    :return: {'blobs': 删除的文件数, 'bytes': 释放的字节数, 'tmp': 删除的临时文件数}
+    """
+    from .derivatives import derivative_pipeline
+
+    cutoff = datetime.now() - timedelta(seconds=grace_seconds)
+    cutoff_ts = time.time() - grace_seconds
+    removed = {'blobs': 0, 'bytes': 0, 'tmp': 0}
+
+    def _remove_file(path):
+        # 文件最近被重新上传过（去重时会更新修改时间），保留
+        if not os.path.exists(path) or os.path.getmtime(path) > cutoff_ts:
+            return
+        removed['bytes'] += os.path.getsize(path)
+        removed['blobs'] += 1
+        os.remove(path)
+
+    # 1. 无引用的记录：逐条带条件删除，避免与并发的 add_ref 冲突
+    table = StoredBlob.__table__
+    candidates = db.session.scalars(
+        db.select(StoredBlob.content_id)
+        .where(StoredBlob.ref_count <= 0, StoredBlob.updated_at < cutoff)
+    ).all()
+    for content_id in candidates:
+        result = db.session.execute(
+            delete(table).where(
+                table.c.content_id == content_id,
+                table.c.ref_count <= 0,
+                table.c.updated_at < cutoff
+            )
+        )
+        db.session.commit()
+        if result.rowcount:
+            _remove_file(blob_path(content_id))
+            derivative_pipeline.remove(content_id)
+
+    # 2. 孤儿文件
+    root = blob_root()
+    if os.path.isdir(root):
+        known = set(db.session.scalars(db.select(StoredBlob.content_id)).all())
+        for dirpath, _, filenames in os.walk(root):
+            for name in filenames:
+                if name not in known:
+                    _remove_file(os.path.join(dirpath, name))
+
+    # 3. 残留的临时文件
+    tmp_dir = os.path.join(current_app.config['UPLOAD_FOLDER'], 'tmp')
+    if os.path.isdir(tmp_dir):
+        for name in os.listdir(tmp_dir):
+            path = os.path.join(tmp_dir, name)
+            if os.path.getmtime(path) < cutoff_ts:
+                os.remove(path)
+                removed['tmp'] += 1
+
+    return removed
+
+
+def resolve_upload(filename):
+    """
+    把 /uploads/<filename> 中的文件名解析为 (目录, 文件名)
+    content_id 指向分片目录中的文件，其余按旧方式从 UPLOAD_FOLDER 根目录读取
+    """
+    if is_content_id(filename):
+        path = blob_path(filename)
+        return os.path.dirname(path), filename
+    return current_app.config['UPLOAD_FOLDER'], filename
+
+
+def send_upload(filename, variant=None):
+    """
+    上传文件的统一下载实现（/api/auth/uploads 与 /api/example/uploads 共用）
+
+    - content_id 的内容永不改变：使用内容哈希作为强 ETag，并设置一年的 immutable 缓存
+    - 旧的普通文件名可能被覆盖：每次都要求客户端用 ETag 重新验证
+    - 支持 If-None-Match / If-Modified-Since 返回 304，以及 Range 分段下载（返回 206）
+    - UPLOAD_SENDFILE_MODE 为 x-sendfile / x-accel 时，只返回响应头，
+      由前端代理（Apache mod_xsendfile / nginx）直接发送文件内容，释放 gunicorn worker
+    - variant 指定衍生图尺寸（如 small）时返回缩略图，缺失时当场生成；无法生成时返回原图
+    """
+    # derivatives 依赖本模块，放在函数内导入以避免循环导入
+    from .derivatives import derivative_pipeline
+
+    directory, name = resolve_upload(filename)
+    path = safe_join(directory, name)
+    if path is None or not os.path.isfile(path):
+        raise NotFound()
+
+    immutable = is_content_id(filename)
+    etag = filename.split('.', 1)[0] if immutable else True
+
+    derived_path = derivative_pipeline.ensure(filename, variant) if variant else None
+    if derived_path is not None:
+        path, name = derived_path, os.path.basename(derived_path)
+        etag = f'{etag}-{variant}'
+    max_age = current_app.config['UPLOAD_IMMUTABLE_MAX_AGE'] if immutable else None
+    mode = current_app.config.get('UPLOAD_SENDFILE_MODE')
+
+    if mode == 'x-accel':
+        # nginx: 由 internal location 提供文件，Range 也由 nginx 处理
+        stat = os.stat(path)
+        relative = os.path.relpath(path, current_app.config['UPLOAD_FOLDER']).replace(os.sep, '/')
+        response = current_app.response_class(
+            mimetype=mimetypes.guess_type(name)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{current_app.config['UPLOAD_ACCEL_PREFIX']}/{relative}"
+        response.set_etag(etag if immutable else f'{stat.st_mtime}-{stat.st_size}')
+        response.last_modified = stat.st_mtime
+        _set_cache_headers(response, max_age, immutable)
+        return response.make_conditional(request)
+
+    response = send_file(
+        path,
+        request.environ,
+        conditional=True,
+        etag=etag,
+        max_age=max_age,
+        use_x_sendfile=(mode == 'x-sendfile'),
+        response_class=current_app.response_class,
+    )
+    # 告知客户端（例如 PDF 阅读器）可以分段请求
+    response.accept_ranges = 'bytes'
+    _set_cache_headers(response, max_age, immutable)
+    return response
+
+
+def _set_cache_headers(response, max_age, immutable):
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
@@ -0,0 +1,196 @@
+# app/utils/asgi.py
+"""
+ASGI 服务模式：把 Flask（WSGI）应用挂到 uvicorn 等 ASGI 服务器上
+
+同步 gunicorn worker 在整个请求期间被占用，包括慢速客户端上传请求体（file_obj.save 读取 wsgi.input）
+的时间，4 个 worker 就只能同时处理 4 个请求。这里的适配器：
+- 在事件循环中异步接收完整的请求体（超过 spool_size 时落盘），慢速上传只占用一个协程，不占用线程
+- 请求体超过 max_body_size（MAX_CONTENT_LENGTH）时直接返回 413，不执行应用：Content-Length
+  超限时不读取请求体，分块上传则在累计字节数超限时立即停止接收，不会把任意大小的请求体写入临时文件
+- 请求体收齐后，才在线程池中执行 Flask 应用；视图、数据库访问、SuccessResponse / APIException
+  等代码完全不变，一个 worker 进程可以同时执行 threads 个请求
+- 响应体逐块交给事件循环发送，流式响应（/item/export）仍然边生成边发送
+
+数据库访问仍然是同步的（在线程池中执行）：SQLite 本身没有异步接口，aiosqlite 同样是在线程中
+调用 sqlite3，改写为异步 ORM 不会减少等待，反而需要复制一套路由、ORM 事件和查询监控代码。
+"""
+import asyncio
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+
+class WSGIThreadPoolAdapter:
+    """
+    ASGI 应用：异步接收请求体，在线程池中执行 WSGI 应用
+    :param threads: 每个进程同时执行的请求数
+    :param spool_size: 请求体在内存中缓冲的最大字节数，超出后写入临时文件
+    :param max_body_size: 请求体的最大字节数，超出时返回 413；None 表示不限制
+    """
+    def __init__(self, wsgi_app, threads=32, spool_size=1024 * 1024, max_body_size=None):
+        self.wsgi_app = wsgi_app
+        self.threads = threads
+        self.spool_size = spool_size
+        self.max_body_size = max_body_size
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"不支持的 ASGI 连接类型: {scope['type']}")
+
+        if self._too_large(declared_length(scope)):
+            await self._reject_too_large(send)
+            return
+
+        with SpooledTemporaryFile(max_size=self.spool_size) as body:
+            received = 0
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    # 客户端在请求体发送完之前断开，不再执行应用
+                    return
+                chunk = message.get('body', b'')
+                received += len(chunk)
+                if self._too_large(received):
+                    # 分块上传（或 Content-Length 与实际不符）时按已接收的字节数判断
+                    await self._reject_too_large(send)
+                    return
+                body.write(chunk)
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._run_wsgi, loop, scope, body, send)
+
+    def _too_large(self, size):
+        return self.max_body_size is not None and size is not None and size > self.max_body_size
+
+    async def _reject_too_large(self, send):
+        # 与 Flask 处理 413 时的响应格式一致（见 app/utils/exception_handler.py）
+        payload = json.dumps({'status': 'error', 'message': f'请求体超过 {self.max_body_size} 字节'},
+                             ensure_ascii=False).encode('utf-8')
+        await send({'type': 'http.response.start', 'status': 413,
+                    'headers': [(b'content-type', b'application/json'),
+                                (b'content-length', str(len(payload)).encode('latin-1')),
+                                (b'connection', b'close')]})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _run_wsgi(self, loop, scope, body, send):
+        """
+        在线程池中执行：调用 WSGI 应用，把响应头和响应体交给事件循环发送
+        每次切换到事件循环都有开销，这里总是暂存一块响应体：普通（非流式）响应的响应头、
+        响应体和结束标记在一次切换中发出
+        """
+        state = {'status': None, 'headers': None, 'started': False, 'pending': None}
+
+        def flush(more_body):
+            messages = []
+            if not state['started']:
+                state['started'] = True
+                messages.append({'type': 'http.response.start', 'status': state['status'],
+                                 'headers': state['headers']})
+            if state['pending'] is not None or not more_body:
+                messages.append({'type': 'http.response.body', 'body': state['pending'] or b'',
+                                 'more_body': more_body})
+            state['pending'] = None
+            # 等待发送完成：客户端接收慢时由服务器的流量控制让这里等待，不会无限缓冲
+            asyncio.run_coroutine_threadsafe(_send_all(send, messages), loop).result()
+
+        def write(data):
+            if not data:
+                return
+            if state['pending'] is not None:
+                flush(more_body=True)
+            state['pending'] = data
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and state['started']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = int(status.split(' ', 1)[0])
+            state['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                for name, value in headers]
+            return write
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                write(chunk)
+            flush(more_body=False)
+        finally:
+            close = getattr(result, 'close', None)
+            if close is not None:
+                close()
+
+
+async def _send_all(send, messages):
+    for message in messages:
+        await send(message)
+
+
+def declared_length(scope):
+    """
+    请求头中的 Content-Length，没有或无法解析时返回 None
+    """
+    for raw_name, raw_value in scope.get('headers', ()):
+        if raw_name.lower() == b'content-length':
+            try:
+                return int(raw_value)
+            except ValueError:
+                return None
+    return None
+
+
+def build_environ(scope, body):
+    """
+    由 ASGI scope 和已接收完的请求体构造 WSGI environ
+    """
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client')
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        # WSGI 规定路径为按 latin-1 解码的原始字节
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0] if client else '',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # 请求体已完整接收，没有 Content-Length（分块上传）时也可以读到末尾
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            key = name
+        else:
+            key = f'HTTP_{name}'
+        if key in environ:
+            # 重复的请求头按 RFC 9110 用逗号合并（Cookie 用分号）
+            separator = '; ' if key == 'HTTP_COOKIE' else ','
+            environ[key] = f'{environ[key]}{separator}{value}'
+        else:
+            environ[key] = value
+    return environ
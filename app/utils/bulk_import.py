@@ -0,0 +1,375 @@
+# app/utils/bulk_import.py
+"""
+用户、分类、项目的批量导入（flask import）
+
+通过 /api/auth/register、/item/create 逐条导入时，每一行都要做一次密码哈希、一次提交。
+这里的做法：
+- 流式读取 NDJSON / CSV，每次只在内存中保留一块（chunk_size 行）
+- 用户密码在多进程池中并行哈希，占满所有 CPU 核心
+- 分类名称通过内存中的 {名称: id} 映射解析，不存在的分类按需创建；用户名同样缓存
+- 每块使用一条多行 INSERT 批量写入，并在块结束时提交
+- 已处理的行数写入 import_checkpoint 表，与该块数据在同一个事务中提交；
+  中断后重新执行同一命令，从最后一次提交处继续
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice, repeat
+
+from sqlalchemy import Column, DateTime, Float, Integer, String, Table, delete, insert, select, update
+from werkzeug.security import generate_password_hash
+
+from app.extensions import db, cache, password_hasher
+from app.modules.auth.models import UserModel
+from app.modules.example.models import ExampleCategory, ExampleItem, adjust_item_counts
+
+IMPORT_KINDS = ('users', 'categories', 'items')
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+# 断点续传进度：每个 (输入文件, 导入类型) 一行
+checkpoint_table = Table(
+    'import_checkpoint', db.metadata,
+    Column('source', String(512), primary_key=True),    # 输入文件的绝对路径
+    Column('kind', String(16), primary_key=True),
+    Column('size', Integer, nullable=False),
+    Column('mtime', Float, nullable=False),
+    Column('committed', Integer, nullable=False),       # 已提交的记录数
+    Column('updated_at', DateTime, nullable=False),
+)
+
+
+class ImportRowError(ValueError):
+    """
+    单行数据不合法，跳过该行并记录原因
+    """
+
+
+def detect_format(path):
+    """
+    根据扩展名判断输入格式：.csv 为 CSV，其余（.ndjson / .jsonl / .json）按 NDJSON 处理
+    """
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def read_records(path, fmt):
+    """
+    逐行读取输入文件，产出 (行号, 字典)；无法解析的行产出 (行号, None)
+    """
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if fmt == 'csv':
+            for line_no, record in enumerate(csv.DictReader(f), start=2):
+                # CSV 中的空字符串视为未填写
+                yield line_no, {k: v for k, v in record.items() if k and v not in (None, '')}
+            return
+        for line_no, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else None
+
+
+class ImportCheckpoint:
+    """
+    导入检查点，保存在数据库的 import_checkpoint 表中，记录输入文件已提交的记录数
+    进度与每块数据在同一个事务中写入：提交成功则两者都在，中断则两者都不在，
+    恢复时不会重复导入已提交的块（项目没有天然的唯一键，重复导入会产生重复数据）
+    同时记录输入文件的大小和修改时间，文件发生变化后不再沿用旧的进度
+    """
+    def __init__(self, source, kind):
+        stat = os.stat(source)
+        self.source = os.path.abspath(source)
+        self.kind = kind
+        self.size = stat.st_size
+        self.mtime = stat.st_mtime
+        # 旧数据库中还没有这张表时直接创建
+        checkpoint_table.create(db.engine, checkfirst=True)
+
+    def _where(self):
+        return (checkpoint_table.c.source == self.source) & (checkpoint_table.c.kind == self.kind)
+
+    def load(self):
+        """
+        返回已提交的记录数；没有检查点或输入文件已变化时返回 0
+        """
+        row = db.session.execute(
+            select(checkpoint_table.c.size, checkpoint_table.c.mtime, checkpoint_table.c.committed)
+            .where(self._where())
+        ).first()
+        if row is None or row.size != self.size or row.mtime != self.mtime:
+            return 0
+        return row.committed
+
+    def save(self, committed):
+        """
+        在 db.session 当前的事务中记录进度，由调用方与该块数据一起提交
+        """
+        values = {'size': self.size, 'mtime': self.mtime, 'committed': committed, 'updated_at': datetime.now()}
+        updated = db.session.execute(update(checkpoint_table).where(self._where()).values(**values))
+        if updated.rowcount == 0:
+            db.session.execute(insert(checkpoint_table).values(source=self.source, kind=self.kind, **values))
+
+    def clear(self):
+        db.session.execute(delete(checkpoint_table).where(self._where()))
+        db.session.commit()
+
+
+class BulkImporter:
+    """
+    批量导入器
+    :param kind: users / categories / items
+    :param chunk_size: 每块（每次提交）的行数
+    :param workers: 并行哈希密码的进程数
+    :param progress: 每次提交后调用的回调，参数为当前统计
+    """
+    def __init__(self, kind, chunk_size=1000, workers=None, progress=None):
+        if kind not in IMPORT_KINDS:
+            raise ValueError(f'不支持的导入类型: {kind}')
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+        self.progress = progress
+        # 每种类型对应的 (单行校验, 批量写入) 方法
+        self._prepare, self._insert = {
+            'users': (self._prepare_user, self._insert_users),
+            'categories': (self._prepare_category, self._insert_categories),
+            'items': (self._prepare_item, self._insert_items),
+        }[kind]
+        self._categories = None     # 分类名称 -> id
+        self._users = {}            # 用户名 -> id
+        self._executor = None
+        self.stats = {
+            'processed': 0,     # 本次处理的记录数（不含恢复时跳过的）
+            'inserted': 0,
+            'skipped': 0,       # 已存在的用户名 / 分类名
+            'failed': 0,        # 数据不合法的行
+            'resumed_from': 0,
+            'seconds': 0.0,
+        }
+        self.errors = []        # [(行号, 原因)]，只保留前 100 条
+
+    def run(self, path, fmt=None, checkpoint=None):
+        """
+        导入一个文件，返回统计信息
+        :param checkpoint: ImportCheckpoint，为 None 时不支持断点续传
+        """
+        fmt = fmt or detect_format(path)
+        records = read_records(path, fmt)
+        committed = checkpoint.load() if checkpoint else 0
+        if committed:
+            # 跳过上次已提交的记录
+            records = islice(records, committed, None)
+            self.stats['resumed_from'] = committed
+
+        start = time.perf_counter()
+        try:
+            while True:
+                chunk = list(islice(records, self.chunk_size))
+                if not chunk:
+                    break
+                self._import_chunk(chunk)
+                committed += len(chunk)
+                if checkpoint:
+                    checkpoint.save(committed)
+                db.session.commit()
+                self.stats['processed'] += len(chunk)
+                self.stats['seconds'] = time.perf_counter() - start
+                if self.progress:
+                    self.progress(self.stats)
+        except BaseException:
+            db.session.rollback()
+            raise
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+            self.stats['seconds'] = time.perf_counter() - start
+
+        # 导入的数据会影响列表类接口，清除对应的响应缓存
+        cache.invalidate('items', 'categories')
+        if checkpoint:
+            checkpoint.clear()
+        return self.stats
+
+    def _fail(self, line_no, reason):
+        self.stats['failed'] += 1
+        if len(self.errors) < 100:
+            self.errors.append((line_no, reason))
+
+    def _import_chunk(self, chunk):
+        rows = []
+        for line_no, record in chunk:
+            if record is None:
+                self._fail(line_no, '无法解析的行')
+                continue
+            try:
+                rows.append((line_no, self._prepare(record)))
+            except ImportRowError as e:
+                self._fail(line_no, str(e))
+        if rows:
+            self._insert(rows)
+
+    # --- 用户 ---
+
+    def _prepare_user(self, record):
+        username = str(record.get('username') or '').strip()
+        password = record.get('password')
+        if not username or not password:
+            raise ImportRowError('用户名和密码不能为空')
+        is_admin = record.get('is_admin', False)
+        if isinstance(is_admin, str):
+            is_admin = is_admin.strip().lower() in ('1', 'true', 'yes')
+        return {'username': username, 'password': str(password), 'is_admin': bool(is_admin)}
+
+    def _insert_users(self, rows):
+        # 一次 IN 查询过滤已存在的用户名；同一块中重复的用户名只保留第一条
+        existing = set(db.session.scalars(
+            select(UserModel.username).where(UserModel.username.in_({r['username'] for _, r in rows}))
+        ))
+        new_rows = []
+        for _, row in rows:
+            if row['username'] in existing:
+                self.stats['skipped'] += 1
+                continue
+            existing.add(row['username'])
+            new_rows.append(row)
+        if not new_rows:
+            return
+
+        # 在进程池中并行哈希，结果顺序与输入一致
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        hashes = self._executor.map(
+            generate_password_hash,
+            [row['password'] for row in new_rows],
+            repeat(password_hasher.method),
+            chunksize=max(len(new_rows) // (self.workers * 4), 1),
+        )
+        for row, pwhash in zip(new_rows, hashes):
+            row['password'] = pwhash
+        db.session.execute(insert(UserModel), new_rows)
+        self.stats['inserted'] += len(new_rows)
+
+    # --- 分类 ---
+
+    def _category_map(self):
+        if self._categories is None:
+            self._categories = dict(db.session.execute(select(ExampleCategory.name, ExampleCategory.id)).all())
+        return self._categories
+
+    def _prepare_category(self, record):
+        name = str(record.get('name') or '').strip()
+        if not name:
+            raise ImportRowError('分类名称不能为空')
+        return name
+
+    def _insert_categories(self, rows):
+        categories = self._category_map()
+        new_names = []
+        for _, name in rows:
+            if name in categories or name in new_names:
+                self.stats['skipped'] += 1
+            else:
+                new_names.append(name)
+        self._create_categories(new_names)
+        self.stats['inserted'] += len(new_names)
+
+    def _create_categories(self, names):
+        if not names:
+            return
+        new_ids = sorted(db.session.scalars(
+            insert(ExampleCategory).returning(ExampleCategory.id),
+            [{'name': name} for name in names]
+        ).all())
+        self._category_map().update(zip(names, new_ids))
+
+    # --- 项目 ---
+
+    def _prepare_item(self, record):
+        name = str(record.get('name') or '').strip()
+        if not name:
+            raise ImportRowError('项目名称不能为空')
+        category = record.get('category_id') or record.get('category')
+        if not category:
+            raise ImportRowError('缺少分类（category 或 category_id）')
+        user = record.get('user_id') or record.get('username')
+        if not user:
+            raise ImportRowError('缺少用户（user_id 或 username）')
+        row = {
+            'name': name,
+            'description': record.get('description'),
+            'category': category,
+            'user': user,
+            'by_category_id': 'category_id' in record,
+            'by_user_id': 'user_id' in record,
+        }
+        if record.get('timestamp'):
+            # 迁移历史数据时保留原始创建时间
+            try:
+                row['timestamp'] = datetime.fromisoformat(record['timestamp'])
+            except (TypeError, ValueError):
+                raise ImportRowError('timestamp 必须是 ISO 8601 格式的时间')
+        return row
+
+    def _resolve_users(self, rows):
+        usernames = {r['user'] for _, r in rows if not r['by_user_id']} - self._users.keys()
+        if usernames:
+            self._users.update(db.session.execute(
+                select(UserModel.username, UserModel.id).where(UserModel.username.in_(usernames))
+            ).all())
+        user_ids = {int(r['user']) for _, r in rows if r['by_user_id'] and str(r['user']).isdigit()}
+        known_ids = set(db.session.scalars(select(UserModel.id).where(UserModel.id.in_(user_ids)))) if user_ids else set()
+        return known_ids
+
+    def _insert_items(self, rows):
+        categories = self._category_map()
+        known_category_ids = set(categories.values())
+        # 按名称引用、尚不存在的分类一次性创建
+        self._create_categories(list(dict.fromkeys(
+            str(r['category']).strip() for _, r in rows
+            if not r['by_category_id'] and str(r['category']).strip() not in categories
+        )))
+        known_user_ids = self._resolve_users(rows)
+
+        to_insert = []
+        for line_no, row in rows:
+            if row['by_category_id']:
+                category_id = int(row['category']) if str(row['category']).isdigit() else None
+                if category_id not in known_category_ids:
+                    self._fail(line_no, f"分类不存在: {row['category']}")
+                    continue
+            else:
+                category_id = categories[str(row['category']).strip()]
+            if row['by_user_id']:
+                user_id = int(row['user']) if str(row['user']).isdigit() else None
+                if user_id not in known_user_ids:
+                    self._fail(line_no, f"用户不存在: {row['user']}")
+                    continue
+            else:
+                user_id = self._users.get(row['user'])
+                if user_id is None:
+                    self._fail(line_no, f"用户不存在: {row['user']}")
+                    continue
+            params = {
+                'name': row['name'],
+                'description': row['description'],
+                'category_id': category_id,
+                'user_id': user_id,
+            }
+            if 'timestamp' in row:
+                params['timestamp'] = row['timestamp']
+            to_insert.append(params)
+        if not to_insert:
+            return
+
+        # 多行 INSERT 不会触发 ORM 的 after_insert 事件，分类计数在同一事务中一次性调整
+        # render_nulls：description 为空的行不会被拆成单独的 INSERT
+        db.session.execute(insert(ExampleItem), to_insert, execution_options={'render_nulls': True})
+        adjust_item_counts(db.session.connection(), Counter(p['category_id'] for p in to_insert))
+        self.stats['inserted'] += len(to_insert)
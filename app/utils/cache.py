@@ -0,0 +1,381 @@
+# app/utils/cache.py
+"""
+公开 GET 接口的响应缓存（读穿透 + 标签失效）
+
+- 缓存键：endpoint + 路径 + 排序后的查询参数
+- 过期：每条缓存带 TTL；超过 CACHE_MAX_ENTRIES 时按最近最少使用（LRU）淘汰
+- 失效：缓存写入时登记若干标签（如 'items'、'item:3'），写接口提交后按标签精确清除
+- 后端：
+    memory  进程内 OrderedDict，只适合单进程部署（多个 worker 各有一份，失效互不可见）
+    sqlite  共享的本地 SQLite 文件，多个 gunicorn worker 看到同一份缓存；
+            命中时不逐次写文件：accessed_at 每隔 CACHE_TOUCH_INTERVAL 秒才刷新一次，
+            命中/未命中计数先在进程内累加，每隔 CACHE_STATS_FLUSH_INTERVAL 秒合并写入一次
+    null    关闭缓存
+- 可压缩的响应写入缓存时一并保存 gzip 压缩后的字节（见 app/utils/compression.py），
+  命中时直接返回给支持 gzip 的客户端，不再重复压缩
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import current_app, g, request
+
+from app.utils.internal import internal_only
+from app.utils.response_handler import SuccessResponse
+
+
+class NullCacheBackend:
+    """
+    不缓存任何内容的后端，用于关闭缓存
+    """
+    def get(self, key):
+        return None
+
+    def set(self, key, entry, ttl, tags):
+        pass
+
+    def invalidate_tags(self, tags):
+        return 0
+
+    def incr(self, name, amount=1):
+        pass
+
+    def stats(self):
+        return {}
+
+    def clear(self):
+        pass
+
+
+class MemoryCacheBackend:
+    """
+    进程内 LRU + TTL 缓存
+    """
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires_at, entry, tags)
+        self._tags = {}                 # tag -> set(key)
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                self._remove(key)
+                return None
+            # 命中后移动到末尾，表示最近使用
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def set(self, key, entry, ttl, tags):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (time.time() + ttl, entry, tuple(tags))
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            # 超出容量时淘汰最久未使用的条目
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] = self._stats.get('evictions', 0) + 1
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._tags.pop(tag, set())
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._stats[name] = self._stats.get(name, 0) + amount
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+            data['entries'] = len(self._entries)
+            return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    基于本地 SQLite 文件的共享缓存
+    所有 worker 进程读写同一个文件，缓存内容、标签和命中统计在进程间保持一致
+    """
+    SCHEMA = [
+        'CREATE TABLE IF NOT EXISTS cache_entry ('
+        ' key TEXT PRIMARY KEY, body BLOB, status INTEGER, mimetype TEXT,'
+        ' expires_at REAL, accessed_at REAL, body_gzip BLOB)',
+        'CREATE INDEX IF NOT EXISTS ix_cache_entry_accessed_at ON cache_entry (accessed_at)',
+        'CREATE TABLE IF NOT EXISTS cache_tag (tag TEXT, key TEXT, PRIMARY KEY (tag, key))',
+        'CREATE INDEX IF NOT EXISTS ix_cache_tag_key ON cache_tag (key)',
+        'CREATE TABLE IF NOT EXISTS cache_stat (name TEXT PRIMARY KEY, value INTEGER)',
+    ]
+
+    def __init__(self, path, max_entries=1024, touch_interval=10, stats_flush_interval=5):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self.stats_flush_interval = stats_flush_interval
+        self._local = threading.local()
+        # 尚未写入 cache_stat 的计数（每个进程一份）
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._flushed_at = time.time()
+
+    def _connect(self):
+        # 每个进程、每个线程使用自己的连接（gunicorn fork 之后不能复用父进程的连接）
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for ddl in self.SCHEMA:
+                conn.execute(ddl)
+            # 旧版本创建的缓存文件没有 body_gzip 列
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(cache_entry)')]
+            if 'body_gzip' not in columns:
+                conn.execute('ALTER TABLE cache_entry ADD COLUMN body_gzip BLOB')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            'SELECT body, status, mimetype, expires_at, body_gzip, accessed_at FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[3] < now:
+            self._delete_keys(conn, [key])
+            return None
+        # LRU 只需要粗略的访问时间：间隔内的重复命中不再写文件，避免每次命中都争抢写锁
+        if row[5] is None or now - row[5] >= self.touch_interval:
+            conn.execute('UPDATE cache_entry SET accessed_at = ? WHERE key = ?', (now, key))
+        return {'body': row[0], 'status': row[1], 'mimetype': row[2], 'gzip': row[4]}
+
+    def set(self, key, entry, ttl, tags):
+        conn = self._connect()
+        now = time.time()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute('DELETE FROM cache_tag WHERE key = ?', (key,))
+            conn.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, body, status, mimetype, expires_at, accessed_at, body_gzip)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, entry['body'], entry['status'], entry['mimetype'], now + ttl, now, entry.get('gzip'))
+            )
+            conn.executemany('INSERT OR IGNORE INTO cache_tag (tag, key) VALUES (?, ?)',
+                             [(tag, key) for tag in tags])
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        # 先清理过期条目，仍超出容量时按 accessed_at 淘汰最久未使用的条目
+        expired = [r[0] for r in conn.execute('SELECT key FROM cache_entry WHERE expires_at < ?', (now,))]
+        self._delete_keys(conn, expired)
+        overflow = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0] - self.max_entries
+        if overflow > 0:
+            oldest = [r[0] for r in conn.execute(
+                'SELECT key FROM cache_entry ORDER BY accessed_at LIMIT ?', (overflow,))]
+            self._delete_keys(conn, oldest)
+            self._incr(conn, 'evictions', len(oldest))
+
+    def _delete_keys(self, conn, keys):
+        if not keys:
+            return
+        conn.executemany('DELETE FROM cache_entry WHERE key = ?', [(k,) for k in keys])
+        conn.executemany('DELETE FROM cache_tag WHERE key = ?', [(k,) for k in keys])
+
+    def invalidate_tags(self, tags):
+        conn = self._connect()
+        tags = list(tags)
+        placeholders = ','.join('?' * len(tags))
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            keys = [r[0] for r in conn.execute(
+                f'SELECT DISTINCT key FROM cache_tag WHERE tag IN ({placeholders})', tags)]
+            self._delete_keys(conn, keys)
+        return len(keys)
+
+    def _incr(self, conn, name, amount):
+        conn.execute(
+            'INSERT INTO cache_stat (name, value) VALUES (?, ?)'
+            ' ON CONFLICT(name) DO UPDATE SET value = value + excluded.value',
+            (name, amount)
+        )
+
+    def incr(self, name, amount=1):
+        with self._pending_lock:
+            self._pending[name] = self._pending.get(name, 0) + amount
+            due = time.time() - self._flushed_at >= self.stats_flush_interval
+        if due:
+            self.flush_stats()
+
+    def flush_stats(self):
+        """
+        把本进程累积的计数合并写入 cache_stat（一个事务、每个计数一条语句）
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.time()
+        if not pending:
+            return
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            for name, amount in pending.items():
+                self._incr(conn, name, amount)
+
+    def stats(self):
+        # 先写入本进程的计数；其他进程尚未写入的部分最多滞后 stats_flush_interval 秒
+        self.flush_stats()
+        conn = self._connect()
+        data = dict(conn.execute('SELECT name, value FROM cache_stat').fetchall())
+        data['entries'] = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        return data
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM cache_entry')
+            conn.execute('DELETE FROM cache_tag')
+
+
+class ResponseCache:
+    """
+    响应缓存扩展，使用方式与 db、migrate 一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.backend = NullCacheBackend()
+        self.default_ttl = 60
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        max_entries = app.config.get('CACHE_MAX_ENTRIES', 1024)
+        self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 60)
+
+        if backend == 'memory':
+            if app.config.get('WEB_CONCURRENCY', 1) > 1:
+                app.logger.warning('CACHE_BACKEND=memory 只适合单进程部署：多个 worker 的缓存和失效互不可见，'
+                                   '请改用 sqlite')
+            self.backend = MemoryCacheBackend(max_entries)
+        elif backend == 'sqlite':
+            self.backend = SQLiteCacheBackend(
+                app.config['CACHE_SQLITE_PATH'], max_entries,
+                touch_interval=app.config.get('CACHE_TOUCH_INTERVAL', 10),
+                stats_flush_interval=app.config.get('CACHE_STATS_FLUSH_INTERVAL', 5),
+            )
+        elif backend in (None, 'null'):
+            self.backend = NullCacheBackend()
+        else:
+            raise ValueError(f'未知的缓存后端: {backend}')
+
+        app.extensions['response_cache'] = self
+
+        # 暴露缓存命中统计
+        @app.route('/api/cache/stats', methods=['GET'])
+        @internal_only
+        def cache_stats():
+            return SuccessResponse(data=self.stats(), message="缓存统计获取成功")
+
+    @staticmethod
+    def make_key():
+        """
+        根据 endpoint、路径和规范化（排序）后的查询参数生成缓存键
+        """
+        args = sorted(request.args.items(multi=True))
+        key = f'{request.endpoint}:{request.path}?{urlencode(args)}'
+        # 外层有 @table_versions.conditional 时，键中带上生成 ETag 的表版本：
+        # 其他 worker 写入之后版本号变化，不会再用旧版本下缓存的响应体搭配新的 ETag 返回
+        versions_etag = g.get('_table_versions_etag')
+        if versions_etag:
+            key = f'{key}#{versions_etag}'
+        return key
+
+    def cached(self, tags, ttl=None):
+        """
+        视图缓存装饰器
+        :param tags: 标签列表，或接收视图参数、返回标签列表的函数
+        :param ttl: 过期秒数，默认使用 CACHE_DEFAULT_TTL
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                key = self.make_key()
+                compression = current_app.extensions.get('compression')
+                entry = self.backend.get(key)
+                if entry is not None:
+                    self.backend.incr('hits')
+                    response = current_app.response_class(
+                        entry['body'], status=entry['status'], mimetype=entry['mimetype'])
+                    if entry.get('gzip') and compression and compression.client_accepts_gzip():
+                        compression.apply(response, entry['gzip'])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+
+                self.backend.incr('misses')
+                response = current_app.make_response(func(*args, **kwargs))
+                # 只缓存成功的响应；读自落后于主库的副本时不缓存
+                replicas = current_app.extensions.get('replicas')
+                if (response.status_code == 200 and not response.is_streamed
+                        and (replicas is None or replicas.cacheable())):
+                    entry_tags = tags(**kwargs) if callable(tags) else tags
+                    entry = {
+                        'body': response.get_data(),
+                        'status': response.status_code,
+                        'mimetype': response.mimetype,
+                        'gzip': None,
+                    }
+                    if compression and compression.is_compressible(response):
+                        entry['gzip'] = compression.compress(entry['body'])
+                    self.backend.set(key, entry, ttl or self.default_ttl, entry_tags)
+                    if entry['gzip'] and compression.client_accepts_gzip():
+                        compression.apply(response, entry['gzip'])
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags):
+        """
+        清除带有任一标签的缓存，应在数据库提交之后调用
+        """
+        removed = self.backend.invalidate_tags(tags)
+        if removed:
+            self.backend.incr('invalidations', removed)
+        return removed
+
+    def stats(self):
+        return self.backend.stats()
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,124 @@
+# app/utils/compression.py
+"""
+响应压缩（gzip）
+
+在 after_request 中根据请求头 Accept-Encoding 协商，对可压缩类型（JSON、NDJSON、CSV、文本等）的响应做 gzip 压缩：
+- 普通响应：正文不小于 COMPRESS_MIN_SIZE 字节时才压缩，小响应压缩收益不抵 CPU 开销
+- 流式响应（生成器，例如 /item/export）：逐块压缩，每块之后 Z_SYNC_FLUSH，客户端仍能边生成边接收
+- 跳过：已有 Content-Encoding、304/204/206 等无正文或分段响应、send_file 直接发送的文件
+- 压缩后原有的强 ETag 改为弱 ETag（内容等价但字节不同），并加上 Vary: Accept-Encoding
+
+响应缓存（app/utils/cache.py）在写入可压缩的响应时会一并保存压缩后的字节，
+命中缓存时直接返回，重复请求不再付出压缩的 CPU 开销。
+"""
+import zlib
+
+from flask import request
+
+# gzip 格式（wbits=31：deflate + gzip 头尾）
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class Compression:
+    """
+    压缩扩展，使用方式与其他扩展一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.enabled = True
+        self.min_size = 1024
+        self.level = 6
+        self.mimetypes = set()
+        self.compress_streams = True
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.mimetypes = set(app.config.get('COMPRESS_MIMETYPES', ()))
+        self.compress_streams = app.config.get('COMPRESS_STREAMS', True)
+        if self.enabled:
+            app.after_request(self._after_request)
+        app.extensions['compression'] = self
+
+    # --- 供响应缓存复用的接口 ---
+
+    def is_compressible(self, response):
+        """
+        响应本身是否值得压缩（与客户端无关）：类型可压缩、非流式且正文足够大
+        """
+        return (self.enabled and response.mimetype in self.mimetypes
+                and not response.is_streamed and response.content_length is not None
+                and response.content_length >= self.min_size)
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+        return compressor.compress(data) + compressor.flush()
+
+    def client_accepts_gzip(self):
+        return self.enabled and request.accept_encodings['gzip'] > 0
+
+    @staticmethod
+    def apply(response, compressed):
+        """
+        用已压缩的正文替换响应内容，并设置相应的响应头
+        """
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+        Compression._adjust_headers(response)
+
+    # --- 中间件 ---
+
+    def _after_request(self, response):
+        if response.mimetype not in self.mimetypes:
+            return response
+        # 无论是否压缩，可压缩类型的响应内容都随 Accept-Encoding 变化
+        response.vary.add('Accept-Encoding')
+        if (not self.client_accepts_gzip() or 'Content-Encoding' in response.headers
+                or response.status_code in (204, 206, 304) or response.status_code < 200
+                or response.direct_passthrough or request.method == 'HEAD'):
+            return response
+
+        if response.is_streamed:
+            if self.compress_streams:
+                self._compress_stream(response)
+            return response
+
+        if response.content_length is not None and response.content_length >= self.min_size:
+            self.apply(response, self.compress(response.get_data()))
+        return response
+
+    def _compress_stream(self, response):
+        original = response.response
+        chunks = response.iter_encoded()
+        level = self.level
+
+        def generate():
+            compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+            try:
+                for chunk in chunks:
+                    # 每块之后同步刷新，已生成的数据可以立即发给客户端
+                    data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    if data:
+                        yield data
+                yield compressor.flush()
+            finally:
+                # 关闭原生成器（例如 stream_with_context 需要在这里清理请求上下文）
+                close = getattr(original, 'close', None)
+                if close is not None:
+                    close()
+
+        response.response = generate()
+        response.headers['Content-Encoding'] = 'gzip'
+        self._adjust_headers(response)
+
+    @staticmethod
+    def _adjust_headers(response):
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        if response.is_streamed:
+            # 压缩后的长度事先未知
+            response.headers.pop('Content-Length', None)
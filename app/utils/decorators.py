@@ -1,7 +1,7 @@
 # app/utils/decorators.py
 from functools import wraps
-from flask import session, g, request
-from app.modules.auth.models import UserModel
+from flask import session, g, request, current_app
+from app.utils.identity import load_identity
 from app.utils.exception_handler import APIException
 
 def login_required(func):
@@ -11,7 +11,8 @@ def login_required(func):
         if not user_id:
             raise APIException(message="请先登录", status_code=401, error_code=2001)
         
-        user = UserModel.query.get(user_id)
+        # 优先从身份缓存读取，大多数请求不需要再查询用户表
+        user = load_identity(user_id)
         if not user:
             raise APIException(message="用户不存在或已注销", status_code=404, error_code=3001)
         g.user = user
@@ -41,3 +42,52 @@ def permission_required(model):
             return func(*args, **kwargs)
         return wrapper
     return decorator
+
+def read_only(func):
+    """
+    只读接口：请求中的 SELECT 发往只读副本（未配置副本时没有任何影响）
+    该客户端刚写入过数据、副本延迟过大或不可用时读主库，见 app/utils/replicas.py
+    放在路由装饰器之后的最外层，使 ETag、缓存和身份查询也走同一个副本
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions.get('replicas')
+        if router is None:
+            return func(*args, **kwargs)
+        return router.run_read_only(func, args, kwargs)
+    return wrapper
+
+def rate_limit(rate=None, per='ip', group=None, concurrency=None):
+    """
+    限流装饰器，计数在所有 worker 进程之间共享（见 app/utils/rate_limit.py）
+    可叠加使用，例如同时按 IP 限速并限制整个分组的并发数
+    :param rate: 令牌桶速率，如 '10/minute'（桶容量 10，每 6 秒补充一个令牌）；用完时返回 429
+    :param per: 令牌桶按什么区分：'ip' 客户端地址 / 'user' 登录用户（未登录时按 IP）/ 'endpoint' 所有客户端共用
+    :param group: 分组名，默认为 endpoint；同一分组的路由共享令牌桶和并发名额
+    :param concurrency: 分组内同时处理的请求数上限，已满时返回 503
+    """
+    if per not in ('ip', 'user', 'endpoint'):
+        raise ValueError(f'未知的限流维度: {per}')
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            limiter = current_app.extensions.get('rate_limiter')
+            if limiter is None or not limiter.enabled:
+                return func(*args, **kwargs)
+
+            name = group or request.endpoint
+            if rate:
+                if per == 'user' and session.get('user_id'):
+                    identity = f"user:{session['user_id']}"
+                elif per == 'endpoint':
+                    identity = '*'
+                else:
+                    identity = f'ip:{request.remote_addr}'
+                limiter.hit(name, rate, identity)
+            if concurrency:
+                with limiter.concurrency(name, concurrency):
+                    return func(*args, **kwargs)
+            return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,88 @@
+# app/utils/engine_profile.py
+"""
+数据库引擎配置（连接池参数 + SQLite PRAGMA）
+
+默认设置下的 SQLite 使用回滚日志（rollback journal）：写事务提交时需要独占整个数据库文件，
+多个 gunicorn worker 同时读写时，读会阻塞写、写会阻塞读，负载一高就出现 "database is locked"。
+
+这里在每个新建立的连接上执行 SQLITE_PRAGMAS 中的设置：
+- journal_mode=WAL       写操作追加到 -wal 文件，读写互不阻塞（同一时刻仍只有一个写者）
+- synchronous=NORMAL     WAL 模式下只在检查点时 fsync，断电最多丢失最后几个事务，不会损坏数据库
+- busy_timeout           遇到写锁时等待（毫秒）而不是立即报错
+- mmap_size / cache_size 用内存映射和更大的页缓存减少读系统调用
+- temp_store=MEMORY      排序、临时索引放在内存中
+- foreign_keys=ON        SQLite 默认不校验外键
+
+连接池参数按数据库类型从 DATABASE_POOL_PROFILES 中选择，
+SQLALCHEMY_ENGINE_OPTIONS 中显式设置的值优先。
+"""
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_memory_database(url):
+    """
+    判断是否为内存数据库（sqlite:// 或 :memory:）；内存数据库使用单连接池，不能设置池参数
+    """
+    url = make_url(url)
+    database = url.database or ''
+    return url.get_backend_name() == 'sqlite' and (
+        database in ('', ':memory:') or url.query.get('mode') == 'memory')
+
+
+def build_engine_options(config):
+    """
+    根据数据库类型生成 SQLALCHEMY_ENGINE_OPTIONS，需在 db.init_app 之前调用
+    """
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    backend = make_url(uri).get_backend_name()
+    profiles = config.get('DATABASE_POOL_PROFILES', {})
+
+    if is_memory_database(uri):
+        options = {}
+    else:
+        options = dict(profiles.get(backend, profiles.get('default', {})))
+    if backend == 'sqlite' and not is_memory_database(uri):
+        # 与 busy_timeout 保持一致：驱动层等待锁的秒数，同时允许连接在线程之间归还到池中
+        busy_timeout = config.get('SQLITE_PRAGMAS', {}).get('busy_timeout', 5000)
+        options['connect_args'] = {'timeout': busy_timeout / 1000, 'check_same_thread': False}
+
+    # 显式配置优先
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    在一个 sqlite3 连接上执行 PRAGMA 设置
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def init_engine_profile(app, db):
+    """
+    为应用的所有 SQLite 引擎注册 connect 事件，需在 db.init_app 之后调用
+    """
+    pragmas = app.config.get('SQLITE_PRAGMAS') or {}
+    if not pragmas:
+        return
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    for engine in engines:
+        if engine.dialect.name != 'sqlite':
+            continue
+        engine_pragmas = dict(pragmas)
+        if is_memory_database(engine.url):
+            # 内存数据库不支持 WAL
+            engine_pragmas.pop('journal_mode', None)
+
+        @event.listens_for(engine, 'connect')
+        def _on_connect(dbapi_connection, connection_record, engine_pragmas=engine_pragmas):
+            apply_sqlite_pragmas(dbapi_connection, engine_pragmas)
@@ -6,12 +6,14 @@ from werkzeug.exceptions import HTTPException
 from sqlalchemy.exc import SQLAlchemyError
 import traceback
 
+from app.utils.query_monitor import NPlusOneQueryError
+
 class APIException(Exception):
     """
     自定义的 API 异常类。
     用于在业务逻辑中主动抛出可预知的错误。
     """
-    def __init__(self, message, status_code=400, error_code=None):
+    def __init__(self, message, status_code=400, error_code=None, data=None, headers=None):
         """
         初始化 APIException 实例。
         """
@@ -19,6 +21,8 @@ class APIException(Exception):
         self.message = message  # 错误信息
         self.status_code = status_code  # HTTP 状态码
         self.error_code = error_code  # 业务错误码
+        self.data = data  # 可选的附加数据（例如批量接口中每一行的校验结果）
+        self.headers = headers  # 可选的附加响应头（例如限流时的 Retry-After）
 
     def to_dict(self):
         """
@@ -26,11 +30,14 @@ class APIException(Exception):
 
         :return: 包含错误信息的字典
         """
-        return {
+        body = {
             "status": "error",  # 状态标识
             "message": self.message,  # 错误信息
             "error_code": self.error_code  # 业务错误码
         }
+        if self.data is not None:
+            body["data"] = self.data
+        return body
 
 def init_error_handlers(app):
     # 注册自定义 APIException 异常的处理函数
@@ -42,6 +49,8 @@ def init_error_handlers(app):
         response = jsonify(e.to_dict())
         # 设置 HTTP 状态码
         response.status_code = e.status_code
+        if e.headers:
+            response.headers.update(e.headers)
         # 返回响应
         return response
 
@@ -64,6 +73,9 @@ def init_error_handlers(app):
     # 注册 Exception 未知异常的处理函数
     @app.errorhandler(Exception)
     def handle_unexpected_error(e):
+        # 测试模式下的 N+1 检测失败直接抛出，让测试用例失败而不是得到一个 500 响应
+        if isinstance(e, NPlusOneQueryError):
+            raise e
         # 捕获所有未处理的异常，记录详细错误日志（包括堆栈信息）
         current_app.logger.error(f"未捕获的异常: {str(e)}\n{traceback.format_exc()}")
         # 返回统一的未知错误响应，状态码 500
@@ -0,0 +1,143 @@
+# app/utils/hashing.py
+"""
+密码哈希工作池
+
+scrypt / PBKDF2 这类密码哈希是故意设计得很慢的 CPU 密集计算。
+在请求线程里直接计算，登录高峰时会占满 worker，拖慢所有其他接口。
+
+PasswordHasher 把哈希计算放到一个有界的进程池中：
+- PASSWORD_HASH_WORKERS      进程池大小，同时也是并发哈希的上限；为 0（默认）时在当前线程计算
+- PASSWORD_HASH_QUEUE_TIMEOUT 等待空闲槽位的最长时间，超时直接返回 503，而不是无限排队
+- PASSWORD_HASH_METHOD       哈希算法与参数（werkzeug 格式），修改后用户下次登录时自动重新哈希
+
+哈希耗时、排队深度、拒绝次数单独统计，可通过 GET /api/hashing/stats 查看。
+
+进程池和槽位都是每个 worker 进程各自一份，上限只约束同一进程内的并发线程（gthread、ASGI 模式）。
+同步 gunicorn worker 每个进程同时只处理一个请求，进程池不会带来额外的并发，只是多出几个进程，
+因此默认为 0，多线程部署再按需开启；所有 worker 合计的并发上限由登录、注册路由上的
+@rate_limit(group='password_hash', concurrency=...) 跨进程控制（见 app/utils/rate_limit.py）。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from app.utils.exception_handler import APIException
+from app.utils.internal import internal_only
+from app.utils.response_handler import SuccessResponse
+
+
+class PasswordHasher:
+    """
+    密码哈希扩展，使用方式与 db、cache 一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.method = 'scrypt:32768:8:1'
+        self.workers = 0
+        self.queue_timeout = 2.0
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'hash_count': 0,        # 完成的哈希/校验次数
+            'hash_seconds_total': 0.0,
+            'hash_seconds_max': 0.0,
+            'queue_depth': 0,       # 当前正在等待或执行的任务数
+            'queue_depth_peak': 0,
+            'rejected': 0,          # 因排队超时被拒绝的次数
+        }
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', self.method)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)
+        self._slots = threading.BoundedSemaphore(max(self.workers, 1))
+        app.extensions['password_hasher'] = self
+
+        @app.route('/api/hashing/stats', methods=['GET'])
+        @internal_only
+        def hashing_stats():
+            return SuccessResponse(data=self.stats(), message="密码哈希统计获取成功")
+
+    def _get_executor(self):
+        # 进程池按需创建；gunicorn fork 出的子进程不能复用父进程的进程池
+        # 多线程 worker（gthread、ASGI 模式）中加锁，避免并发请求各自创建一个进程池
+        if self._executor is None or self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    self._executor_pid = os.getpid()
+        return self._executor
+
+    def _submit(self, func, *args):
+        executor = self._get_executor()
+        try:
+            return executor.submit(func, *args).result()
+        except BrokenProcessPool:
+            # 子进程被杀死（如 OOM）后整个进程池不可再用：丢弃并重建，重试一次
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False)
+            return self._get_executor().submit(func, *args).result()
+
+    def _run(self, func, *args):
+        with self._lock:
+            self._stats['queue_depth'] += 1
+            self._stats['queue_depth_peak'] = max(self._stats['queue_depth_peak'], self._stats['queue_depth'])
+        try:
+            # 等待空闲槽位，超时说明哈希池已饱和，快速失败
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                with self._lock:
+                    self._stats['rejected'] += 1
+                raise APIException("服务繁忙，请稍后重试", status_code=503, error_code=5003)
+            try:
+                start = time.perf_counter()
+                if self.workers > 0:
+                    result = self._submit(func, *args)
+                else:
+                    result = func(*args)
+                elapsed = time.perf_counter() - start
+            finally:
+                self._slots.release()
+        finally:
+            with self._lock:
+                self._stats['queue_depth'] -= 1
+
+        with self._lock:
+            self._stats['hash_count'] += 1
+            self._stats['hash_seconds_total'] += elapsed
+            self._stats['hash_seconds_max'] = max(self._stats['hash_seconds_max'], elapsed)
+        return result
+
+    def hash(self, password):
+        """
+        使用当前配置的算法生成密码哈希
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash, password):
+        """
+        校验密码是否与哈希匹配
+        """
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        判断已存储的哈希是否使用了过时的算法或参数
+        werkzeug 的哈希格式为 "method$salt$hash"，只需比较 method 部分
+        """
+        return pwhash.split('$', 1)[0] != self.method
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data['workers'] = self.workers
+        data['hash_seconds_avg'] = data['hash_seconds_total'] / data['hash_count'] if data['hash_count'] else 0.0
+        return data
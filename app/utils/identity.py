@@ -0,0 +1,188 @@
+# app/utils/identity.py
+"""
+当前登录用户的身份缓存
+
+login_required 和 /api/auth/status 每次请求都要根据 session['user_id'] 查询用户表。
+这里在每个 worker 进程内缓存用户的身份信息（id、username、is_admin、avatar），
+大多数已登录请求不再需要任何身份查询。
+
+缓存条目同时受三种机制约束，保证多个 gunicorn worker 之间不会长期不一致：
+- 共享失效计数：IDENTITY_GENERATIONS_PATH 是一个被所有 worker 映射（mmap）的计数器文件，
+  用户被修改（用户名、权限、头像）或删除的事务提交后，按 user_id 递增对应的计数器（由 UserModel 的
+  after_update / after_delete 事件自动触发）；缓存条目记录加载时的计数，计数变化即失效。
+  读取只是一次内存读，不需要查询数据库；该用户的所有会话、所有 worker 都会在下一次请求时重新加载
+- 版本戳：签名 session 中保存 identity_version，当前会话的用户信息变化时递增
+- TTL：计数器只在同一台机器的进程之间共享，多台机器部署时其他机器上的缓存最多在
+  IDENTITY_CACHE_TTL 秒后过期
+"""
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_request_context, session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.modules.auth.models import UserModel
+
+# 影响身份信息的字段，其他字段（如密码重新哈希）变化时不需要失效
+IDENTITY_FIELDS = ('username', 'is_admin', 'avatar')
+# session.info 中记录本事务内被修改或删除的用户 id
+PENDING_KEY = 'identity_invalidations'
+
+
+class CurrentUser:
+    """
+    轻量的用户身份对象，挂在 g.user 上，只包含鉴权需要的字段
+    需要修改用户数据时，请通过 db.session.get(UserModel, g.user.id) 加载模型
+    """
+    __slots__ = ('id', 'username', 'is_admin', 'avatar')
+
+    def __init__(self, id, username, is_admin, avatar):
+        self.id = id
+        self.username = username
+        self.is_admin = is_admin
+        self.avatar = avatar
+
+    @classmethod
+    def from_model(cls, user):
+        return cls(user.id, user.username, bool(user.is_admin), user.avatar)
+
+
+class IdentityCache:
+    """
+    进程内的身份缓存：user_id -> (过期时间, 版本号, CurrentUser)
+    """
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is None:
+                return None
+            expires_at, cached_version, identity = item
+            if expires_at < time.time() or cached_version != version:
+                del self._entries[user_id]
+                return None
+            return identity
+
+    def set(self, user_id, version, identity, ttl):
+        with self._lock:
+            self._entries[user_id] = (time.time() + ttl, version, identity)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedGenerations:
+    """
+    跨进程共享的失效计数器：一个 mmap 文件中的 slots 个 64 位整数，user_id 按取模落到其中一个
+    不同用户落到同一个计数器时只会多失效一次，不影响正确性；并发递增丢失一次也仍然是"变化了"
+    """
+    def __init__(self, slots=4096):
+        self.slots = slots
+        self._path = None
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _get_map(self):
+        path = current_app.config.get('IDENTITY_GENERATIONS_PATH')
+        if self._map is None or self._path != path:
+            with self._lock:
+                if self._map is None or self._path != path:
+                    size = self.slots * 8
+                    with open(path, 'a+b') as f:
+                        if os.fstat(f.fileno()).st_size < size:
+                            f.truncate(size)
+                        # MAP_SHARED：fork 出的 worker 与其他进程看到同一份数据
+                        self._map = mmap.mmap(f.fileno(), size)
+                    self._path = path
+        return self._map
+
+    def get(self, user_id):
+        return struct.unpack_from('<q', self._get_map(), (user_id % self.slots) * 8)[0]
+
+    def bump(self, user_id):
+        data = self._get_map()
+        pos = (user_id % self.slots) * 8
+        with self._lock:
+            struct.pack_into('<q', data, pos, struct.unpack_from('<q', data, pos)[0] + 1)
+
+
+identity_cache = IdentityCache()
+shared_generations = SharedGenerations()
+
+
+def load_identity(user_id):
+    """
+    获取用户身份，优先使用缓存；用户不存在时返回 None
+    """
+    version = (session.get('identity_version', 0), shared_generations.get(user_id))
+    identity = identity_cache.get(user_id, version)
+    if identity is not None:
+        return identity
+
+    user = db.session.get(UserModel, user_id)
+    if user is None:
+        return None
+    identity = CurrentUser.from_model(user)
+    identity_cache.set(user_id, version, identity, current_app.config.get('IDENTITY_CACHE_TTL', 60))
+    return identity
+
+
+def invalidate_identity(user_id):
+    """
+    用户信息（头像、权限等）发生变化或用户被删除时调用（UserModel 的修改提交后会自动调用）
+    清除本进程的缓存并递增共享失效计数，其他 worker、该用户的其他会话中的旧缓存随之失效；
+    如果是当前会话的用户，同时递增 session 中的版本戳
+    """
+    identity_cache.invalidate(user_id)
+    shared_generations.bump(user_id)
+    if has_request_context() and session.get('user_id') == user_id:
+        session['identity_version'] = session.get('identity_version', 0) + 1
+
+
+def _mark_changed(target):
+    session_ = inspect(target).session
+    if session_ is not None:
+        session_.info.setdefault(PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(UserModel, 'after_update')
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in IDENTITY_FIELDS):
+        _mark_changed(target)
+
+
+@event.listens_for(UserModel, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    _mark_changed(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_committed(session_):
+    # 提交之后才失效：提交前其他请求仍可能读到旧数据并重新写入缓存
+    for user_id in session_.info.pop(PENDING_KEY, ()):
+        invalidate_identity(user_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session_, previous_transaction):
+    if not session_.in_transaction():
+        session_.info.pop(PENDING_KEY, None)
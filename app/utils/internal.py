@@ -0,0 +1,60 @@
+# app/utils/internal.py
+"""
+内部运维接口的访问控制
+
+/metrics、/api/cache/stats、/api/hashing/stats、/api/jobs/stats 暴露了接口名、请求量、
+缓存键数量和任务错误等内部信息，不应对公网开放。加上 @internal_only 后，请求满足以下任一条件才放行：
+- 客户端地址在 INTERNAL_ENDPOINTS_ALLOW 列出的地址 / 网段内（默认只有本机）
+- 配置了 INTERNAL_ENDPOINTS_TOKEN，且请求带有 Authorization: Bearer <token>
+  （Prometheus 抓取配置中的 authorization / bearer_token 即可）
+
+客户端地址取自 request.remote_addr：部署在反向代理之后时需同时设置 PROXY_FIX_X_FOR，
+否则所有请求的地址都是代理本身（通常是 127.0.0.1），会被本机白名单放行。
+"""
+import hmac
+import ipaddress
+from functools import wraps
+
+from flask import current_app, request
+
+from app.utils.exception_handler import APIException
+
+
+def _allowed_networks():
+    networks = current_app.extensions.get('internal_networks')
+    if networks is None:
+        allow = current_app.config.get('INTERNAL_ENDPOINTS_ALLOW', ('127.0.0.1', '::1'))
+        if isinstance(allow, str):
+            allow = [item.strip() for item in allow.split(',') if item.strip()]
+        networks = [ipaddress.ip_network(item, strict=False) for item in allow]
+        current_app.extensions['internal_networks'] = networks
+    return networks
+
+
+def _client_allowed():
+    try:
+        address = ipaddress.ip_address(request.remote_addr or '')
+    except ValueError:
+        return False
+    return any(address in network for network in _allowed_networks())
+
+
+def _token_valid():
+    token = current_app.config.get('INTERNAL_ENDPOINTS_TOKEN')
+    if not token:
+        return False
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    # 常量时间比较，避免通过响应时间逐位猜出令牌
+    return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode())
+
+
+def internal_only(func):
+    """
+    只允许白名单地址或持有内部令牌的请求访问，否则返回 403
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if not (_client_allowed() or _token_valid()):
+            raise APIException(message="无权访问内部接口", status_code=403, error_code=4001)
+        return func(*args, **kwargs)
+    return wrapper
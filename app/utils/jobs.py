@@ -0,0 +1,371 @@
+# app/utils/jobs.py
+"""
+本地持久化任务队列（请求之后的后台工作）
+
+缩略图生成等工作不应占用请求，但放进进程内的线程池 / 进程池并不可靠：worker 重启、
+被 gunicorn 超时杀死或机器宕机时，还没执行的任务就丢了。这里把任务保存在数据库的 job 表中：
+- 发布：视图在业务写入的同一个会话中调用 job_queue.enqueue(...)，任务与业务数据在同一个事务中
+  提交或回滚（事务性发件箱），不会出现数据已提交而任务丢失、或任务存在而数据已回滚的情况
+- 执行：flask worker 启动一个进程池，定期用一条 UPDATE 领取到期的任务并交给子进程执行，
+  父进程负责记录结果；多个 flask worker 可以同时运行
+- 可见性超时：领取时设置 locked_until，执行期间父进程定期续期；worker 被杀死后，
+  任务在 JOB_VISIBILITY_TIMEOUT 秒后自动变回可领取状态，由其他 worker 重新执行
+- 重试：失败的任务按指数退避（JOB_RETRY_BACKOFF * 2^(n-1)，不超过 JOB_RETRY_BACKOFF_MAX，带随机抖动）
+  重新排队，执行 max_attempts 次仍失败则标记为 failed，保留在表中供排查
+
+任务可能被执行不止一次（例如执行完成但来不及记录结果时 worker 被杀死），任务函数需要是幂等的。
+
+定义任务：
+    @job_queue.task('storage.render_derivatives', max_attempts=3)
+    def render_derivatives_job(content_id): ...
+任务函数在子进程的应用上下文中执行，参数必须可以序列化为 JSON。
+"""
+import json
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+from flask import current_app
+from sqlalchemy import Column, DateTime, Index, Integer, String, Table, Text, and_, delete, func, insert, or_, select, update
+
+from app.utils.internal import internal_only
+from app.utils.response_handler import SuccessResponse
+
+TABLE_NAME = 'job'
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+JobTask = namedtuple('JobTask', 'func queue max_attempts')
+ClaimedJob = namedtuple('ClaimedJob', 'id name payload attempts max_attempts')
+
+DEFAULT_DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+class JobQueue:
+    """
+    任务队列扩展，使用方式与其他扩展一致：先实例化，再在工厂函数中 init_app(app, db)（需在 metrics 之后）
+    """
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.table = None
+        self.tasks = {}    # 任务名 -> JobTask，由 @task 在导入模块时注册
+        self.visibility_timeout = 300
+        self.max_attempts = 5
+        self.backoff = 10
+        self.backoff_max = 3600
+        self.retention = 7 * 86400
+        self.metrics = None
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.visibility_timeout = app.config.get('JOB_VISIBILITY_TIMEOUT', 300)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 5)
+        self.backoff = app.config.get('JOB_RETRY_BACKOFF', 10)
+        self.backoff_max = app.config.get('JOB_RETRY_BACKOFF_MAX', 3600)
+        self.retention = app.config.get('JOB_RETENTION_SECONDS', 7 * 86400)
+        # 注册到 db.metadata，db.create_all 和 flask db migrate 会一并创建这张表
+        self.table = db.metadata.tables.get(TABLE_NAME)
+        if self.table is None:
+            self.table = Table(
+                TABLE_NAME, db.metadata,
+                Column('id', Integer, primary_key=True),
+                Column('queue', String(64), nullable=False, default='default'),
+                Column('name', String(128), nullable=False),
+                Column('payload', Text, nullable=False),                  # JSON 格式的参数
+                Column('status', String(16), nullable=False, default='queued'),
+                Column('attempts', Integer, nullable=False, default=0),   # 已领取（执行）的次数
+                Column('max_attempts', Integer, nullable=False),
+                Column('run_at', DateTime, nullable=False),               # 最早执行时间（重试退避）
+                Column('locked_by', String(128)),                         # 执行中的 worker
+                Column('locked_until', DateTime),                         # 可见性超时
+                Column('last_error', Text),
+                Column('created_at', DateTime, nullable=False, default=datetime.now),
+                Column('finished_at', DateTime),
+                Index('ix_job_status_run_at', 'status', 'run_at'),
+            )
+
+        metrics = app.extensions.get('metrics')
+        if metrics is not None and metrics.enabled:
+            metrics.define('jobs_enqueued_total', 'counter', '按任务名统计的发布次数（随事务回滚的也计入）')
+            metrics.define('jobs_total', 'counter', '按任务名和结果（done / retry / failed）统计的执行次数')
+            metrics.define('job_duration_seconds', 'histogram', '任务执行耗时（秒）',
+                           app.config.get('JOB_DURATION_BUCKETS', DEFAULT_DURATION_BUCKETS))
+            self.metrics = metrics
+        app.extensions['job_queue'] = self
+
+        @app.route('/api/jobs/stats', methods=['GET'])
+        @internal_only
+        def job_stats():
+            return SuccessResponse(data=self.stats(), message="任务队列统计获取成功")
+
+    # --- 定义与发布 ---
+
+    def task(self, name, queue='default', max_attempts=None):
+        """
+        装饰器：把函数注册为名为 name 的任务
+        """
+        def decorator(func):
+            self.tasks[name] = JobTask(func, queue, max_attempts)
+            return func
+        return decorator
+
+    def enqueue(self, name, delay=0, **payload):
+        """
+        在 db.session 当前的事务中插入一个任务，随业务数据一起 commit 才会被 worker 看到
+        :param delay: 至少延迟多少秒执行
+        """
+        task = self.tasks.get(name)
+        if task is None:
+            raise ValueError(f'未注册的任务: {name}')
+        now = datetime.now()
+        self.db.session.execute(insert(self.table).values(
+            queue=task.queue, name=name, payload=json.dumps(payload, ensure_ascii=False),
+            status='queued', attempts=0, max_attempts=task.max_attempts or self.max_attempts,
+            run_at=now + timedelta(seconds=delay), created_at=now,
+        ))
+        if self.metrics is not None:
+            self.metrics.inc('jobs_enqueued_total', {'name': name})
+
+    # --- 领取与结果（由 Worker 在父进程中调用，每次都是一个独立的短事务） ---
+
+    def claim(self, worker_id, limit, queues=None):
+        """
+        领取最多 limit 个到期的任务，包括可见性超时的执行中任务
+        领取即把 attempts 加一：attempts 同时作为本次领取的凭证，记录结果时核对，
+        任务已被其他 worker 重新领取时旧结果不会覆盖新状态
+        """
+        t = self.table
+        now = datetime.now()
+        expired = and_(t.c.status == 'running', t.c.locked_until < now)
+        with self.db.engine.begin() as connection:
+            # 超时且已用完次数的任务不再领取（很可能每次执行都导致 worker 崩溃）
+            connection.execute(
+                update(t).where(expired, t.c.attempts >= t.c.max_attempts)
+                .values(status='failed', finished_at=now, locked_by=None, locked_until=None,
+                        last_error='执行超时：超过可见性超时仍未完成，已达到最大执行次数')
+            )
+            candidates = (
+                select(t.c.id)
+                .where(or_(and_(t.c.status == 'queued', t.c.run_at <= now), expired))
+                .order_by(t.c.run_at, t.c.id)
+                .limit(limit)
+                # PostgreSQL / MySQL 上跳过其他 worker 正在领取的行；SQLite 的写事务本身是串行的
+                .with_for_update(skip_locked=True)
+            )
+            if queues:
+                candidates = candidates.where(t.c.queue.in_(queues))
+            rows = connection.execute(
+                update(t).where(t.c.id.in_(candidates.scalar_subquery()))
+                .values(status='running', attempts=t.c.attempts + 1, locked_by=worker_id,
+                        locked_until=now + timedelta(seconds=self.visibility_timeout))
+                .returning(t.c.id, t.c.name, t.c.payload, t.c.attempts, t.c.max_attempts)
+            ).all()
+        return [ClaimedJob(row.id, row.name, json.loads(row.payload), row.attempts, row.max_attempts)
+                for row in rows]
+
+    def _owned(self, job, worker_id):
+        t = self.table
+        return and_(t.c.id == job.id, t.c.status == 'running',
+                    t.c.locked_by == worker_id, t.c.attempts == job.attempts)
+
+    def heartbeat(self, jobs, worker_id):
+        """
+        为仍在执行的任务续期可见性超时
+        """
+        if not jobs:
+            return
+        t = self.table
+        locked_until = datetime.now() + timedelta(seconds=self.visibility_timeout)
+        with self.db.engine.begin() as connection:
+            for job in jobs:
+                connection.execute(update(t).where(self._owned(job, worker_id)).values(locked_until=locked_until))
+
+    def complete(self, job, worker_id, seconds):
+        with self.db.engine.begin() as connection:
+            connection.execute(
+                update(self.table).where(self._owned(job, worker_id))
+                .values(status='done', finished_at=datetime.now(), locked_by=None, locked_until=None)
+            )
+        self._record(job, 'done', seconds)
+
+    def fail(self, job, worker_id, error, seconds=None):
+        """
+        记录一次失败：还有次数时按指数退避重新排队，否则标记为 failed
+        """
+        now = datetime.now()
+        if job.attempts < job.max_attempts:
+            status = 'retry'
+            delay = min(self.backoff_max, self.backoff * 2 ** (job.attempts - 1))
+            values = {'status': 'queued', 'run_at': now + timedelta(seconds=delay * random.uniform(0.5, 1.0))}
+        else:
+            status = 'failed'
+            values = {'status': 'failed', 'finished_at': now}
+        with self.db.engine.begin() as connection:
+            connection.execute(
+                update(self.table).where(self._owned(job, worker_id))
+                .values(locked_by=None, locked_until=None, last_error=error[-4000:], **values)
+            )
+        self._record(job, status, seconds)
+        return status
+
+    def _record(self, job, status, seconds):
+        if self.metrics is None:
+            return
+        self.metrics.inc('jobs_total', {'name': job.name, 'status': status})
+        if seconds is not None:
+            self.metrics.observe('job_duration_seconds', {'name': job.name}, seconds)
+
+    def purge(self):
+        """
+        删除完成超过 JOB_RETENTION_SECONDS 秒的任务；failed 的任务保留
+        """
+        t = self.table
+        cutoff = datetime.now() - timedelta(seconds=self.retention)
+        with self.db.engine.begin() as connection:
+            return connection.execute(delete(t).where(t.c.status == 'done', t.c.finished_at < cutoff)).rowcount
+
+    def stats(self):
+        t = self.table
+        now = datetime.now()
+        with self.db.engine.connect() as connection:
+            rows = connection.execute(
+                select(t.c.queue, t.c.status, func.count()).group_by(t.c.queue, t.c.status)
+            ).all()
+            oldest = connection.execute(
+                select(func.min(t.c.run_at)).where(t.c.status == 'queued', t.c.run_at <= now)
+            ).scalar()
+        queues = {}
+        for queue, status, count in rows:
+            queues.setdefault(queue, dict.fromkeys(STATUSES, 0))[status] = count
+        return {
+            'queues': queues,
+            # 最早一个到期未执行的任务已等待的秒数，持续增长说明 worker 处理不过来
+            'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0,
+            'tasks': sorted(self.tasks),
+        }
+
+
+# --- worker 子进程 ---
+
+_worker_app = None
+
+
+def _init_worker_process():
+    # 停止由父进程统一处理：Ctrl+C / SIGTERM 时子进程继续执行完手上的任务
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # fork 继承的连接池中的连接属于父进程，不能在子进程中使用
+    with _worker_app.app_context():
+        for engine in current_app.extensions['sqlalchemy'].engines.values():
+            engine.dispose(close=False)
+
+
+def _execute_job(name, payload):
+    """
+    在子进程中执行：返回 (错误信息或 None, 耗时秒数)
+    异常在子进程中格式化，避免无法序列化的异常对象传回父进程时出错
+    """
+    start = time.perf_counter()
+    with _worker_app.app_context():
+        try:
+            current_app.extensions['job_queue'].tasks[name].func(**payload)
+        except Exception:
+            return traceback.format_exc(), time.perf_counter() - start
+    return None, time.perf_counter() - start
+
+
+class Worker:
+    """
+    flask worker 的主循环：父进程领取任务、续期、记录结果，子进程（fork）执行任务函数
+    """
+    PURGE_INTERVAL = 3600
+
+    def __init__(self, app, processes=1, queues=None, poll_interval=1.0):
+        self.app = app
+        self.queue = app.extensions['job_queue']
+        self.processes = max(processes, 1)
+        self.queues = list(queues or [])
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.logger = app.logger
+        self._stopping = False
+
+    def stop(self, *args):
+        if not self._stopping:
+            self.logger.info('任务 worker 收到停止信号，执行完当前任务后退出')
+        self._stopping = True
+
+    def _new_executor(self):
+        global _worker_app
+        _worker_app = self.app
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=get_context('fork'),
+                                   initializer=_init_worker_process)
+
+    def run(self, once=False):
+        """
+        :param once: 执行完当前所有到期的任务后退出（不等待新任务）
+        :return: {'done': n, 'retry': n, 'failed': n}
+        """
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        counts = {'done': 0, 'retry': 0, 'failed': 0}
+        running = {}   # future -> ClaimedJob
+        heartbeat_every = max(self.queue.visibility_timeout / 3, 1)
+        last_heartbeat = time.time()
+        last_purge = 0
+        executor = self._new_executor()
+        try:
+            while True:
+                if not self._stopping and len(running) < self.processes:
+                    for job in self.queue.claim(self.worker_id, self.processes - len(running), self.queues):
+                        if job.name not in self.queue.tasks:
+                            counts[self.queue.fail(job, self.worker_id, f'未注册的任务: {job.name}')] += 1
+                            continue
+                        running[executor.submit(_execute_job, job.name, job.payload)] = job
+
+                if not running:
+                    if once or self._stopping:
+                        break
+                    if time.time() - last_purge > self.PURGE_INTERVAL:
+                        last_purge = time.time()
+                        self.queue.purge()
+                    time.sleep(self.poll_interval)
+                    continue
+
+                done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                broken = False
+                for future in done:
+                    job = running.pop(future)
+                    try:
+                        error, seconds = future.result()
+                    except BrokenProcessPool as e:
+                        # 子进程异常退出（被 OOM 杀死、段错误等），进程池需要重建
+                        broken = True
+                        error, seconds = f'worker 子进程异常退出: {e}', None
+                    if error is None:
+                        self.queue.complete(job, self.worker_id, seconds)
+                        counts['done'] += 1
+                    else:
+                        status = self.queue.fail(job, self.worker_id, error, seconds)
+                        counts[status] += 1
+                        self.logger.warning(f'任务执行失败（{status}）: {job.name} #{job.id} '
+                                            f'第 {job.attempts}/{job.max_attempts} 次 - {error.strip().splitlines()[-1]}')
+                if broken:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self._new_executor()
+
+                if running and time.time() - last_heartbeat >= heartbeat_every:
+                    last_heartbeat = time.time()
+                    self.queue.heartbeat(list(running.values()), self.worker_id)
+        finally:
+            executor.shutdown(wait=True)
+        return counts
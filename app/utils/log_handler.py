@@ -1,8 +1,167 @@
 # app/utils/log_handler.py
+"""
+日志初始化
 
+请求线程中的 app.logger 只挂一个 QueueHandler：写日志只是把记录放进内存队列，
+真正的文件、终端 I/O 由每个进程内的 QueueListener 后台线程完成，不再阻塞请求。
+
+多个 gunicorn worker 共用 logs/ 目录时，普通的 RotatingFileHandler 会各自判断、各自轮转，
+导致日志丢失或错乱。这里的文件处理器在写入和轮转时持有 <日志文件>.lock 的进程间文件锁
+（fcntl，Windows 下使用 msvcrt），并在发现文件已被其他进程轮转时重新打开。
+
+LOG_FORMAT=json 时输出结构化 JSON（每行一条），附带请求 ID、endpoint、进程号等字段；
+请求 ID 取自请求头 X-Request-ID（没有则生成），并在响应头中返回。
+"""
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import uuid
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import g, has_request_context, request
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    try:
+        import msvcrt
+    except ImportError:
+        msvcrt = None
+
+
+class InterProcessLock:
+    """
+    基于锁文件的进程间互斥锁
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if self._file is None:
+            self._file = open(self.path, 'a+')
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class ProcessSafeRotatingFileHandler(RotatingFileHandler):
+    """
+    多进程共享同一个日志文件时安全轮转的 RotatingFileHandler
+    """
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding='utf-8'):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding, delay=True)
+        self._process_lock = InterProcessLock(self.baseFilename + '.lock')
+
+    def _reopen_if_rotated(self):
+        # 其他进程轮转之后，当前打开的文件已被改名为 .1，需要重新打开新的日志文件
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev):
+            self.stream.close()
+            self.stream = None
+
+    def emit(self, record):
+        try:
+            with self._process_lock:
+                self._reopen_if_rotated()
+                if self.shouldRollover(record):
+                    self.doRollover()
+                logging.FileHandler.emit(self, record)
+        except Exception:
+            self.handleError(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    每条日志输出为一行 JSON
+    """
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'func': record.funcName,
+            'line': record.lineno,
+            'pid': record.process,
+            'request_id': getattr(record, 'request_id', None),
+            'endpoint': getattr(record, 'endpoint', None),
+            'method': getattr(record, 'method', None),
+            'path': getattr(record, 'path', None),
+        }
+        # 经过队列的记录，堆栈已由 QueueHandler.prepare 合并进 message
+        if record.exc_info:
+            data['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RequestContextFilter(logging.Filter):
+    """
+    在请求线程中（入队之前）把请求 ID、endpoint 等信息附加到日志记录上
+    """
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.endpoint = request.endpoint
+            record.method = request.method
+            record.path = request.path
+        else:
+            record.request_id = record.endpoint = record.method = record.path = None
+        return True
+
+
+class ForkSafeQueueHandler(QueueHandler):
+    """
+    QueueHandler + 每个进程自己的 QueueListener
+    gunicorn --preload 在创建应用之后才 fork，子进程中没有监听线程，第一次写日志时重新创建
+    """
+    def __init__(self, handlers):
+        super().__init__(queue.SimpleQueue())
+        self.handlers = handlers
+        self.listener = None
+        self._pid = None
+        self._start_listener()
+        # 进程退出前把队列中剩余的日志写完
+        atexit.register(self.stop_listener)
+
+    def _start_listener(self):
+        if self._pid is not None:
+            # fork 出的子进程：父进程的队列和监听线程都不可用
+            self.queue = queue.SimpleQueue()
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def stop_listener(self):
+        if self._pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().enqueue(record)
+
 
 def register_logging(app):
     # 1. 创建 logs 文件夹
@@ -10,23 +169,55 @@ def register_logging(app):
     if not os.path.exists(log_dir):
         os.makedirs(log_dir)
 
-    # 2. 定义日志格式
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - %(filename)s - %(funcName)s - %(lineno)s - %(message)s'
-    )
+    # 2. 定义日志格式（LOG_FORMAT=json 时输出结构化日志）
+    if app.config.get('LOG_FORMAT') == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            '%(asctime)s - %(levelname)s - %(filename)s - %(funcName)s - %(lineno)s - %(message)s'
+        )
 
-    # 3. 创建文件处理器 (带轮转功能)
+    # 3. 创建文件处理器 (带轮转功能，多进程安全)
     log_path = os.path.join(log_dir, 'app.log')
     # maxBytes: 单个文件最大 5MB, backupCount: 保留最近 10 个文件
-    file_handler = RotatingFileHandler(log_path, maxBytes=5*1024*1024, backupCount=10)
+    file_handler = ProcessSafeRotatingFileHandler(log_path, maxBytes=5*1024*1024, backupCount=10)
     file_handler.setFormatter(formatter)
 
     # 4. 创建控制台处理器
     stream_handler = logging.StreamHandler()
     stream_handler.setFormatter(formatter)
 
-    # 5. 从 app.logger 中移除默认的处理器，并添加我们自己的
+    # 5. 慢查询与 N+1 检测日志（app/utils/query_monitor.py）
+    #    除了 app.log 之外再单独写一份 slow_query.log 便于排查
+    sql_logger_name = f'{app.logger.name}.sql'
+    sql_handler = ProcessSafeRotatingFileHandler(
+        os.path.join(log_dir, 'slow_query.log'), maxBytes=5*1024*1024, backupCount=5)
+    sql_handler.setFormatter(formatter)
+    sql_handler.addFilter(logging.Filter(sql_logger_name))
+    sql_logger = logging.getLogger(sql_logger_name)
+    del sql_logger.handlers[:]
+    sql_logger.setLevel(logging.WARNING)
+
+    # 6. 所有处理器放在队列之后，由后台线程执行 I/O；app.logger 只挂 QueueHandler
+    queue_handler = ForkSafeQueueHandler([file_handler, stream_handler, sql_handler])
+    queue_handler.addFilter(RequestContextFilter())
+    old_handlers = [h for h in app.logger.handlers if isinstance(h, ForkSafeQueueHandler)]
     del app.logger.handlers[:]
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(stream_handler)
+    for handler in old_handlers:
+        # 重复创建应用（例如测试中）时停止旧的监听线程
+        handler.stop_listener()
+    app.logger.addHandler(queue_handler)
     app.logger.setLevel(logging.INFO)
+    app.extensions['log_listener'] = queue_handler
+
+    # 7. 请求 ID：优先使用上游（nginx 等）传入的 X-Request-ID，并在响应头中返回
+    @app.before_request
+    def assign_request_id():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def return_request_id(response):
+        request_id = g.get('request_id')
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
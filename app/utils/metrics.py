@@ -0,0 +1,368 @@
+# app/utils/metrics.py
+"""
+请求与 SQL 指标采集，通过 GET /metrics 以 Prometheus 文本格式暴露
+
+采集内容（通过 before/after_request 钩子和 SQLAlchemy 引擎事件）：
+- http_requests_total                   按 endpoint、method、status 统计的请求数
+- http_request_duration_seconds         按 endpoint、method 统计的耗时直方图
+- http_requests_in_progress             正在处理的请求数
+- http_response_size_bytes              响应体大小直方图（流式响应大小未知，不统计）
+- db_statements_per_request             每个请求执行的 SQL 语句数直方图
+- db_statement_seconds_per_request      每个请求花在 SQL 上的总时间直方图
+
+多进程聚合：
+gunicorn 的每个 worker 都有自己的内存，进程内计数器只能看到自己处理的请求。
+这里每个进程把指标写入 METRICS_DIR/<pid>.mmap（基于 mmap 的追加式键值文件，
+写入只是一次内存写，不需要锁和系统调用），/metrics 被请求时读取目录下所有文件求和：
+- 计数器和直方图：所有进程（包括已退出的进程）的值相加
+- 正在处理的请求数：只统计仍存活的进程
+新进程启动时，把已退出进程的文件合并进 archived.mmap，避免文件数量不断增长。
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.utils.internal import internal_only
+
+try:
+    import fcntl
+except ImportError:  # Windows 下没有 fcntl，跳过目录锁
+    fcntl = None
+
+INITIAL_FILE_SIZE = 64 * 1024
+ARCHIVE_FILE = 'archived.mmap'
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DEFAULT_SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+DEFAULT_SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class MmapStore:
+    """
+    单个进程独占写入的 mmap 键值文件
+    文件格式：前 8 字节为已用长度；之后每条记录为
+        4 字节键长度 + UTF-8 键（补齐到 8 字节边界）+ 8 字节 double 值
+    """
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(INITIAL_FILE_SIZE)
+        self._capacity = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._used = struct.unpack_from('<i', self._map, 0)[0] or 8
+        for key, _, pos in _iter_entries(self._map, self._used):
+            self._positions[key] = pos
+
+    def _init_key(self, key):
+        encoded = key.encode('utf-8')
+        padded = encoded + b' ' * (8 - (len(encoded) + 4) % 8)
+        entry = struct.pack(f'<i{len(padded)}sd', len(encoded), padded, 0.0)
+        while self._used + len(entry) > self._capacity:
+            # 空间不足时把文件扩大一倍并重新映射
+            self._capacity *= 2
+            self._map.close()
+            self._file.truncate(self._capacity)
+            self._map = mmap.mmap(self._file.fileno(), self._capacity)
+        self._map[self._used:self._used + len(entry)] = entry
+        self._used += len(entry)
+        struct.pack_into('<i', self._map, 0, self._used)
+        self._positions[key] = self._used - 8
+        return self._positions[key]
+
+    def inc(self, key, amount=1.0):
+        with self._lock:
+            pos = self._positions.get(key)
+            if pos is None:
+                pos = self._init_key(key)
+            value = struct.unpack_from('<d', self._map, pos)[0]
+            struct.pack_into('<d', self._map, pos, value + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _iter_entries(data, used):
+    pos = 8
+    while pos < used:
+        key_len = struct.unpack_from('<i', data, pos)[0]
+        key = bytes(data[pos + 4:pos + 4 + key_len]).decode('utf-8')
+        pos += 4 + key_len + (8 - (key_len + 4) % 8)
+        yield key, struct.unpack_from('<d', data, pos)[0], pos
+        pos += 8
+
+
+def read_store(path):
+    """
+    读取一个指标文件（可能属于其他进程），返回 {键: 值}
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < 8:
+        return {}
+    used = struct.unpack_from('<i', data, 0)[0]
+    return {key: value for key, value, _ in _iter_entries(data, min(used, len(data)))}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metrics:
+    """
+    指标扩展，使用方式与 cache、password_hasher 一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.enabled = False
+        self.directory = None
+        self._definitions = {}   # 指标名 -> (类型, 说明, 直方图分桶)
+        self._store = None
+        self._store_pid = None
+        self._store_lock = threading.Lock()
+        self._sql_events_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        if not self.enabled:
+            return
+        self.directory = app.config['METRICS_DIR']
+        os.makedirs(self.directory, exist_ok=True)
+        latency_buckets = app.config.get('METRICS_LATENCY_BUCKETS', DEFAULT_LATENCY_BUCKETS)
+
+        self.define('http_requests_total', 'counter', '按 endpoint、method、status 统计的请求数')
+        self.define('http_request_duration_seconds', 'histogram', '请求处理耗时（秒）', latency_buckets)
+        self.define('http_requests_in_progress', 'gauge', '正在处理的请求数')
+        self.define('http_response_size_bytes', 'histogram', '响应体大小（字节）', DEFAULT_SIZE_BUCKETS)
+        self.define('db_statements_per_request', 'histogram', '每个请求执行的 SQL 语句数', DEFAULT_SQL_COUNT_BUCKETS)
+        self.define('db_statement_seconds_per_request', 'histogram', '每个请求执行 SQL 的总耗时（秒）', latency_buckets)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        self._register_sql_events()
+        app.extensions['metrics'] = self
+
+        @app.route('/metrics', methods=['GET'])
+        @internal_only
+        def metrics_endpoint():
+            return app.response_class(self.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    def define(self, name, kind, help_text, buckets=None):
+        self._definitions[name] = (kind, help_text, tuple(buckets or ()))
+
+    # --- 写入 ---
+
+    def _get_store(self):
+        # gunicorn fork 出的子进程需要写入自己的文件
+        pid = os.getpid()
+        if self._store is None or self._store_pid != pid:
+            with self._store_lock:
+                if self._store is None or self._store_pid != pid:
+                    self._archive_dead_processes()
+                    self._store = MmapStore(os.path.join(self.directory, f'{pid}.mmap'))
+                    self._store_pid = pid
+        return self._store
+
+    @staticmethod
+    def _key(name, labels):
+        return json.dumps([name, sorted(labels.items())], ensure_ascii=False, separators=(',', ':'))
+
+    def inc(self, name, labels, amount=1.0):
+        self._get_store().inc(self._key(name, labels), amount)
+
+    def observe(self, name, labels, value):
+        """
+        直方图观测：只记录落入的第一个分桶，输出时再累加成 Prometheus 的累计分桶
+        """
+        buckets = self._definitions[name][2]
+        le = next((b for b in buckets if value <= b), float('inf'))
+        store = self._get_store()
+        store.inc(self._key(f'{name}_bucket', dict(labels, le=_format_value(le))))
+        store.inc(self._key(f'{name}_sum', labels), value)
+        store.inc(self._key(f'{name}_count', labels))
+
+    # --- 请求钩子 ---
+
+    def _before_request(self):
+        if request.endpoint == 'metrics_endpoint':
+            return
+        g._metrics = {'start': time.perf_counter(), 'sql_count': 0, 'sql_seconds': 0.0,
+                      'endpoint': request.endpoint or 'unmatched'}
+        self.inc('http_requests_in_progress', {'method': request.method})
+
+    def _after_request(self, response):
+        state = g.get('_metrics')
+        if state is None:
+            return response
+        labels = {'endpoint': state['endpoint'], 'method': request.method}
+        self.inc('http_requests_total', dict(labels, status=str(response.status_code)))
+        self.observe('http_request_duration_seconds', labels, time.perf_counter() - state['start'])
+        if not response.is_streamed and response.content_length is not None:
+            self.observe('http_response_size_bytes', {'endpoint': state['endpoint']}, response.content_length)
+        self.observe('db_statements_per_request', {'endpoint': state['endpoint']}, state['sql_count'])
+        self.observe('db_statement_seconds_per_request', {'endpoint': state['endpoint']}, state['sql_seconds'])
+        return response
+
+    def _teardown_request(self, exc):
+        # teardown 一定会执行，保证 in_progress 在异常时也能减回去
+        if g.pop('_metrics', None) is not None:
+            self.inc('http_requests_in_progress', {'method': request.method}, -1)
+
+    def _register_sql_events(self):
+        # 监听的是 Engine 类，对所有引擎生效；多次 init_app（例如测试中创建多个应用）时只注册一次
+        if self._sql_events_registered:
+            return
+        self._sql_events_registered = True
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('metrics_query_start')
+            if not starts:
+                return
+            elapsed = time.perf_counter() - starts.pop()
+            if has_request_context():
+                state = g.get('_metrics')
+                if state is not None:
+                    state['sql_count'] += 1
+                    state['sql_seconds'] += elapsed
+
+    # --- 多进程聚合 ---
+
+    def _lock_directory(self, exclusive):
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.directory, '.lock'), 'a+')
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        return lock_file
+
+    def _unlock_directory(self, lock_file):
+        if lock_file is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _archive_dead_processes(self):
+        """
+        把已退出进程的计数器和直方图合并进 archived.mmap，并删除它们的文件
+        （当前进程的旧文件来自使用相同 pid 的已退出进程，同样合并）
+        """
+        lock_file = self._lock_directory(exclusive=True)
+        try:
+            dead = []
+            for path in glob.glob(os.path.join(self.directory, '*.mmap')):
+                name = os.path.basename(path)[:-len('.mmap')]
+                if name.isdigit() and (int(name) == os.getpid() or not _pid_alive(int(name))):
+                    dead.append(path)
+            if not dead:
+                return
+            archive = MmapStore(os.path.join(self.directory, ARCHIVE_FILE))
+            try:
+                for path in dead:
+                    for key, value in read_store(path).items():
+                        name = json.loads(key)[0]
+                        if self._kind_of(name) != 'gauge':
+                            archive.inc(key, value)
+                    os.remove(path)
+            finally:
+                archive.close()
+        finally:
+            self._unlock_directory(lock_file)
+
+    def _kind_of(self, sample_name):
+        for suffix in ('_bucket', '_sum', '_count'):
+            if sample_name.endswith(suffix) and sample_name[:-len(suffix)] in self._definitions:
+                return self._definitions[sample_name[:-len(suffix)]][0]
+        return self._definitions.get(sample_name, ('counter',))[0]
+
+    def collect(self):
+        """
+        汇总所有进程的指标，返回 {(样本名, 标签元组): 值}
+        """
+        totals = {}
+        lock_file = self._lock_directory(exclusive=False)
+        try:
+            for path in glob.glob(os.path.join(self.directory, '*.mmap')):
+                name = os.path.basename(path)[:-len('.mmap')]
+                # 归档文件中不含仪表盘类指标；已退出进程的仪表盘值不再有意义
+                alive = name.isdigit() and _pid_alive(int(name))
+                for key, value in read_store(path).items():
+                    sample, labels = json.loads(key)
+                    if self._kind_of(sample) == 'gauge' and not alive:
+                        continue
+                    labels = tuple(tuple(pair) for pair in labels)
+                    totals[(sample, labels)] = totals.get((sample, labels), 0.0) + value
+        finally:
+            self._unlock_directory(lock_file)
+        return totals
+
+    def render(self):
+        """
+        生成 Prometheus 文本格式（text/plain; version=0.0.4）
+        """
+        totals = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in self._definitions.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind != 'histogram':
+                for (sample, labels), value in sorted(totals.items()):
+                    if sample == name:
+                        lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            # 直方图：按标签分组，把每个分桶的计数累加成累计值
+            series = {}
+            for (sample, labels), value in totals.items():
+                if sample == f'{name}_bucket':
+                    base = tuple(p for p in labels if p[0] != 'le')
+                    le = dict(labels)['le']
+                    series.setdefault(base, {})[le] = value
+                elif sample in (f'{name}_sum', f'{name}_count'):
+                    series.setdefault(labels, {})
+            for labels in sorted(series):
+                cumulative = 0.0
+                for bound in list(buckets) + [float('inf')]:
+                    cumulative += series[labels].get(_format_value(bound), 0.0)
+                    bucket_labels = labels + (('le', _format_value(bound)),)
+                    lines.append(f'{name}_bucket{_format_labels(bucket_labels)} {_format_value(cumulative)}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(totals.get((f"{name}_sum", labels), 0.0))}')
+                lines.append(f'{name}_count{_format_labels(labels)} {_format_value(totals.get((f"{name}_count", labels), 0.0))}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,199 @@
+# app/utils/pagination.py
+"""
+游标（Keyset）分页工具
+
+传统的 paginate() 使用 OFFSET + COUNT(*)，页数越深越慢；
+游标分页记住上一页最后一行的排序键（例如 (timestamp, id)），
+下一页直接用 WHERE (timestamp, id) < (上一页末尾) 做一次索引范围扫描，
+每一页的代价与页码无关。
+
+游标是一个签名过的不透明字符串，里面带着：
+- v: 排序键的值
+- d: 翻页方向（next / prev）
+- f: 当前生效的过滤条件（search、category_id 等），翻页时自动沿用
+"""
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_, func
+from sqlalchemy.sql import Select
+
+from app.extensions import db
+from app.utils.exception_handler import APIException
+
+
+def _get_serializer():
+    # 使用应用的 SECRET_KEY 签名，防止客户端篡改游标内容
+    return URLSafeSerializer(current_app.config['SECRET_KEY'], salt='keyset-cursor')
+
+
+def _dump_value(value):
+    # datetime 不能直接放进 JSON，打一个类型标记后转成 ISO 字符串
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _load_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values, direction, filters=None):
+    """
+    将排序键、方向和过滤条件编码为不透明的游标字符串
+    """
+    payload = {
+        'v': [_dump_value(v) for v in values],
+        'd': direction,
+        'f': filters or {},
+    }
+    return _get_serializer().dumps(payload)
+
+
+def decode_cursor(token):
+    """
+    解析游标字符串，返回 (values, direction, filters)
+    游标无效或被篡改时抛出 APIException
+    """
+    try:
+        payload = _get_serializer().loads(token)
+        values = [_load_value(v) for v in payload['v']]
+        direction = payload['d']
+        filters = payload.get('f', {})
+    except (BadSignature, KeyError, TypeError, ValueError):
+        raise APIException('分页游标无效或已过期', status_code=400, error_code=1002)
+
+    if direction not in ('next', 'prev'):
+        raise APIException('分页游标无效或已过期', status_code=400, error_code=1002)
+    return values, direction, filters
+
+
+def _keyset_condition(columns, values, descending, direction):
+    """
+    构造 (c1, c2, ...) < (v1, v2, ...) 这样的行比较条件
+    展开为 c1 < v1 OR (c1 = v1 AND c2 < v2) ...，兼容不支持行值比较的数据库
+    """
+    # 降序 + 向后翻，或升序 + 向前翻，都是取"更小"的一侧
+    take_smaller = (descending and direction == 'next') or (not descending and direction == 'prev')
+
+    clauses = []
+    for i, column in enumerate(columns):
+        equals = [columns[j] == values[j] for j in range(i)]
+        compare = column < values[i] if take_smaller else column > values[i]
+        clauses.append(and_(*equals, compare))
+    return or_(*clauses)
+
+
+def fetch_rows(query):
+    """
+    执行查询并返回结果列表；query 可以是 Model.query，也可以是只选取部分列的 select(...) 语句
+    """
+    if isinstance(query, Select):
+        return db.session.execute(query).all()
+    return query.all()
+
+
+def count_statement(query):
+    """
+    select(...) 语句对应的 COUNT(*) 语句（忽略排序；不适用于带 DISTINCT / GROUP BY 的查询）
+    直接替换选取的列而不是包一层子查询：SQLite 会省略不影响行数的外连接，
+    并用最小的覆盖索引计数，不需要读取描述等大字段
+    """
+    return query.with_only_columns(func.count(), maintain_column_froms=True).order_by(None)
+
+
+def count_rows(query):
+    """
+    统计查询结果总数（忽略排序）
+    """
+    if isinstance(query, Select):
+        return db.session.scalar(count_statement(query))
+    return query.order_by(None).count()
+
+
+def offset_paginate(query, page, per_page, count_query=None):
+    """
+    对 select(...) 语句做页码分页（Model.query 直接使用 paginate() 即可）
+    :param count_query: 用于统计总数的查询，默认为 query 本身；
+                        query 带有只为取列而加的外连接时，传入只含过滤条件的查询计数更快
+    :return: (rows, pagination_data)，pagination_data 与 paginate() 返回的字段一致
+    """
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    total = count_rows(query if count_query is None else count_query)
+    rows = fetch_rows(query.limit(per_page).offset((page - 1) * per_page))
+    pages = (total + per_page - 1) // per_page
+    pagination_data = {
+        'total_pages': pages,       # 总页数
+        'current_page': page,       # 当前页码
+        'per_page': per_page,       # 每页数量
+        'total_count': total,       # 总条目数
+        'has_next': page < pages,   # 是否有下一页
+        'has_prev': page > 1,       # 是否有上一页
+    }
+    return rows, pagination_data
+
+
+def keyset_page_query(query, columns, values=None, direction='next', descending=True):
+    """
+    构造一页游标分页的查询（不含 LIMIT）：values 为上一页边界的排序键，为空时表示第一页
+    """
+    if values is not None:
+        query = query.filter(_keyset_condition(columns, values, descending, direction))
+    # 向前翻页时需要反向排序，取到数据后再反转回来
+    order_desc = descending != (direction == 'prev')
+    return query.order_by(*[c.desc() if order_desc else c.asc() for c in columns])
+
+
+def keyset_paginate(query, columns, key_func, per_page, cursor=None, filters=None,
+                    descending=True, with_count=False, count_query=None):
+    """
+    对查询执行游标分页
+
+    :param query: 已经应用过过滤条件、但尚未排序的查询（Model.query 或 select(...) 语句）
+    :param columns: 排序键所在的列，例如 [ExampleItem.timestamp, ExampleItem.id]，最后一列必须唯一
+    :param key_func: 从结果行中取出排序键值的函数，返回与 columns 对应的元组
+    :param per_page: 每页数量
+    :param cursor: 客户端传回的游标字符串，为空时表示第一页
+    :param filters: 需要写入游标中沿用的过滤条件
+    :param descending: 是否按降序排列
+    :param with_count: 是否额外执行 COUNT(*) 统计总数（深分页时建议关闭）
+    :param count_query: 用于统计总数的查询，默认为 query 本身（见 offset_paginate）
+    :return: (rows, pagination_data)
+    """
+    direction, values = 'next', None
+    if cursor:
+        values, direction, _ = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise APIException('分页游标无效或已过期', status_code=400, error_code=1002)
+    page_query = keyset_page_query(query, columns, values, direction, descending)
+    reverse = (direction == 'prev')
+
+    # 多取一行，用来判断后面是否还有数据，避免执行 COUNT
+    rows = fetch_rows(page_query.limit(per_page + 1))
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+
+    if direction == 'next':
+        has_next, has_prev = has_more, bool(cursor)
+    else:
+        has_next, has_prev = True, has_more
+
+    pagination_data = {
+        'mode': 'cursor',
+        'per_page': per_page,
+        'has_next': has_next,
+        'has_prev': has_prev,
+        'next_cursor': encode_cursor(key_func(rows[-1]), 'next', filters) if rows and has_next else None,
+        'prev_cursor': encode_cursor(key_func(rows[0]), 'prev', filters) if rows and has_prev else None,
+    }
+    if with_count:
+        # 只有在客户端明确需要时才统计总数
+        pagination_data['total_count'] = count_rows(query if count_query is None else count_query)
+
+    return rows, pagination_data
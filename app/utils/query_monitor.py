@@ -0,0 +1,152 @@
+# app/utils/query_monitor.py
+"""
+慢查询日志与 N+1 查询检测
+
+1. 慢查询：执行时间超过 SQL_SLOW_QUERY_THRESHOLD 秒的语句，连同参数、所属 endpoint
+   和执行计划（SQLite 为 EXPLAIN QUERY PLAN，其他数据库为 EXPLAIN）写入 <应用名>.sql 日志
+   （日志处理器由 register_logging 配置，同时写入 logs/slow_query.log 和 app.log）
+
+2. N+1 检测：to_dict() 中访问 item.author、item.category 这类懒加载关系时，
+   列表接口会对每一行额外执行一次相同形状的查询。这里把一个请求内执行过的语句
+   按"形状"（去掉参数值、IN 列表长度）计数，同一形状超过 SQL_N_PLUS_ONE_THRESHOLD 次时：
+   - warn（生产默认）：请求结束时记录一条警告
+   - raise（TESTING=True 时默认）：立即抛出 NPlusOneQueryError，让测试直接失败
+   - off：关闭检测
+   带有执行选项 bookkeeping=True 的内部记账语句（例如 table_version 计数器）不参与计数
+"""
+import logging
+import re
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# IN (?, ?, ?) / VALUES (?, ?), (?, ?) 等长度可变的参数列表统一折叠
+_PARAM_LIST_RE = re.compile(r'\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))*\s*\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_WHITESPACE_RE = re.compile(r'\s+')
+# 内部记账语句的执行选项：connection.execute(..., execution_options={BOOKKEEPING_OPTION: True})
+BOOKKEEPING_OPTION = 'bookkeeping'
+
+
+class NPlusOneQueryError(AssertionError):
+    """
+    测试模式下检测到 N+1 查询时抛出
+    """
+
+
+def statement_shape(statement):
+    """
+    把语句归一化为"形状"：合并空白、折叠参数列表、去掉数字字面量
+    """
+    shape = _WHITESPACE_RE.sub(' ', statement).strip()
+    shape = _PARAM_LIST_RE.sub('(?)', shape)
+    return _NUMBER_RE.sub('N', shape)
+
+
+def allow_repeated_queries(func):
+    """
+    视图装饰器：该接口会有意重复执行同一形状的查询（例如分块导出），不做 N+1 检测
+    """
+    func.allow_repeated_queries = True
+    return func
+
+
+class QueryMonitor:
+    """
+    SQL 监控扩展，使用方式与其他扩展一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.slow_threshold = None
+        self.explain = True
+        self.n_plus_one_threshold = 5
+        self.n_plus_one_mode = 'warn'
+        self.logger = logging.getLogger(__name__)
+        self._events_registered = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.slow_threshold = app.config.get('SQL_SLOW_QUERY_THRESHOLD')
+        self.explain = app.config.get('SQL_EXPLAIN_SLOW_QUERIES', True)
+        self.n_plus_one_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.n_plus_one_mode = app.config.get('SQL_N_PLUS_ONE_MODE') or ('raise' if app.testing else 'warn')
+        # app.logger 的子日志器，处理器在 register_logging 中配置
+        self.logger = logging.getLogger(f'{app.logger.name}.sql')
+        app.teardown_request(self._report_n_plus_one)
+        self._register_events()
+        app.extensions['query_monitor'] = self
+
+    def _register_events(self):
+        # 监听 Engine 类，对所有引擎生效；只注册一次
+        if self._events_registered:
+            return
+        self._events_registered = True
+
+        @event.listens_for(Engine, 'before_cursor_execute')
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_monitor_start', []).append(time.perf_counter())
+
+        @event.listens_for(Engine, 'after_cursor_execute')
+        def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            starts = conn.info.get('query_monitor_start')
+            if not starts:
+                return
+            elapsed = time.perf_counter() - starts.pop()
+            if self.slow_threshold is not None and elapsed >= self.slow_threshold:
+                self._log_slow_query(conn, statement, parameters, executemany, elapsed)
+            if (self.n_plus_one_mode != 'off' and has_request_context()
+                    and not context.execution_options.get(BOOKKEEPING_OPTION)):
+                self._count_statement(statement)
+
+    # --- 慢查询 ---
+
+    def _log_slow_query(self, conn, statement, parameters, executemany, elapsed):
+        endpoint = request.endpoint if has_request_context() else None
+        params = repr(parameters)
+        if len(params) > 500:
+            params = params[:500] + '...'
+        message = f'慢查询 {elapsed * 1000:.1f}ms endpoint={endpoint}\n{statement}\n参数: {params}'
+        if self.explain and not executemany and statement.lstrip()[:6].upper() == 'SELECT':
+            plan = self._explain(conn, statement, parameters)
+            if plan:
+                message += f'\n执行计划:\n{plan}'
+        self.logger.warning(message)
+
+    @staticmethod
+    def _explain(conn, statement, parameters):
+        # 直接使用 DBAPI 游标执行，不再次触发引擎事件
+        prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            return '\n'.join('  ' + ' | '.join(str(col) for col in row) for row in cursor.fetchall())
+        except Exception as e:  # 执行计划只用于诊断，失败时不影响请求
+            return f'  (无法获取执行计划: {e})'
+        finally:
+            cursor.close()
+
+    # --- N+1 检测 ---
+
+    def _count_statement(self, statement):
+        view = current_app.view_functions.get(request.endpoint)
+        if getattr(view, 'allow_repeated_queries', False):
+            return
+        counts = g.setdefault('_query_shapes', {})
+        shape = statement_shape(statement)
+        counts[shape] = counts.get(shape, 0) + 1
+        if self.n_plus_one_mode == 'raise' and counts[shape] == self.n_plus_one_threshold + 1:
+            raise NPlusOneQueryError(
+                f'{request.endpoint} 中同一形状的查询执行了超过 {self.n_plus_one_threshold} 次'
+                f'（疑似 N+1，请使用 joinedload/selectinload 预加载）:\n{shape}'
+            )
+
+    def _report_n_plus_one(self, exc):
+        counts = g.pop('_query_shapes', None)
+        if not counts or self.n_plus_one_mode != 'warn':
+            return
+        for shape, count in counts.items():
+            if count > self.n_plus_one_threshold:
+                self.logger.warning(
+                    f'疑似 N+1 查询: endpoint={request.endpoint} 同一形状的查询执行了 {count} 次\n{shape}')
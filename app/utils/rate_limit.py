@@ -0,0 +1,241 @@
+# app/utils/rate_limit.py
+"""
+限流与并发控制（准入控制）
+
+登录、注册要计算密码哈希，上传接口要读写大文件，一个客户端的大量请求就可能占满所有 gunicorn worker。
+这里提供两种限制，由 app/utils/decorators.py 中的 @rate_limit 按路由配置：
+- 令牌桶：按客户端（IP）、用户或整个接口计数，例如 '10/minute' 表示桶容量 10、每 6 秒补充一个令牌；
+  令牌用完时返回 429，Retry-After 为下一个令牌补充所需的秒数
+- 并发上限：同一分组（如 'upload'）同时处理的请求数，已满时立即返回 503（Retry-After 为
+  RATELIMIT_BUSY_RETRY_AFTER），不排队等待，保证其余 worker 仍能处理普通请求
+
+计数需要在所有 worker 进程之间共享，后端：
+    sqlite  本地 SQLite 文件（默认），每次检查是一个很短的 BEGIN IMMEDIATE 事务
+    memory  进程内计数，只适合单进程（开发、测试）
+并发名额记录了持有者的进程号，worker 被杀死来不及释放时，名额会在发现该进程已退出或租期
+（RATELIMIT_CONCURRENCY_LEASE）到期后回收。
+"""
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from app.utils.exception_handler import APIException
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_rate(rate):
+    """
+    解析 '10/minute' 形式的速率
+    :return: (桶容量, 每秒补充的令牌数)
+    """
+    try:
+        count, period = rate.split('/')
+        count = int(count)
+        seconds = PERIODS[period.strip()]
+    except (ValueError, KeyError):
+        raise ValueError(f'无效的限流速率: {rate!r}（格式如 10/minute）')
+    if count <= 0:
+        raise ValueError(f'无效的限流速率: {rate!r}')
+    return count, count / seconds
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MemoryLimiterBackend:
+    """
+    进程内计数，只适合单进程
+    """
+    def __init__(self):
+        self._buckets = {}   # key -> (tokens, updated_at)
+        self._slots = {}     # group -> 正在处理的请求数
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        with self._lock:
+            now = time.time()
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now)
+                return (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1, now)
+            return 0
+
+    def acquire(self, group, limit, lease):
+        with self._lock:
+            if self._slots.get(group, 0) >= limit:
+                return None
+            self._slots[group] = self._slots.get(group, 0) + 1
+            return group
+
+    def release(self, slot):
+        with self._lock:
+            self._slots[slot] -= 1
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._slots.clear()
+
+
+class SQLiteLimiterBackend:
+    """
+    基于本地 SQLite 文件的共享计数，所有 worker 进程看到同一组令牌桶和并发名额
+    """
+    SCHEMA = [
+        # full_at：令牌桶补满的时间，之后这一行与不存在没有区别，可以清理
+        'CREATE TABLE IF NOT EXISTS rate_bucket ('
+        ' key TEXT PRIMARY KEY, tokens REAL, updated_at REAL, full_at REAL)',
+        'CREATE INDEX IF NOT EXISTS ix_rate_bucket_full_at ON rate_bucket (full_at)',
+        'CREATE TABLE IF NOT EXISTS rate_slot ('
+        ' id INTEGER PRIMARY KEY AUTOINCREMENT, grp TEXT, pid INTEGER, expires_at REAL)',
+        'CREATE INDEX IF NOT EXISTS ix_rate_slot_grp ON rate_slot (grp)',
+    ]
+    # 清理已补满的令牌桶的间隔（秒）
+    PURGE_INTERVAL = 60
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._purged_at = 0
+
+    def _connect(self):
+        # 每个进程、每个线程使用自己的连接（gunicorn fork 之后不能复用父进程的连接）
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for ddl in self.SCHEMA:
+                conn.execute(ddl)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def take(self, key, capacity, rate):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            row = conn.execute('SELECT tokens, updated_at FROM rate_bucket WHERE key = ?', (key,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            if tokens < 1:
+                return (1 - tokens) / rate
+            tokens -= 1
+            conn.execute(
+                'INSERT OR REPLACE INTO rate_bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)',
+                (key, tokens, now, now + (capacity - tokens) / rate)
+            )
+            if now - self._purged_at > self.PURGE_INTERVAL:
+                self._purged_at = now
+                conn.execute('DELETE FROM rate_bucket WHERE full_at < ?', (now,))
+        return 0
+
+    def acquire(self, group, limit, lease):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            conn.execute('DELETE FROM rate_slot WHERE grp = ? AND expires_at < ?', (group, now))
+            count = conn.execute('SELECT COUNT(*) FROM rate_slot WHERE grp = ?', (group,)).fetchone()[0]
+            if count >= limit:
+                # 回收已退出的 worker 没来得及释放的名额
+                pids = [r[0] for r in conn.execute('SELECT DISTINCT pid FROM rate_slot WHERE grp = ?', (group,))]
+                dead = [(group, pid) for pid in pids if not _pid_alive(pid)]
+                if not dead:
+                    return None
+                conn.executemany('DELETE FROM rate_slot WHERE grp = ? AND pid = ?', dead)
+                count = conn.execute('SELECT COUNT(*) FROM rate_slot WHERE grp = ?', (group,)).fetchone()[0]
+                if count >= limit:
+                    return None
+            cursor = conn.execute('INSERT INTO rate_slot (grp, pid, expires_at) VALUES (?, ?, ?)',
+                                  (group, os.getpid(), now + lease))
+            return cursor.lastrowid
+
+    def release(self, slot):
+        self._connect().execute('DELETE FROM rate_slot WHERE id = ?', (slot,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM rate_bucket')
+            conn.execute('DELETE FROM rate_slot')
+
+
+class RateLimiter:
+    """
+    限流扩展，使用方式与 cache、metrics 一致：先实例化，再在工厂函数中 init_app
+    """
+    def __init__(self, app=None):
+        self.enabled = False
+        self.backend = MemoryLimiterBackend()
+        self.lease = 300
+        self.busy_retry_after = 1
+        self.metrics = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATELIMIT_ENABLED', True)
+        self.lease = app.config.get('RATELIMIT_CONCURRENCY_LEASE', 300)
+        self.busy_retry_after = app.config.get('RATELIMIT_BUSY_RETRY_AFTER', 1)
+
+        backend = app.config.get('RATELIMIT_BACKEND', 'sqlite')
+        if backend == 'sqlite':
+            self.backend = SQLiteLimiterBackend(app.config['RATELIMIT_SQLITE_PATH'])
+        elif backend == 'memory':
+            self.backend = MemoryLimiterBackend()
+        else:
+            raise ValueError(f'未知的限流后端: {backend}')
+
+        # 被拒绝的请求数计入 /metrics（需在 metrics.init_app 之后调用）
+        metrics = app.extensions.get('metrics')
+        if metrics is not None and metrics.enabled:
+            metrics.define('rate_limit_rejections_total', 'counter', '按分组和原因统计的限流拒绝次数')
+            self.metrics = metrics
+        app.extensions['rate_limiter'] = self
+
+    def hit(self, group, rate, identity):
+        """
+        从 group + identity 对应的令牌桶中取一个令牌，取不到时抛出 429
+        """
+        capacity, per_second = parse_rate(rate)
+        retry_after = self.backend.take(f'{group}|{rate}|{identity}', capacity, per_second)
+        if retry_after:
+            self._rejected(group, 'rate')
+            raise APIException("请求过于频繁，请稍后重试", status_code=429, error_code=5004,
+                               headers={'Retry-After': str(max(1, math.ceil(retry_after)))})
+
+    @contextmanager
+    def concurrency(self, group, limit):
+        """
+        占用 group 的一个并发名额，退出时释放；名额已满时抛出 503
+        """
+        slot = self.backend.acquire(group, limit, self.lease)
+        if slot is None:
+            self._rejected(group, 'concurrency')
+            raise APIException("服务繁忙，请稍后重试", status_code=503, error_code=5003,
+                               headers={'Retry-After': str(self.busy_retry_after)})
+        try:
+            yield
+        finally:
+            self.backend.release(slot)
+
+    def _rejected(self, group, reason):
+        if self.metrics is not None:
+            self.metrics.inc('rate_limit_rejections_total', {'group': group, 'reason': reason})
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,218 @@
+# app/utils/replicas.py
+"""
+读写分离：只读接口的查询发往只读副本
+
+配置方式与 SQLALCHEMY_BINDS 一致：副本作为额外的 bind 注册（flask_sqlalchemy 为每个 bind 创建引擎，
+并同样应用连接池参数和 SQLite PRAGMA），DATABASE_REPLICAS 列出其中哪些 bind 是主库的只读副本。
+
+路由规则（RoutingSession.get_bind）：
+- 只有标记了 @read_only 的请求中的 SELECT 才会发往副本；INSERT / UPDATE / DELETE、flush、
+  原生 SQL 以及其他请求中的所有语句都使用主库
+- 读己之写：请求中执行过写语句后，在签名 session 中记录时间，该客户端在 DATABASE_REPLICA_STICKY_SECONDS
+  秒内的只读请求仍然读主库，不会因为副本延迟而看不到自己刚写入的数据
+- 延迟检测：每个进程每隔 DATABASE_REPLICA_CHECK_INTERVAL 秒比较一次主库与副本 table_version 表中的
+  变更计数（见 app/utils/table_versions.py）。副本落后且最近一次已同步的写入早于
+  DATABASE_REPLICA_MAX_LAG 秒时视为延迟过大，暂不使用
+- 故障回退：副本连接失败或查询出错时，在 DATABASE_REPLICA_RETRY_INTERVAL 秒内不再使用该副本，
+  @read_only 会回滚会话并在主库上重新执行一次视图（只读视图重试没有副作用）
+
+副本落后于主库时读到的响应不写入响应缓存，避免旧数据在缓存中保留到 TTL 过期。
+
+本地测试可以用 flask replica sync 把主库（SQLite）复制到副本文件，--interval 持续同步以模拟复制延迟。
+"""
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.dml import UpdateBase
+
+# 签名 session 中记录最近一次写入时间的键
+WRITE_AT_KEY = '_db_write_at'
+
+
+class RoutingSession(Session):
+    """
+    按 ReplicaRouter 的规则为 SELECT 选择副本引擎，其余情况与 flask_sqlalchemy 的默认行为一致
+    """
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and isinstance(clause, Select) and has_app_context():
+            router = current_app.extensions.get('replicas')
+            if router is not None:
+                engine = router.read_engine()
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """
+    读写分离扩展：先实例化，再在工厂函数中 init_app(app, db)（需在 table_versions 之后）
+    """
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.replicas = []
+        self.max_lag = 5
+        self.sticky_seconds = 5
+        self.check_interval = 1
+        self.retry_interval = 30
+        self._states = {}   # 副本名 -> {'checked_at', 'usable', 'behind', 'down_until'}
+        self._lock = threading.Lock()
+        self._events_registered = False
+        if app is not None:
+            self.init_app(app, db)
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.replicas = list(app.config.get('DATABASE_REPLICAS') or [])
+        binds = app.config.get('SQLALCHEMY_BINDS') or {}
+        missing = [name for name in self.replicas if name not in binds]
+        if missing:
+            raise ValueError(f"DATABASE_REPLICAS 中的 {', '.join(missing)} 没有在 SQLALCHEMY_BINDS 中配置")
+        self.max_lag = app.config.get('DATABASE_REPLICA_MAX_LAG', 5)
+        self.sticky_seconds = app.config.get('DATABASE_REPLICA_STICKY_SECONDS', self.max_lag)
+        self.check_interval = app.config.get('DATABASE_REPLICA_CHECK_INTERVAL', 1)
+        self.retry_interval = app.config.get('DATABASE_REPLICA_RETRY_INTERVAL', 30)
+        self._states = {}
+        app.extensions['replicas'] = self
+        if self.enabled:
+            self._register_events()
+            app.after_request(self._remember_write)
+
+    def _register_events(self):
+        # 监听 Engine 类，对所有引擎生效；只注册一次
+        if self._events_registered:
+            return
+        self._events_registered = True
+
+        @event.listens_for(Engine, 'after_execute')
+        def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+            if isinstance(clauseelement, UpdateBase) and has_request_context():
+                g._db_wrote = True
+
+    def _remember_write(self, response):
+        if g.get('_db_wrote'):
+            session[WRITE_AT_KEY] = time.time()
+        return response
+
+    # --- 路由 ---
+
+    def read_engine(self):
+        """
+        当前请求的 SELECT 应使用的副本引擎；应使用主库时返回 None
+        同一请求中只选择一次，之后的查询都发往同一个副本
+        """
+        if not self.enabled or not has_request_context() or not g.get('_db_read_only'):
+            return None
+        if '_db_replica' not in g:
+            g._db_replica = self._choose()
+        if g._db_replica is None:
+            return None
+        return self.db.engines[g._db_replica]
+
+    def _choose(self):
+        write_at = session.get(WRITE_AT_KEY)
+        if write_at and time.time() - write_at < self.sticky_seconds:
+            return None
+        candidates = [name for name in self.replicas if self._usable(name)]
+        if not candidates:
+            return None
+        name = random.choice(candidates)
+        if self._states[name]['behind']:
+            g._db_replica_behind = True
+        return name
+
+    def _usable(self, name):
+        now = time.time()
+        with self._lock:
+            state = self._states.get(name)
+            if state is not None:
+                if now < state['down_until']:
+                    return False
+                if now - state['checked_at'] < self.check_interval:
+                    return state['usable']
+        try:
+            behind, lag = self.replica_lag(name)
+        except DBAPIError as e:
+            self.mark_down(name, e)
+            return False
+        usable = lag <= self.max_lag
+        if not usable:
+            current_app.logger.warning(f'只读副本 {name} 延迟 {lag:.1f} 秒，暂时改读主库')
+        with self._lock:
+            self._states[name] = {'checked_at': now, 'usable': usable, 'behind': behind, 'down_until': 0}
+        return usable
+
+    def replica_lag(self, name):
+        """
+        比较主库与副本的表级变更计数
+        :return: (副本是否落后, 估计的延迟秒数)；计数一致时延迟为 0，
+                 否则为副本上最近一次写入距今的时间（偏保守，安静一段时间后的第一次写入会短暂视为延迟）
+        """
+        table = current_app.extensions['table_versions'].table
+        statement = select(func.coalesce(func.sum(table.c.version), 0), func.max(table.c.updated_at))
+        with self.db.engines[None].connect() as connection:
+            primary_total, _ = connection.execute(statement).one()
+        with self.db.engines[name].connect() as connection:
+            replica_total, replica_updated_at = connection.execute(statement).one()
+        if replica_total >= primary_total:
+            return False, 0.0
+        if replica_updated_at is None:
+            return True, float('inf')
+        return True, (datetime.now() - replica_updated_at).total_seconds()
+
+    def mark_down(self, name, error):
+        current_app.logger.warning(f'只读副本 {name} 不可用，{self.retry_interval} 秒内改读主库: {error}')
+        with self._lock:
+            self._states[name] = {'checked_at': time.time(), 'usable': False, 'behind': True,
+                                  'down_until': time.time() + self.retry_interval}
+
+    def run_read_only(self, func, args, kwargs):
+        """
+        以只读方式执行视图：SELECT 发往副本；副本出错时回滚并在主库上重试一次
+        """
+        if not self.enabled:
+            return func(*args, **kwargs)
+        g._db_read_only = True
+        try:
+            return func(*args, **kwargs)
+        except DBAPIError as e:
+            replica = g.get('_db_replica')
+            if replica is None:
+                raise
+            self.mark_down(replica, e)
+            self.db.session.rollback()
+            g._db_replica = None
+            g.pop('_db_replica_behind', None)
+            return func(*args, **kwargs)
+
+    def cacheable(self):
+        """
+        当前请求的响应能否写入响应缓存：读自落后于主库的副本时不缓存
+        """
+        return not (has_request_context() and g.get('_db_replica_behind'))
+
+
+def copy_sqlite_database(source_path, target_path):
+    """
+    用 SQLite 在线备份接口把主库完整复制到副本文件（本地测试读写分离用）
+    复制过程中主库可以正常读写；副本上已打开的连接在复制完成后即可读到新数据
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
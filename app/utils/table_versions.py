@@ -0,0 +1,174 @@
+# app/utils/table_versions.py
+"""
+表级变更计数器与 HTTP 条件请求（ETag / Last-Modified）
+
+前端每隔几秒轮询 /item/list、/category/list，数据大多没有变化，却每次都要执行列表查询、
+序列化并传输完整的 JSON。这里为每张表维护一个变更计数器（table_version 表）：
+- 任何 INSERT / UPDATE / DELETE（ORM flush、批量语句、adjust_item_counts 等 Core 语句）
+  执行后，在同一个事务中把对应表的 version 加一、updated_at 设为当前时间，随业务数据一起提交或回滚
+  （每个事务中每张表只加一次，批量写入不会为每条语句都更新一次计数器）
+- 视图加上 @table_versions.conditional([...表名]) 后，先用一次主键查询读出相关表的版本号，
+  生成弱 ETag 和 Last-Modified；请求带有匹配的 If-None-Match（或 If-Modified-Since）时
+  直接返回 304，不执行视图中的查询和序列化
+
+版本号在执行视图之前读取：视图执行期间如果有写入提交，响应内容可能比 ETag 新，
+客户端下次请求时版本号已变化，会重新拿到完整响应，不会因此读到旧数据。
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, request
+from sqlalchemy import Column, DateTime, Integer, String, Table, event, select, update, insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.utils.query_monitor import BOOKKEEPING_OPTION
+
+TABLE_NAME = 'table_version'
+# connection.info 中记录 (当前事务, 已加过版本号的表)
+BUMPED_KEY = 'table_versions_bumped'
+# 连接或语句带有该执行选项时不记录变更（例如 Alembic 迁移：table_version 表可能尚未创建）
+SKIP_OPTION = 'skip_table_versions'
+
+
+class TableVersions:
+    """
+    表版本扩展，使用方式与其他扩展一致：先实例化，再在工厂函数中 init_app(app, db)
+    """
+    def __init__(self, app=None, db=None):
+        self.db = None
+        self.table = None
+        self.enabled = True
+        self._events_registered = False
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.db = db
+        self.enabled = app.config.get('CONDITIONAL_GET_ENABLED', True)
+        # 注册到 db.metadata，db.create_all 和 flask db migrate 会一并创建这张表
+        self.table = db.metadata.tables.get(TABLE_NAME)
+        if self.table is None:
+            self.table = Table(
+                TABLE_NAME, db.metadata,
+                Column('name', String(64), primary_key=True),   # 表名
+                Column('version', Integer, nullable=False, default=0, server_default='0'),
+                Column('updated_at', DateTime, nullable=False, default=datetime.now),
+            )
+        self._register_events()
+        app.extensions['table_versions'] = self
+
+    def _register_events(self):
+        # 监听 Engine 类，对所有引擎生效；只注册一次
+        if self._events_registered:
+            return
+        self._events_registered = True
+
+        @event.listens_for(Engine, 'after_execute')
+        def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+            if not isinstance(clauseelement, UpdateBase):
+                return
+            if execution_options.get(SKIP_OPTION) or conn.get_execution_options().get(SKIP_OPTION):
+                return
+            name = getattr(clauseelement.table, 'name', None)
+            # 没有影响任何行的 UPDATE / DELETE 不算变更（INSERT ... RETURNING 等情况 rowcount 为 -1）
+            if name is None or name == TABLE_NAME or result.rowcount == 0:
+                return
+            # 同一事务中每张表只加一次：版本号随事务一起提交，读者看到的是同一次变更
+            transaction = conn.get_transaction()
+            state = conn.info.get(BUMPED_KEY)
+            if state is None or state[0] is not transaction:
+                state = (transaction, set())
+                conn.info[BUMPED_KEY] = state
+            if name in state[1]:
+                return
+            self.bump(conn, name)
+            state[1].add(name)
+
+        @event.listens_for(Engine, 'rollback_savepoint')
+        def _rollback_savepoint(conn, name, context):
+            # 保存点回滚可能撤销了其中的版本号变更，之后的写入需要重新加一
+            conn.info.pop(BUMPED_KEY, None)
+
+    def bump(self, connection, name):
+        """
+        在 connection 当前的事务中把表 name 的版本号加一
+        """
+        now = datetime.now()
+        # 内部记账语句，不计入 N+1 检测（见 app/utils/query_monitor.py）
+        options = {BOOKKEEPING_OPTION: True}
+        updated = connection.execute(
+            update(self.table).where(self.table.c.name == name)
+            .values(version=self.table.c.version + 1, updated_at=now),
+            execution_options=options
+        )
+        if updated.rowcount == 0:
+            # 该表第一次写入
+            connection.execute(insert(self.table).values(name=name, version=1, updated_at=now),
+                               execution_options=options)
+
+    def versions(self, names):
+        """
+        读取若干张表的版本，返回 {表名: (version, updated_at)}；从未写入过的表为 (0, None)
+        """
+        rows = self.db.session.execute(
+            select(self.table.c.name, self.table.c.version, self.table.c.updated_at)
+            .where(self.table.c.name.in_(names))
+        ).all()
+        found = {row.name: (row.version, row.updated_at) for row in rows}
+        return {name: found.get(name, (0, None)) for name in names}
+
+    def validators(self, names):
+        """
+        由表版本生成 (etag, last_modified)
+        ETag 同时包含请求路径和查询参数，不同参数的列表互不影响
+        """
+        versions = self.versions(names)
+        source = request.full_path + '|' + ','.join(f'{name}={versions[name][0]}' for name in sorted(versions))
+        etag = hashlib.sha1(source.encode()).hexdigest()[:20]
+        times = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+        return etag, max(times) if times else None
+
+    def conditional(self, tables):
+        """
+        视图装饰器：为 GET 响应加上 ETag / Last-Modified，并对条件请求返回 304
+        放在 @cache.cached 之前（外层），304 时连缓存也不需要查询
+        :param tables: 响应内容依赖的表名列表
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled or request.method not in ('GET', 'HEAD'):
+                    return func(*args, **kwargs)
+
+                etag, last_modified = self.validators(tables)
+                # 供内层的 @cache.cached 放进缓存键，保证响应体与 ETag 对应同一组表版本
+                g._table_versions_etag = etag
+                if self._not_modified(etag, last_modified):
+                    response = current_app.response_class(status=304)
+                else:
+                    response = current_app.make_response(func(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                # 弱 ETag：内容等价即可，不保证逐字节一致（例如 gzip 压缩后仍然有效）
+                response.set_etag(etag, weak=True)
+                if last_modified is not None:
+                    # updated_at 为本地时间，HTTP 日期使用 UTC
+                    response.last_modified = last_modified.astimezone(timezone.utc)
+                # 允许浏览器保存，但每次使用前都要带上验证器重新确认
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
+
+    @staticmethod
+    def _not_modified(etag, last_modified):
+        # 按 RFC 9110：带有 If-None-Match 时忽略 If-Modified-Since
+        if request.if_none_match:
+            return request.if_none_match.contains_weak(etag)
+        if request.if_modified_since and last_modified is not None:
+            # HTTP 日期只精确到秒，先去掉微秒，否则客户端原样带回的 Last-Modified 永远不会匹配
+            # （同一秒内的后续写入由 If-None-Match 区分）
+            return last_modified.replace(microsecond=0).astimezone(timezone.utc) <= request.if_modified_since
+        return False
@@ -0,0 +1,13 @@
+from app import create_app
+from app.utils.asgi import WSGIThreadPoolAdapter
+
+# ASGI 入口（与 run.py 并列），例如：
+#   uvicorn asgi:app --workers 4 --host 0.0.0.0 --port 5000
+# 请求体由事件循环异步接收，收齐后才在线程池中执行 Flask 应用，慢速上传不会占满 worker
+flask_app = create_app()
+app = WSGIThreadPoolAdapter(
+    flask_app.wsgi_app,
+    threads=flask_app.config['ASGI_THREADS'],
+    spool_size=flask_app.config['ASGI_SPOOL_SIZE'],
+    max_body_size=flask_app.config['MAX_CONTENT_LENGTH'],
+)
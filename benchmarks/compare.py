@@ -0,0 +1,83 @@
+# benchmarks/compare.py
+"""
+对比两次基准测试结果（benchmarks/run_suite.py 保存的 JSON）
+
+对每个场景比较延迟分位数、吞吐量和峰值内存，变差超过阈值（默认 10%）的指标标记为退化，
+存在退化时以退出码 1 结束，可直接用于 CI。
+
+用法（在项目根目录执行）：
+    python benchmarks/compare.py <基线.json> <本次结果.json> [--threshold 0.1]
+"""
+import argparse
+import json
+import sys
+
+# 指标名 -> 数值越大越好（True）还是越小越好（False）
+METRICS = {
+    'p50_ms': False,
+    'p95_ms': False,
+    'p99_ms': False,
+    'throughput_rps': True,
+    'peak_rss_mb': False,
+}
+
+
+def load_result(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    :return: (rows, regressions)，rows 为 (场景, 指标, 基线值, 本次值, 变化比例, 是否退化)
+    """
+    rows, regressions = [], []
+    for name, stats in current['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            old, new = base.get(metric), stats.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = (-change if higher_is_better else change) > threshold
+            row = (name, metric, old, new, change, regressed)
+            rows.append(row)
+            if regressed:
+                regressions.append(row)
+    return rows, regressions
+
+
+def print_comparison(rows, threshold):
+    print(f"{'场景':<20}{'指标':<16}{'基线':>12}{'本次':>12}{'变化':>10}")
+    for name, metric, old, new, change, regressed in rows:
+        mark = '  <- 退化' if regressed else ''
+        print(f'{name:<20}{metric:<16}{old:>12.2f}{new:>12.2f}{change:>+10.1%}{mark}')
+    regressions = sum(1 for row in rows if row[-1])
+    print(f'\n共 {regressions} 项指标退化超过 {threshold:.0%}' if regressions else f'\n没有退化超过 {threshold:.0%} 的指标')
+
+
+def warn_mismatch(baseline, current):
+    # 数据集、驱动或请求数不同时，结果不具有可比性
+    for key in ('driver', 'dataset', 'processes', 'requests', 'cache_backend'):
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"注意：两次运行的 {key} 不同（{baseline['meta'].get(key)} / {current['meta'].get(key)}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.1, help='变差超过该比例视为退化')
+    args = parser.parse_args()
+
+    baseline, current = load_result(args.baseline), load_result(args.current)
+    warn_mismatch(baseline, current)
+    rows, regressions = compare(baseline, current, args.threshold)
+    print_comparison(rows, args.threshold)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+# benchmarks/datagen.py
+"""
+基准测试数据生成器：按固定随机种子生成用户、分类和项目，同一组参数每次生成的数据完全相同
+
+规模（--scale）指项目数量，用户数和分类数按比例生成：
+    10k / 100k / 1m，也可以直接写数字（例如 --scale 25000）
+
+描述长度分布（--text-size），单位为字符：
+    fixed:N            固定 N 个字符
+    uniform:A:B        在 [A, B] 内均匀分布
+    lognormal:MU:SIGMA 对数正态分布（ln(长度) ~ N(MU, SIGMA)），默认 lognormal:5.5:1.0，中位数约 245
+    任一分布都可以再加 :null=P，表示有比例 P 的项目没有描述，例如 uniform:50:500:null=0.1
+
+生成的数据库与应用使用同一份表结构（db.create_all，包含 FTS5 全文索引），
+所有用户的密码都是 PASSWORD（哈希方式与 Config.PASSWORD_HASH_METHOD 一致，登录接口的开销与生产相同）。
+
+用法（在项目根目录执行）：
+    python benchmarks/datagen.py --scale 100k [--seed 42] [--text-size lognormal:5.5:1.0] [--output 路径]
+默认输出到 benchmarks/data/bench-<规模>-<种子>-<分布>.sqlite，文件已存在时直接复用（--force 重新生成）。
+"""
+import argparse
+import itertools
+import math
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert, text, update  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.modules.auth.models import UserModel  # noqa: E402
+from app.modules.example.models import ExampleCategory, ExampleItem  # noqa: E402
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+DEFAULT_TEXT_SIZE = 'lognormal:5.5:1.0'
+MAX_DESCRIPTION_LENGTH = 20_000
+
+PASSWORD = 'benchmark-password'
+USERNAME_FORMAT = 'bench_user_{}'
+ITEMS_PER_USER = 100
+CATEGORY_COUNT = 50
+# 数据的时间范围从这里开始，每个项目间隔约 1 分钟
+BASE_TIME = datetime(2024, 1, 1)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# 中英文混合的词表，搜索场景从中选取关键词
+WORDS = (
+    'apple banana cherry delta echo falcon garden harbor island jungle kernel lemon matrix '
+    'nebula orbit pixel quantum river signal timber urban vector willow xenon yellow zephyr '
+    '数据 系统 服务 用户 分类 项目 缓存 索引 查询 文件 上传 下载 性能 测试 日志 网络'
+).split()
+SEARCH_WORDS = ('apple', 'matrix', 'orbit', 'vector', '数据', '缓存')
+
+
+def parse_scale(value):
+    """
+    10k / 100k / 1m 或纯数字 -> 项目数量
+    """
+    value = str(value).lower().replace('_', '')
+    if value in SCALES:
+        return SCALES[value]
+    if value.isdigit() and int(value) > 0:
+        return int(value)
+    raise ValueError(f'无法识别的规模: {value}（可选 {", ".join(SCALES)} 或正整数）')
+
+
+class TextSizeDistribution:
+    """
+    描述长度分布，见模块说明中的 --text-size 格式
+    """
+    def __init__(self, spec=DEFAULT_TEXT_SIZE):
+        self.spec = spec
+        parts = spec.split(':')
+        self.null_ratio = 0.0
+        if parts[-1].startswith('null='):
+            self.null_ratio = float(parts.pop()[5:])
+        self.kind, args = parts[0], [float(p) for p in parts[1:]]
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if self.kind not in expected or len(args) != expected[self.kind]:
+            raise ValueError(f'无法识别的长度分布: {spec}')
+        self.args = args
+
+    def sample(self, rng):
+        """
+        返回一个描述长度；返回 None 表示该项目没有描述
+        """
+        if self.null_ratio and rng.random() < self.null_ratio:
+            return None
+        if self.kind == 'fixed':
+            length = self.args[0]
+        elif self.kind == 'uniform':
+            length = rng.uniform(*self.args)
+        else:
+            length = rng.lognormvariate(*self.args)
+        return max(0, min(int(length), MAX_DESCRIPTION_LENGTH))
+
+
+def make_text(rng, length):
+    """
+    由词表拼出恰好 length 个字符的文本
+    """
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)[:length]
+
+
+def default_output(scale, seed, text_size):
+    slug = re.sub(r'[^0-9a-zA-Z.=]+', '_', text_size)
+    return os.path.join(DATA_DIR, f'bench-{scale}-{seed}-{slug}.sqlite')
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate(items, seed=42, text_size=DEFAULT_TEXT_SIZE, batch_size=5000, progress=print):
+    """
+    在当前应用上下文的数据库中创建表并写入数据
+    :param items: 项目数量
+    :return: {'users': ..., 'categories': ..., 'items': ...}
+    """
+    rng = random.Random(seed)
+    distribution = TextSizeDistribution(text_size)
+    user_count = max(1, math.ceil(items / ITEMS_PER_USER))
+
+    db.create_all()
+    start = time.perf_counter()
+
+    # 所有用户共用同一个密码哈希，避免生成数据时在哈希上花费大量时间
+    password = generate_password_hash(PASSWORD, method=Config.PASSWORD_HASH_METHOD)
+    for chunk in _chunks(({'username': USERNAME_FORMAT.format(i), 'password': password}
+                          for i in range(1, user_count + 1)), batch_size):
+        db.session.execute(insert(UserModel), chunk)
+    db.session.execute(insert(ExampleCategory), [
+        {'id': i, 'name': f'category {i:02d}'} for i in range(1, CATEGORY_COUNT + 1)])
+    db.session.commit()
+
+    category_ids = range(1, CATEGORY_COUNT + 1)
+    category_weights = list(itertools.accumulate(1 / k for k in category_ids))
+
+    def item_rows():
+        for i in range(items):
+            length = distribution.sample(rng)
+            yield {
+                'name': f'{rng.choice(WORDS)} {rng.choice(WORDS)} {i}',
+                'description': None if length is None else make_text(rng, length),
+                # 分类按 Zipf 分布（少数分类拥有大部分项目），更接近真实数据
+                'category_id': rng.choices(category_ids, cum_weights=category_weights)[0],
+                'user_id': rng.randint(1, user_count),
+                'timestamp': BASE_TIME + timedelta(minutes=i, seconds=rng.randint(0, 59)),
+            }
+
+    counts = Counter()
+    written = 0
+    for chunk in _chunks(item_rows(), batch_size):
+        for row in chunk:
+            row['updated_at'] = row['timestamp']
+        db.session.execute(insert(ExampleItem), chunk, execution_options={'render_nulls': True})
+        counts.update(row['category_id'] for row in chunk)
+        db.session.commit()
+        written += len(chunk)
+        if progress:
+            elapsed = time.perf_counter() - start
+            progress(f'\r已生成 {written}/{items} 个项目（{written / elapsed:.0f} 行/秒）', end='')
+    if progress:
+        progress()
+
+    db.session.execute(update(ExampleCategory), [
+        {'id': category_id, 'item_count': count} for category_id, count in counts.items()])
+    db.session.commit()
+    return {'users': user_count, 'categories': CATEGORY_COUNT, 'items': items}
+
+
+def build_dataset(path, items, seed=42, text_size=DEFAULT_TEXT_SIZE, force=False, progress=print):
+    """
+    生成（或复用已有的）SQLite 基准数据库文件
+    :return: 数据库文件路径
+    """
+    if os.path.exists(path) and not force:
+        return path
+    if os.path.exists(path):
+        os.remove(path)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    # 先写入临时文件，生成完整后才改名，中断时不会留下不完整的数据集被下次复用
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    class DatagenConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.abspath(partial)
+        CACHE_BACKEND = 'null'
+        METRICS_ENABLED = False
+        SQL_SLOW_QUERY_THRESHOLD = None
+
+    app = create_app(DatagenConfig)
+    with app.app_context():
+        generate(items, seed, text_size, progress=progress)
+        # WAL 中的数据全部写回主文件后再改名
+        db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.session.remove()
+        db.engine.dispose()
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(partial + suffix):
+            os.remove(partial + suffix)
+    os.replace(partial, path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', default='10k', help='项目数量：10k / 100k / 1m 或正整数')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--text-size', default=DEFAULT_TEXT_SIZE, help='描述长度分布')
+    parser.add_argument('--output', help='输出的 SQLite 文件路径')
+    parser.add_argument('--force', action='store_true', help='文件已存在时重新生成')
+    args = parser.parse_args()
+
+    items = parse_scale(args.scale)
+    TextSizeDistribution(args.text_size)  # 提前校验格式
+    path = args.output or default_output(args.scale, args.seed, args.text_size)
+    if os.path.exists(path) and not args.force:
+        print(f'数据集已存在，直接复用: {path}')
+        return
+    start = time.perf_counter()
+    build_dataset(path, items, args.seed, args.text_size, force=args.force)
+    print(f'已生成 {path}（{time.perf_counter() - start:.1f} 秒）')
+
+
+if __name__ == '__main__':
+    main()
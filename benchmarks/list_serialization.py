@@ -0,0 +1,116 @@
+# benchmarks/list_serialization.py
+"""
+项目列表序列化基准：ORM 对象 + to_dict() 与投影查询 + 行元组的对比
+
+- orm:        ExampleItem.query + joinedload(author, category)，逐个调用 to_dict()
+                （原来 list_items 的实现，会加载完整描述和用户的密码哈希）
+- projection: select_item_rows() 只选取需要的列，由行元组直接构建字典（现在的实现）
+- projection_200: 同上，并在数据库中把描述截断为 200 个字符（?description_length=200）
+
+每种方式在 per_page=100 和 1000 下各运行若干次，统计延迟中位数和 tracemalloc 峰值内存。
+
+用法（在项目根目录执行）：
+    python benchmarks/list_serialization.py [--items 5000] [--description-size 4000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.orm import joinedload  # noqa: E402
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from app.extensions import db  # noqa: E402
+from app.modules.auth.models import UserModel  # noqa: E402
+from app.modules.example.models import ExampleCategory, ExampleItem  # noqa: E402
+from app.modules.example.queries import select_item_rows, item_row_to_dict  # noqa: E402
+
+
+def build_app(tmp_dir):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_dir, 'bench.sqlite')
+        UPLOAD_FOLDER = tmp_dir
+        METRICS_DIR = os.path.join(tmp_dir, 'metrics')
+        CACHE_BACKEND = 'null'
+        SQL_SLOW_QUERY_THRESHOLD = None
+    return create_app(BenchConfig)
+
+
+def seed(items, description_size):
+    db.create_all()
+    db.session.execute(insert(UserModel), [
+        {'username': f'user{i}', 'password': 'x' * 160} for i in range(50)])
+    db.session.execute(insert(ExampleCategory), [{'name': f'category{i}'} for i in range(20)])
+    db.session.execute(insert(ExampleItem), [{
+        'name': f'item {i}',
+        'description': ('描述' * description_size)[:description_size],
+        'category_id': i % 20 + 1,
+        'user_id': i % 50 + 1,
+    } for i in range(items)])
+    db.session.commit()
+
+
+def list_orm(per_page):
+    items = (ExampleItem.query
+             .options(joinedload(ExampleItem.author), joinedload(ExampleItem.category))
+             .order_by(ExampleItem.timestamp.desc())
+             .limit(per_page).all())
+    result = [item.to_dict() for item in items]
+    db.session.remove()
+    return result
+
+
+def list_projection(per_page, description_length=None):
+    rows = db.session.execute(
+        select_item_rows(description_length).order_by(ExampleItem.timestamp.desc()).limit(per_page)
+    ).all()
+    result = [item_row_to_dict(row) for row in rows]
+    db.session.remove()
+    return result
+
+
+def measure(func, repeat):
+    func()  # 预热
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings) * 1000, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=5000)
+    parser.add_argument('--description-size', type=int, default=4000, help='每个描述的字符数')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    app = build_app(tempfile.mkdtemp())
+    with app.app_context():
+        seed(args.items, args.description_size)
+        print(f'{args.items} 个项目，描述 {args.description_size} 字符，每项运行 {args.repeat} 次')
+        print(f"{'方式':<16}{'per_page':>9}{'延迟中位数(ms)':>16}{'峰值内存(MB)':>14}")
+        for per_page in (100, 1000):
+            for name, func in (
+                ('orm', lambda: list_orm(per_page)),
+                ('projection', lambda: list_projection(per_page)),
+                ('projection_200', lambda: list_projection(per_page, 200)),
+            ):
+                latency, peak = measure(func, args.repeat)
+                print(f'{name:<16}{per_page:>9}{latency:>16.2f}{peak:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
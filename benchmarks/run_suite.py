@@ -0,0 +1,483 @@
+# benchmarks/run_suite.py
+"""
+接口基准测试套件：在确定性的合成数据上压测关键接口，输出 p50/p95/p99 延迟、吞吐量和峰值内存
+
+两种驱动：
+- wsgi（默认）：在当前进程内通过 Flask test_client 调用应用，不经过网络和 WSGI 服务器，
+  适合对比代码改动（list_items、login_required、上传下载等）前后的差异。
+  每次运行都把数据集复制到临时目录，写入类场景不会影响下一次运行。
+- http：多个进程通过 HTTP（keep-alive）同时请求一个已启动的服务，例如
+      DATABASE_URL=sqlite:///$PWD/benchmarks/data/bench-10k-42-lognormal.5.5.1.0.sqlite \\
+          gunicorn -w 4 'app:create_app()'
+      python benchmarks/run_suite.py --driver http --url http://127.0.0.1:8000 --processes 4 \\
+          --server-pid <gunicorn worker 的 pid> ...
+  --server-pid 指定的进程用于统计服务端峰值内存（读取 /proc/<pid>/status，仅 Linux）。
+
+请求序列由 --seed 决定（每个场景、每个进程使用独立的随机数生成器），相同参数的两次运行请求完全相同。
+结果保存为 JSON（默认 benchmarks/results/<时间>-<驱动>-<规模>.json），
+指定 --baseline 时与基线对比（见 benchmarks/compare.py），有指标退化超过阈值时退出码为 1。
+
+用法（在项目根目录执行）：
+    python benchmarks/run_suite.py [--scale 10k] [--requests 200] [--scenarios item_list,item_search]
+                                   [--baseline benchmarks/results/xxx.json]
+"""
+import argparse
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.datastructures import FileStorage  # noqa: E402
+from werkzeug.test import encode_multipart  # noqa: E402
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+import datagen  # noqa: E402
+from compare import compare, print_comparison, load_result, warn_mismatch  # noqa: E402
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+# 上传场景的文件大小，下载场景使用的文件大小
+UPLOAD_SIZE = 64 * 1024
+DOWNLOAD_SIZE = 1024 * 1024
+
+
+# --- 场景 ---
+# 每个场景是一个函数 (rng, ctx) -> (method, path, body, headers)
+# ctx: {'items', 'users', 'categories', 'download_url'}
+
+def _json_body(data):
+    return json.dumps(data).encode(), {'Content-Type': 'application/json'}
+
+
+def scenario_login(rng, ctx):
+    body, headers = _json_body({
+        'username': datagen.USERNAME_FORMAT.format(rng.randint(1, ctx['users'])),
+        'password': datagen.PASSWORD,
+    })
+    return 'POST', '/api/auth/login', body, headers
+
+
+def scenario_auth_status(rng, ctx):
+    return 'GET', '/api/auth/status', None, {}
+
+
+def scenario_category_list(rng, ctx):
+    return 'GET', '/api/example/category/list', None, {}
+
+
+def scenario_item_detail(rng, ctx):
+    return 'GET', f"/api/example/item/{rng.randint(1, ctx['items'])}", None, {}
+
+
+def scenario_item_list(rng, ctx):
+    # 前 50 页内的随机页
+    return 'GET', f'/api/example/item/list?page={rng.randint(1, 50)}&per_page=20', None, {}
+
+
+def scenario_item_list_deep(rng, ctx):
+    # 最后 10% 的页，OFFSET 很大
+    pages = max(1, ctx['items'] // 20)
+    page = rng.randint(max(1, pages - pages // 10), pages)
+    return 'GET', f'/api/example/item/list?page={page}&per_page=20', None, {}
+
+
+def scenario_item_list_cursor(rng, ctx):
+    category_id = rng.randint(1, ctx['categories'])
+    return 'GET', f'/api/example/item/list?mode=cursor&per_page=20&category_id={category_id}', None, {}
+
+
+def scenario_item_search(rng, ctx):
+    keyword = rng.choice(datagen.SEARCH_WORDS)
+    return 'GET', f'/api/example/item/list?search={keyword}&per_page=20', None, {}
+
+
+def scenario_item_create(rng, ctx):
+    body, headers = _json_body({
+        'name': f'bench item {rng.randrange(10 ** 9)}',
+        'description': datagen.make_text(rng, rng.randint(50, 500)),
+        'category_id': rng.randint(1, ctx['categories']),
+    })
+    return 'POST', '/api/example/item/create', body, headers
+
+
+def scenario_upload(rng, ctx):
+    # 每次上传不同的内容，不会被内容寻址存储去重
+    return ('POST', '/api/auth/upload-simple') + _multipart(rng.randbytes(UPLOAD_SIZE), 'bench.bin')
+
+
+def scenario_download(rng, ctx):
+    return 'GET', ctx['download_url'], None, {}
+
+
+# 场景名 -> (函数, 是否需要登录)
+SCENARIOS = {
+    'login': (scenario_login, False),
+    'auth_status': (scenario_auth_status, True),
+    'category_list': (scenario_category_list, False),
+    'item_detail': (scenario_item_detail, False),
+    'item_list': (scenario_item_list, False),
+    'item_list_deep': (scenario_item_list_deep, False),
+    'item_list_cursor': (scenario_item_list_cursor, False),
+    'item_search': (scenario_item_search, False),
+    'item_create': (scenario_item_create, True),
+    'upload': (scenario_upload, False),
+    'download': (scenario_download, False),
+}
+
+
+def _multipart(content, filename):
+    boundary, body = encode_multipart({'file': FileStorage(io.BytesIO(content), filename)})
+    return body, {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+
+
+# --- 内存统计 ---
+
+def _read_vm_hwm(pid='self'):
+    """
+    进程的峰值常驻内存（MB），读取 /proc/<pid>/status 的 VmHWM；不支持时返回 None
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss(pid='self'):
+    # 写入 5 会把 VmHWM 重置为当前 RSS（Linux 4.0+），这样每个场景的峰值互不影响
+    try:
+        with open(f'/proc/{pid}/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _self_peak_rss():
+    value = _read_vm_hwm()
+    if value is not None:
+        return value
+    # 非 Linux：只能得到进程启动以来的峰值（macOS 单位为字节，Linux 为 KB）
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 1024 / 1024 if sys.platform == 'darwin' else maxrss / 1024
+
+
+# --- 统计 ---
+
+def summarize(latencies, errors, elapsed, peak_rss_mb):
+    """
+    :param latencies: 每个请求的耗时（秒）
+    :param elapsed: 所有请求的总墙钟时间（秒）
+    """
+    stats = {'requests': len(latencies), 'errors': errors}
+    if len(latencies) >= 2:
+        cuts = statistics.quantiles(latencies, n=100, method='inclusive')
+        stats.update({
+            'p50_ms': cuts[49] * 1000,
+            'p95_ms': cuts[94] * 1000,
+            'p99_ms': cuts[98] * 1000,
+            'mean_ms': statistics.fmean(latencies) * 1000,
+            'max_ms': max(latencies) * 1000,
+        })
+    stats['throughput_rps'] = len(latencies) / elapsed if elapsed else None
+    stats['peak_rss_mb'] = peak_rss_mb
+    return stats
+
+
+# --- wsgi 驱动 ---
+
+class WSGIDriver:
+    """
+    进程内调用应用，每个场景使用一个新的 test_client（登录类场景先登录）
+    """
+    name = 'wsgi'
+
+    def __init__(self, dataset_path, cache_backend):
+        self.tmp_dir = tempfile.mkdtemp(prefix='bench-')
+        db_path = os.path.join(self.tmp_dir, 'bench.sqlite')
+        shutil.copyfile(dataset_path, db_path)
+
+        class BenchConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite:///' + db_path
+            UPLOAD_FOLDER = os.path.join(self.tmp_dir, 'uploads')
+            METRICS_DIR = os.path.join(self.tmp_dir, 'metrics')
+            CACHE_BACKEND = cache_backend
+            CACHE_SQLITE_PATH = os.path.join(self.tmp_dir, 'cache.sqlite')
+            # 压测同一个客户端会连续发出大量登录、上传请求
+            RATELIMIT_ENABLED = False
+
+        self.app = create_app(BenchConfig)
+
+    def client(self, login):
+        client = self.app.test_client()
+        if login:
+            response = client.post('/api/auth/login', json={
+                'username': datagen.USERNAME_FORMAT.format(1), 'password': datagen.PASSWORD})
+            assert response.status_code == 200, response.get_data(as_text=True)
+        return client
+
+    def upload_fixture(self, rng):
+        body, headers = _multipart(rng.randbytes(DOWNLOAD_SIZE), 'download.bin')
+        response = self.client(False).post('/api/auth/upload-simple', data=body, headers=headers)
+        return urlsplit(response.get_json()['data']['url']).path
+
+    def run(self, scenario, login, ctx, seed, count, warmup):
+        client = self.client(login)
+        rng = random.Random(f'{seed}-{scenario.__name__}')
+        for _ in range(warmup):
+            self._send(client, *scenario(rng, ctx))
+        requests = [scenario(rng, ctx) for _ in range(count)]
+        _reset_peak_rss()
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for method, path, body, headers in requests:
+            start = time.perf_counter()
+            status = self._send(client, method, path, body, headers)
+            latencies.append(time.perf_counter() - start)
+            errors += status >= 400
+        elapsed = time.perf_counter() - started
+        return summarize(latencies, errors, elapsed, _self_peak_rss())
+
+    @staticmethod
+    def _send(client, method, path, body, headers):
+        response = client.open(path, method=method, data=body, headers=headers)
+        response.get_data()
+        response.close()
+        return response.status_code
+
+    def close(self):
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+# --- http 驱动 ---
+
+class _HTTPClient:
+    """
+    基于 http.client 的 keep-alive 客户端，手动保存会话 Cookie
+    """
+    def __init__(self, url):
+        parts = urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=60)
+        self.cookies = {}
+
+    def send(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # 服务端关闭了 keep-alive 连接，重连后重试一次
+            self.connection.close()
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+        data = response.read()
+        for header in response.headers.get_all('Set-Cookie') or ():
+            name, _, value = header.split(';', 1)[0].partition('=')
+            self.cookies[name.strip()] = value.strip()
+        return response.status, data
+
+
+def _http_worker(args):
+    url, scenario_name, ctx, seed, index, count, warmup, start_at = args
+    scenario, login = SCENARIOS[scenario_name]
+    client = _HTTPClient(url)
+    if login:
+        body, headers = _json_body({
+            'username': datagen.USERNAME_FORMAT.format(index + 1), 'password': datagen.PASSWORD})
+        status, data = client.send('POST', '/api/auth/login', body, headers)
+        assert status == 200, data
+    rng = random.Random(f'{seed}-{scenario.__name__}-{index}')
+    for _ in range(warmup):
+        client.send(*scenario(rng, ctx))
+    requests = [scenario(rng, ctx) for _ in range(count)]
+    # 所有进程在同一时刻开始，吞吐量按第一个开始到最后一个结束的时间计算
+    time.sleep(max(0.0, start_at - time.time()))
+    latencies, errors = [], 0
+    started = time.time()
+    for request in requests:
+        start = time.perf_counter()
+        status, _ = client.send(*request)
+        latencies.append(time.perf_counter() - start)
+        errors += status >= 400
+    return latencies, errors, started, time.time()
+
+
+class HTTPDriver:
+    """
+    多进程并发请求外部服务，每个进程一个 keep-alive 连接
+    """
+    name = 'http'
+
+    def __init__(self, url, processes, server_pids):
+        self.url = url
+        self.processes = processes
+        self.server_pids = server_pids
+        self.pool = multiprocessing.Pool(processes)
+
+    def upload_fixture(self, rng):
+        body, headers = _multipart(rng.randbytes(DOWNLOAD_SIZE), 'download.bin')
+        status, data = _HTTPClient(self.url).send('POST', '/api/auth/upload-simple', body, headers)
+        assert status == 200, data
+        return urlsplit(json.loads(data)['data']['url']).path
+
+    def run(self, scenario, login, ctx, seed, count, warmup):
+        for pid in self.server_pids:
+            _reset_peak_rss(pid)
+        per_process = max(1, count // self.processes)
+        start_at = time.time() + 0.5
+        results = self.pool.map(_http_worker, [
+            (self.url, scenario_name(scenario), ctx, seed, index, per_process, warmup, start_at)
+            for index in range(self.processes)
+        ])
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+        elapsed = max(result[3] for result in results) - min(result[2] for result in results)
+        # 服务端各进程峰值内存之和；未指定 --server-pid 时为 None
+        peaks = [_read_vm_hwm(pid) for pid in self.server_pids]
+        peak = sum(peaks) if peaks and None not in peaks else None
+        return summarize(latencies, errors, elapsed, peak)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+
+def scenario_name(func):
+    return next(name for name, (scenario, _) in SCENARIOS.items() if scenario is func)
+
+
+# --- 运行 ---
+
+def _git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run_suite(driver, scenario_names, ctx, seed, count, warmup):
+    results = {}
+    print(f"{'场景':<20}{'请求数':>8}{'错误':>6}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}"
+          f"{'吞吐(次/秒)':>12}{'峰值内存(MB)':>14}")
+    for name in scenario_names:
+        scenario, login = SCENARIOS[name]
+        stats = driver.run(scenario, login, ctx, seed, count, warmup)
+        results[name] = stats
+        print(f"{name:<20}{stats['requests']:>8}{stats['errors']:>6}"
+              f"{stats.get('p50_ms', 0):>10.2f}{stats.get('p95_ms', 0):>10.2f}{stats.get('p99_ms', 0):>10.2f}"
+              f"{stats['throughput_rps'] or 0:>12.1f}"
+              f"{stats['peak_rss_mb'] if stats['peak_rss_mb'] is not None else float('nan'):>14.1f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--driver', choices=('wsgi', 'http'), default='wsgi')
+    parser.add_argument('--scale', default='10k', help='数据规模：10k / 100k / 1m 或正整数（见 datagen.py）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--text-size', default=datagen.DEFAULT_TEXT_SIZE, help='描述长度分布（见 datagen.py）')
+    parser.add_argument('--dataset', help='数据集路径，默认按规模、种子和分布生成或复用')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='逗号分隔的场景名')
+    parser.add_argument('--requests', type=int, default=200, help='每个场景的请求数（http 驱动为所有进程合计）')
+    parser.add_argument('--warmup', type=int, default=20, help='每个场景（每个进程）正式计时前的预热请求数')
+    parser.add_argument('--cache', default='null', help='wsgi 驱动的 CACHE_BACKEND，默认关闭响应缓存以测量实际处理开销')
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='http 驱动请求的服务地址')
+    parser.add_argument('--processes', type=int, default=4, help='http 驱动的并发进程数')
+    parser.add_argument('--server-pid', type=int, action='append', default=[], help='统计峰值内存的服务端进程')
+    parser.add_argument('--output', help='结果 JSON 路径，默认保存到 benchmarks/results/')
+    parser.add_argument('--baseline', help='与之对比的基线结果 JSON')
+    parser.add_argument('--threshold', type=float, default=0.1, help='对比基线时，变差超过该比例视为退化')
+    args = parser.parse_args()
+
+    scenario_names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenario_names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"未知的场景: {', '.join(unknown)}（可选 {', '.join(SCENARIOS)}）")
+
+    items = datagen.parse_scale(args.scale)
+    ctx = {
+        'items': items,
+        'users': max(1, -(-items // datagen.ITEMS_PER_USER)),
+        'categories': datagen.CATEGORY_COUNT,
+    }
+
+    dataset_path = None
+    if args.driver == 'wsgi':
+        dataset_path = args.dataset or datagen.default_output(args.scale, args.seed, args.text_size)
+        if not os.path.exists(dataset_path):
+            print(f'生成数据集 {dataset_path}')
+        datagen.build_dataset(dataset_path, items, args.seed, args.text_size)
+        driver = WSGIDriver(dataset_path, args.cache)
+    else:
+        driver = HTTPDriver(args.url, args.processes, args.server_pid)
+
+    try:
+        ctx['download_url'] = driver.upload_fixture(random.Random(args.seed))
+        scenarios = run_suite(driver, scenario_names, ctx, args.seed, args.requests, args.warmup)
+    finally:
+        driver.close()
+
+    commit, dirty = _git_revision()
+    result = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'driver': driver.name,
+            'git_commit': commit,
+            'git_dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'dataset': {'scale': args.scale, 'items': items, 'seed': args.seed, 'text_size': args.text_size},
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'processes': args.processes if args.driver == 'http' else 1,
+            'cache_backend': args.cache if args.driver == 'wsgi' else None,
+            'url': args.url if args.driver == 'http' else None,
+        },
+        'scenarios': scenarios,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{driver.name}-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已保存到 {output}')
+
+    if args.baseline:
+        baseline = load_result(args.baseline)
+        print(f'\n与基线 {args.baseline} 对比：')
+        warn_mismatch(baseline, result)
+        rows, regressions = compare(baseline, result, args.threshold)
+        print_comparison(rows, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+# benchmarks/serving_modes.py
+"""
+服务模式并发基准：慢速上传客户端占用连接时，普通请求还能得到多少吞吐量
+
+依次启动三种服务（同一份数据集、相同的进程数）：
+- sync     gunicorn 同步 worker（当前默认部署方式），每个进程同一时刻只处理一个请求
+- gthread  gunicorn 线程 worker（-k gthread --threads N）
+- asgi     uvicorn + asgi.py 中的适配器：事件循环异步接收请求体，收齐后在线程池中执行应用
+每种服务运行 --seconds 秒：
+- --slow-clients 个慢速客户端反复上传 --upload-size 字节的文件，每次把请求体分成多段，
+  在 --slow-seconds 秒内发完（模拟移动网络上的大文件上传）
+- --fast-clients 个客户端同时循环请求 GET /api/example/category/list
+输出普通请求的吞吐量、p50/p99 延迟、错误数，以及完成的上传数。
+
+服务使用临时目录中的数据集副本和上传目录，关闭响应缓存与限流（压测客户端来自同一个 IP）。
+
+用法（在项目根目录执行，需要安装 gunicorn、uvicorn）：
+    python benchmarks/serving_modes.py [--modes sync,gthread,asgi] [--workers 4] [--threads 16]
+                                       [--slow-clients 16] [--fast-clients 8] [--seconds 10]
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from config import Config  # noqa: E402
+from app import create_app  # noqa: E402
+from app.utils.asgi import WSGIThreadPoolAdapter  # noqa: E402
+import datagen  # noqa: E402
+from run_suite import RESULTS_DIR, summarize, _git_revision, _multipart  # noqa: E402
+
+MODES = ('sync', 'gthread', 'asgi')
+FAST_PATH = '/api/example/category/list'
+UPLOAD_PATH = '/api/auth/upload-simple'
+
+
+# --- 服务端（在 gunicorn / uvicorn 启动的进程中执行） ---
+
+def create_bench_app():
+    """
+    gunicorn 的应用工厂：数据库、上传目录等都放在环境变量 BENCH_TMP_DIR 指定的临时目录中
+    """
+    tmp_dir = os.environ['BENCH_TMP_DIR']
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tmp_dir, 'bench.sqlite')
+        UPLOAD_FOLDER = os.path.join(tmp_dir, 'uploads')
+        METRICS_DIR = os.path.join(tmp_dir, 'metrics')
+        CACHE_BACKEND = 'null'
+        RATELIMIT_ENABLED = False
+
+    return create_app(BenchConfig)
+
+
+def create_bench_asgi():
+    """
+    uvicorn 的应用工厂（--factory），与 asgi.py 相同的适配方式
+    """
+    app = create_bench_app()
+    return WSGIThreadPoolAdapter(app.wsgi_app, threads=app.config['ASGI_THREADS'],
+                                 spool_size=app.config['ASGI_SPOOL_SIZE'])
+
+
+def server_command(mode, port, workers, threads):
+    bind = f'127.0.0.1:{port}'
+    if mode == 'sync':
+        return ['gunicorn', '-w', str(workers), '-b', bind, '--chdir', BENCH_DIR,
+                'serving_modes:create_bench_app()']
+    if mode == 'gthread':
+        return ['gunicorn', '-w', str(workers), '-k', 'gthread', '--threads', str(threads), '-b', bind,
+                '--chdir', BENCH_DIR, 'serving_modes:create_bench_app()']
+    return ['uvicorn', '--factory', 'serving_modes:create_bench_asgi', '--app-dir', BENCH_DIR,
+            '--workers', str(workers), '--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning']
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            connection.request('GET', FAST_PATH)
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'服务在 {timeout} 秒内没有就绪')
+
+
+# --- 客户端 ---
+
+def _fast_client(port, stop_at, latencies, errors):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    while time.time() < stop_at:
+        start = time.perf_counter()
+        try:
+            connection.request('GET', FAST_PATH)
+            response = connection.getresponse()
+            response.read()
+            if response.status == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status)
+        except (http.client.HTTPException, OSError) as e:
+            errors.append(type(e).__name__)
+            connection.close()
+
+
+def _slow_client(port, stop_at, upload_size, slow_seconds, pieces, seed, completed, errors):
+    rng = random.Random(seed)
+    while time.time() < stop_at:
+        body, headers = _multipart(rng.randbytes(upload_size), 'slow.bin')
+        head = (f'POST {UPLOAD_PATH} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n'
+                f"Content-Type: {headers['Content-Type']}\r\nContent-Length: {len(body)}\r\n"
+                'Connection: close\r\n\r\n').encode('latin-1')
+        step = -(-len(body) // pieces)
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=60) as sock:
+                sock.sendall(head)
+                for offset in range(0, len(body), step):
+                    sock.sendall(body[offset:offset + step])
+                    time.sleep(slow_seconds / pieces)
+                response = http.client.HTTPResponse(sock)
+                response.begin()
+                response.read()
+            if response.status == 200:
+                completed.append(1)
+            else:
+                errors.append(response.status)
+        except (http.client.HTTPException, OSError) as e:
+            errors.append(type(e).__name__)
+
+
+def run_mode(mode, dataset_path, args):
+    tmp_dir = tempfile.mkdtemp(prefix=f'serving-{mode}-')
+    shutil.copyfile(dataset_path, os.path.join(tmp_dir, 'bench.sqlite'))
+    port = _free_port()
+    env = dict(os.environ, BENCH_TMP_DIR=tmp_dir, ASGI_THREADS=str(args.threads))
+    server = subprocess.Popen(server_command(mode, port, args.workers, args.threads), env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port)
+        latencies, fast_errors, uploads, upload_errors = [], [], [], []
+        stop_at = time.time() + args.seconds
+        threads = [threading.Thread(target=_slow_client, args=(
+            port, stop_at, args.upload_size, args.slow_seconds, args.pieces, args.seed + i, uploads, upload_errors))
+            for i in range(args.slow_clients)]
+        # 先让慢速上传占住连接，再开始统计普通请求
+        for thread in threads:
+            thread.start()
+        time.sleep(min(1.0, args.slow_seconds / 2))
+        started = time.time()
+        fast = [threading.Thread(target=_fast_client, args=(port, stop_at, latencies, fast_errors))
+                for _ in range(args.fast_clients)]
+        for thread in fast:
+            thread.start()
+        for thread in fast:
+            thread.join()
+        elapsed = time.time() - started
+        for thread in threads:
+            thread.join()
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    stats = summarize(latencies, len(fast_errors), elapsed, None)
+    stats.pop('peak_rss_mb')
+    stats['uploads_completed'] = len(uploads)
+    stats['upload_errors'] = len(upload_errors)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default=','.join(MODES), help='逗号分隔：sync、gthread、asgi')
+    parser.add_argument('--scale', default='10k', help='数据规模（见 datagen.py）')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=4, help='每种服务的进程数')
+    parser.add_argument('--threads', type=int, default=16, help='gthread / asgi 模式每个进程的线程数')
+    parser.add_argument('--slow-clients', type=int, default=16)
+    parser.add_argument('--slow-seconds', type=float, default=5.0, help='每次上传发送请求体所用的秒数')
+    parser.add_argument('--pieces', type=int, default=20, help='请求体分成多少段发送')
+    parser.add_argument('--upload-size', type=int, default=256 * 1024)
+    parser.add_argument('--fast-clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0, help='每种服务的压测时长')
+    parser.add_argument('--output', help='结果 JSON 路径，默认保存到 benchmarks/results/')
+    args = parser.parse_args()
+
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error(f"未知的服务模式: {', '.join(unknown)}（可选 {', '.join(MODES)}）")
+
+    items = datagen.parse_scale(args.scale)
+    dataset_path = datagen.default_output(args.scale, args.seed, datagen.DEFAULT_TEXT_SIZE)
+    datagen.build_dataset(dataset_path, items, args.seed, datagen.DEFAULT_TEXT_SIZE)
+
+    print(f'{args.slow_clients} 个慢速上传（{args.upload_size // 1024} KB / {args.slow_seconds:g} 秒）'
+          f' + {args.fast_clients} 个普通客户端，{args.workers} 个进程')
+    print(f"{'模式':<10}{'普通请求':>10}{'错误':>6}{'p50(ms)':>10}{'p99(ms)':>10}{'吞吐(次/秒)':>12}"
+          f"{'完成上传':>10}{'上传错误':>10}")
+    results = {}
+    for mode in modes:
+        stats = run_mode(mode, dataset_path, args)
+        results[mode] = stats
+        print(f"{mode:<10}{stats['requests']:>10}{stats['errors']:>6}"
+              f"{stats.get('p50_ms', 0):>10.2f}{stats.get('p99_ms', 0):>10.2f}{stats['throughput_rps'] or 0:>12.1f}"
+              f"{stats['uploads_completed']:>10}{stats['upload_errors']:>10}")
+
+    commit, dirty = _git_revision()
+    result = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'benchmark': 'serving_modes',
+            'git_commit': commit,
+            'git_dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'dataset': {'scale': args.scale, 'items': items, 'seed': args.seed},
+            'options': {key: value for key, value in vars(args).items() if key not in ('modes', 'output')},
+        },
+        'modes': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-serving-{args.scale}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f'\n结果已保存到 {output}')
+
+
+if __name__ == '__main__':
+    main()
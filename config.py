@@ -4,14 +4,161 @@ import os
 # os.path.dirname(...) 获取该文件所在的目录路径
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# 只读副本的连接字符串（逗号分隔），例如 DATABASE_REPLICA_URLS=sqlite:////data/replica.sqlite
+_replica_urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+
 class Config:
     """基础配置类"""
     # 'SQLALCHEMY_DATABASE_URI': Flask-SQLAlchemy的配置项，用于指定数据库连接字符串。
     # 我们使用 SQLite，数据库文件将存放在项目根目录下的 data.sqlite
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(basedir, 'data.sqlite')
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'data.sqlite')
+
+    # SQLite 连接参数，每个新连接建立时执行（见 app/utils/engine_profile.py）
+    # WAL 让读写互不阻塞，多个 gunicorn worker 并发读写时不再频繁出现 "database is locked"
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,           # 等待写锁的毫秒数
+        'mmap_size': 268435456,         # 256MB 内存映射读取
+        'cache_size': -65536,           # 负数表示 KiB，即每个连接 64MB 页缓存
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON',
+    }
+    # 连接池参数，按数据库类型选择；SQLALCHEMY_ENGINE_OPTIONS 中显式设置的值优先
+    DATABASE_POOL_PROFILES = {
+        # 本地文件，连接建立成本很低；gunicorn 同步 worker 每个进程同一时刻只用一个连接
+        'sqlite': {'pool_size': 5, 'max_overflow': 5, 'pool_timeout': 10},
+        # MySQL / PostgreSQL 等网络数据库：检测失效连接，并在服务端超时之前回收
+        'default': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 10,
+                    'pool_pre_ping': True, 'pool_recycle': 1800},
+    }
+
+    # 读写分离：只读副本作为额外的 bind 配置在 SQLALCHEMY_BINDS 中，DATABASE_REPLICAS 列出其中的副本
+    # 标记了 @read_only 的接口中的 SELECT 发往副本，见 app/utils/replicas.py
+    SQLALCHEMY_BINDS = {f'replica{i}': url for i, url in enumerate(_replica_urls, 1)}
+    DATABASE_REPLICAS = list(SQLALCHEMY_BINDS)
+    DATABASE_REPLICA_MAX_LAG = 5            # 副本延迟超过该秒数时改读主库
+    DATABASE_REPLICA_STICKY_SECONDS = 5     # 客户端写入后该秒数内的只读请求仍读主库（读己之写）
+    DATABASE_REPLICA_CHECK_INTERVAL = 1     # 每个进程检测副本延迟的间隔（秒）
+    DATABASE_REPLICA_RETRY_INTERVAL = 30    # 副本出错后暂停使用的秒数
 
     # 关闭不必要的追踪，以优化性能
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'a-very-secret-key-that-is-hard-to-guess'
 
     UPLOAD_FOLDER = os.path.join(basedir, 'uploads')
+    # 对外访问的地址前缀，用于拼接上传文件的 URL
+    PUBLIC_BASE_URL = os.environ.get('PUBLIC_BASE_URL', 'http://127.0.0.1:5000')
+    # 上传文件下载方式：None 由 Python 直接发送；'x-sendfile'（Apache）或 'x-accel'（nginx）交给前端代理发送
+    UPLOAD_SENDFILE_MODE = os.environ.get('UPLOAD_SENDFILE_MODE')
+    UPLOAD_ACCEL_PREFIX = '/protected-uploads'   # x-accel 模式下 nginx 中 internal location 的路径
+    UPLOAD_IMMUTABLE_MAX_AGE = 31536000          # 内容寻址文件永不改变，浏览器可缓存一年
+    # 图片缩略图：尺寸名 -> 最大边长（像素），上传后由 flask worker 执行任务生成（需要安装 Pillow）
+    IMAGE_DERIVATIVES = {'thumb': 64, 'small': 256, 'medium': 1024}
+    IMAGE_DERIVATIVE_FORMAT = 'webp'
+    IMAGE_DERIVATIVE_QUALITY = 80
+    # 引用计数归零的上传文件至少保留多久（秒）才会被 flask storage gc 删除
+    STORAGE_GC_GRACE_SECONDS = 3600
+
+    # 项目搜索是否使用 SQLite FTS5 trigram 全文索引（需 SQLite 3.34+，由 flask db upgrade 建立）
+    SEARCH_USE_FTS = True
+
+    # gunicorn worker 进程数（gunicorn 未指定 -w 时同样读取该环境变量，Dockerfile 中设为 4）
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+    # 响应缓存：memory（进程内，只适合单进程）/ sqlite（多个 gunicorn worker 共享）/ null（关闭）
+    # 未指定时按 worker 数选择：多进程部署默认使用 sqlite
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'sqlite' if WEB_CONCURRENCY > 1 else 'memory')
+    CACHE_SQLITE_PATH = os.path.join(basedir, 'cache.sqlite')
+    CACHE_DEFAULT_TTL = 60          # 缓存有效期（秒）
+    CACHE_MAX_ENTRIES = 1024        # 最大缓存条目数，超出后按 LRU 淘汰
+    CACHE_TOUCH_INTERVAL = 10       # sqlite 后端：命中时最多每隔多少秒刷新一次 accessed_at（LRU 精度）
+    CACHE_STATS_FLUSH_INTERVAL = 5  # sqlite 后端：命中统计在进程内累积，最多每隔多少秒写入一次
+
+    # 列表与详情接口的条件请求：按 table_version 表中的变更计数生成 ETag / Last-Modified，
+    # If-None-Match 匹配时直接返回 304，不执行列表查询
+    CONDITIONAL_GET_ENABLED = True
+
+    # 响应压缩：客户端支持 gzip 时，压缩以下类型且不小于 COMPRESS_MIN_SIZE 字节的响应
+    # 流式响应（如 /item/export）无法事先知道大小，只按类型判断、逐块压缩
+    COMPRESS_ENABLED = True
+    COMPRESS_MIN_SIZE = 1024        # 字节，更小的响应压缩收益不抵 CPU 开销
+    COMPRESS_LEVEL = 6              # 1（最快）~ 9（最小）
+    COMPRESS_STREAMS = True
+    COMPRESS_MIMETYPES = [
+        'application/json', 'application/x-ndjson', 'text/csv', 'text/plain',
+        'text/html', 'text/css', 'text/javascript', 'application/javascript',
+    ]
+
+    # 限流与并发控制（登录、注册、上传等接口上的 @rate_limit）
+    # 后端：sqlite（默认，所有 gunicorn worker 共享计数）/ memory（仅单进程）
+    # 压测时可设置环境变量 RATELIMIT_ENABLED=false 关闭
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() not in ('0', 'false', 'no')
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'sqlite')
+    RATELIMIT_SQLITE_PATH = os.path.join(basedir, 'ratelimit.sqlite')
+    RATELIMIT_CONCURRENCY_LEASE = 300   # 并发名额的最长持有时间（秒），超时视为持有者已异常退出
+    RATELIMIT_BUSY_RETRY_AFTER = 1      # 并发名额已满时返回的 Retry-After（秒）
+    # 应用前面的反向代理层数（如 nginx 为 1）。大于 0 时用 werkzeug 的 ProxyFix 从 X-Forwarded-For /
+    # X-Forwarded-Proto 中取真实客户端地址，否则所有客户端的 remote_addr 都是代理的地址，共用一个限流令牌桶
+    # 只有确实部署在代理之后才能设置，否则客户端可以伪造 X-Forwarded-For
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR', 0))
+
+    # ASGI 服务模式（asgi.py，uvicorn 启动）：每个进程执行请求的线程数，
+    # 以及请求体在内存中缓冲的最大字节数（超出后写入临时文件）
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 32))
+    ASGI_SPOOL_SIZE = 1024 * 1024
+
+    # 请求体的最大字节数，超出时返回 413：Flask 在读取请求体时检查；ASGI 模式下适配器在
+    # 接收请求体时检查，超限的上传不会写入临时文件，也不会进入视图（限流、并发分组之前）
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 32 * 1024 * 1024))
+
+    # 后台任务队列（job 表，flask worker 执行）
+    JOB_VISIBILITY_TIMEOUT = 300    # 领取后多少秒没有续期（worker 已退出）即可被重新领取
+    JOB_MAX_ATTEMPTS = 5            # 默认最多执行次数，任务定义中可单独指定
+    JOB_RETRY_BACKOFF = 10          # 第 n 次失败后等待 JOB_RETRY_BACKOFF * 2^(n-1) 秒（带随机抖动）再重试
+    JOB_RETRY_BACKOFF_MAX = 3600    # 重试等待的上限（秒）
+    JOB_RETENTION_SECONDS = 7 * 86400   # 已完成的任务保留多久，failed 的任务一直保留
+
+    # 登录用户身份缓存的有效期（秒），其他 worker 中的缓存最多在这段时间后刷新
+    IDENTITY_CACHE_TTL = 60
+    # 身份缓存的跨进程失效计数器文件（同一台机器上的所有 worker 共享）
+    IDENTITY_GENERATIONS_PATH = os.path.join(basedir, 'identity.generations')
+
+    # 密码哈希：算法与参数需写全（werkzeug 格式），修改后用户下次登录时自动按新参数重新哈希
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    # 每个 worker 进程的哈希进程池大小，0（默认）表示在请求线程中计算：Dockerfile 中的同步 gunicorn worker
+    # 每个进程同时只处理一个请求，进程池只会多出进程；gthread、ASGI 等多线程部署可设为 2 等值开启
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 0))
+    PASSWORD_HASH_QUEUE_TIMEOUT = 2.0  # 等待哈希槽位的最长秒数，超时返回 503
+
+    # 日志格式：text（默认）或 json（每行一条 JSON，附带请求 ID，便于日志平台采集）
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+
+    # 请求指标（GET /metrics，Prometheus 文本格式）
+    # 每个 worker 进程把指标写入 METRICS_DIR 下自己的 mmap 文件，/metrics 汇总所有进程
+    METRICS_ENABLED = True
+    METRICS_DIR = os.environ.get('METRICS_DIR') or os.path.join(basedir, 'metrics')
+
+    # 内部接口（/metrics、/api/cache/stats、/api/hashing/stats、/api/jobs/stats）的访问控制：
+    # 客户端地址在白名单（逗号分隔的地址或网段，默认只有本机）内，或带有 Authorization: Bearer <令牌> 才能访问
+    # 部署在反向代理之后时需同时设置 PROXY_FIX_X_FOR，否则代理转发的请求都会被当作本机请求
+    INTERNAL_ENDPOINTS_ALLOW = os.environ.get('INTERNAL_ENDPOINTS_ALLOW', '127.0.0.1,::1')
+    INTERNAL_ENDPOINTS_TOKEN = os.environ.get('INTERNAL_ENDPOINTS_TOKEN')
+
+    # 慢查询日志：执行超过该秒数的语句连同参数、endpoint 和执行计划写入 logs/slow_query.log；None 关闭
+    SQL_SLOW_QUERY_THRESHOLD = 0.2
+    SQL_EXPLAIN_SLOW_QUERIES = True
+    # N+1 检测：一个请求内同一形状的语句执行超过该次数时报告
+    # 模式：warn 记录警告 / raise 抛出异常 / off 关闭；未设置时 TESTING=True 为 raise，否则为 warn
+    SQL_N_PLUS_ONE_THRESHOLD = 5
+    SQL_N_PLUS_ONE_MODE = os.environ.get('SQL_N_PLUS_ONE_MODE')
+
+    # 批量接口单次最多处理的条目数
+    BULK_MAX_ITEMS = 1000
+
+    # 项目列表中描述的默认截断长度（字符数）：None 返回完整描述，0 不返回描述
+    # 客户端可通过 ?description_length=<n> 覆盖；完整描述通过 /item/<id> 获取
+    ITEM_LIST_DESCRIPTION_LENGTH = None
+
+    # 项目导出每次从数据库读取的行数
+    EXPORT_BATCH_SIZE = 1000
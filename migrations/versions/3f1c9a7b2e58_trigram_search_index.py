@@ -0,0 +1,54 @@
+"""trigram search index
+
+把 example_item_fts 的分词器从 unicode61 换成 trigram：unicode61 把一整段连续的汉字当作一个词，
+搜索“手机”找不到“苹果手机”。FTS5 不能修改已有虚拟表的分词器，这里删除全文索引表和同步触发器，
+按新的分词器重新创建，再根据 example_item 的现有数据重建索引（仅 SQLite 3.34 及以上，其他情况跳过）。
+
+Revision ID: 3f1c9a7b2e58
+Revises: 8e4b9f0a6d12
+Create Date: 2026-10-18 06:10:00.000000
+
+"""
+from alembic import op
+
+from app.modules.example.search import FTS_TABLE, drop_search_index, install_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7b2e58'
+down_revision = '8e4b9f0a6d12'
+branch_labels = None
+depends_on = None
+
+# 上一版本的建表语句（unicode61 分词，按前缀匹配），用于降级
+UNICODE61_DDL = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, description,
+        content='example_item', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+
+
+def _rebuild(bind):
+    bind.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    drop_search_index(bind)
+    if install_search_index(bind):
+        _rebuild(bind)
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite':
+        return
+    drop_search_index(bind)
+    # 先按旧的分词器建表；install_search_index 中的建表语句随之跳过，只创建同步触发器
+    bind.exec_driver_sql(UNICODE61_DDL)
+    install_search_index(bind)
+    _rebuild(bind)
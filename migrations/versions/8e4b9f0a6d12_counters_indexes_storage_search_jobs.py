@@ -0,0 +1,150 @@
+"""counters, indexes, storage, search and job tables
+
+在最初的三张表之上补齐之后新增的结构：
+- example_category.item_count（按现有数据回填）
+- example_item.updated_at（回填为 timestamp）及其索引
+- example_item 的 (category_id, timestamp)、(user_id, timestamp) 复合索引
+- stored_blob（内容寻址存储）、table_version（表级变更计数）、job（任务队列）、
+  import_checkpoint（批量导入检查点）
+- SQLite 上的 FTS5 全文索引 example_item_fts 及同步触发器（按现有数据重建）
+
+每一步都先检查是否已存在：用 db.create_all() 建立、已经带有部分新结构的数据库也可以直接升级。
+
+Revision ID: 8e4b9f0a6d12
+Revises: c5d7a1e2b3f4
+Create Date: 2026-10-18 05:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.modules.example.search import FTS_TABLE, install_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b9f0a6d12'
+down_revision = 'c5d7a1e2b3f4'
+branch_labels = None
+depends_on = None
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def _columns(table):
+    return {column['name'] for column in _inspector().get_columns(table)}
+
+
+def _indexes(table):
+    return {index['name'] for index in _inspector().get_indexes(table)}
+
+
+def _tables():
+    return set(_inspector().get_table_names())
+
+
+def upgrade():
+    if 'item_count' not in _columns('example_category'):
+        with op.batch_alter_table('example_category', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('item_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(
+            'UPDATE example_category SET item_count = '
+            '(SELECT COUNT(*) FROM example_item WHERE example_item.category_id = example_category.id)'
+        )
+
+    if 'updated_at' not in _columns('example_item'):
+        with op.batch_alter_table('example_item', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        op.execute('UPDATE example_item SET updated_at = timestamp')
+
+    existing = _indexes('example_item')
+    with op.batch_alter_table('example_item', schema=None) as batch_op:
+        if 'ix_example_item_updated_at' not in existing:
+            batch_op.create_index('ix_example_item_updated_at', ['updated_at'], unique=False)
+        if 'ix_example_item_category_id_timestamp' not in existing:
+            batch_op.create_index('ix_example_item_category_id_timestamp', ['category_id', 'timestamp'], unique=False)
+        if 'ix_example_item_user_id_timestamp' not in existing:
+            batch_op.create_index('ix_example_item_user_id_timestamp', ['user_id', 'timestamp'], unique=False)
+
+    tables = _tables()
+    if 'stored_blob' not in tables:
+        op.create_table('stored_blob',
+        sa.Column('content_id', sa.String(length=80), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('content_id')
+        )
+        with op.batch_alter_table('stored_blob', schema=None) as batch_op:
+            batch_op.create_index('ix_stored_blob_updated_at', ['updated_at'], unique=False)
+
+    if 'table_version' not in tables:
+        op.create_table('table_version',
+        sa.Column('name', sa.String(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+    if 'job' not in tables:
+        op.create_table('job',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('queue', sa.String(length=64), nullable=False),
+        sa.Column('name', sa.String(length=128), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('max_attempts', sa.Integer(), nullable=False),
+        sa.Column('run_at', sa.DateTime(), nullable=False),
+        sa.Column('locked_by', sa.String(length=128), nullable=True),
+        sa.Column('locked_until', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('job', schema=None) as batch_op:
+            batch_op.create_index('ix_job_status_run_at', ['status', 'run_at'], unique=False)
+
+    if 'import_checkpoint' not in tables:
+        op.create_table('import_checkpoint',
+        sa.Column('source', sa.String(length=512), nullable=False),
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('mtime', sa.Float(), nullable=False),
+        sa.Column('committed', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('source', 'kind')
+        )
+
+    # 全文索引：建表和触发器都是 IF NOT EXISTS，随后按现有数据重建（非 SQLite 数据库跳过）
+    bind = op.get_bind()
+    if install_search_index(bind):
+        bind.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            bind.exec_driver_sql(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+        bind.exec_driver_sql(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    op.drop_table('import_checkpoint')
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_index('ix_job_status_run_at')
+    op.drop_table('job')
+    op.drop_table('table_version')
+    with op.batch_alter_table('stored_blob', schema=None) as batch_op:
+        batch_op.drop_index('ix_stored_blob_updated_at')
+    op.drop_table('stored_blob')
+
+    with op.batch_alter_table('example_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_example_item_user_id_timestamp')
+        batch_op.drop_index('ix_example_item_category_id_timestamp')
+        batch_op.drop_index('ix_example_item_updated_at')
+        batch_op.drop_column('updated_at')
+    with op.batch_alter_table('example_category', schema=None) as batch_op:
+        batch_op.drop_column('item_count')
@@ -0,0 +1,61 @@
+"""initial schema
+
+最初的 user、example_category、example_item 三张表（与模板最早的模型一致）。
+用 db.create_all() 或旧的本地迁移建立的数据库先执行 flask db stamp c5d7a1e2b3f4，
+再执行 flask db upgrade。
+
+Revision ID: c5d7a1e2b3f4
+Revises: 
+Create Date: 2026-10-18 05:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d7a1e2b3f4'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('username', sa.String(length=80), nullable=True),
+    sa.Column('password', sa.String(length=128), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=False),
+    sa.Column('avatar', sa.String(length=128), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('username')
+    )
+    op.create_table('example_category',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('example_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=150), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('file_url', sa.String(length=255), nullable=True),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['category_id'], ['example_category.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('example_item', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_example_item_timestamp'), ['timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('example_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_example_item_timestamp'))
+
+    op.drop_table('example_item')
+    op.drop_table('example_category')
+    op.drop_table('user')